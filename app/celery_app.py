@@ -1,5 +1,5 @@
 from celery import Celery
-from app.config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND
+from app.config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND, REMINDER_DISPATCH_INTERVAL, REMINDER_REAP_INTERVAL, REMINDER_RENDER_INTERVAL
 
 
 celery_app = Celery(
@@ -16,4 +16,25 @@ celery_app.conf.update(
     enable_utc=True,
     task_acks_late=True,
     worker_prefetch_multiplier=1
-)
\ No newline at end of file
+)
+
+
+# Periodic tasks (Celery Beat)
+celery_app.conf.beat_schedule = {
+    "dispatch-due-reminders": {
+        "task": "app.tasks.reminders.dispatch_due_reminders",
+        "schedule": REMINDER_DISPATCH_INTERVAL,
+    },
+    "reap-expired-reminder-claims": {
+        "task": "app.tasks.reminders.reap_expired_reminder_claims",
+        "schedule": REMINDER_REAP_INTERVAL,
+    },
+    "render-reminder-messages": {
+        "task": "app.tasks.reminders.render_reminder_messages",
+        "schedule": REMINDER_RENDER_INTERVAL,
+    },
+    "purge-expired-pending-reminders": {
+        "task": "app.tasks.reminders.purge_expired_pending_reminders",
+        "schedule": 600.0,
+    },
+}
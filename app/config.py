@@ -1,12 +1,17 @@
 import os
 from dotenv import load_dotenv
-from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai.providers.openai import OpenAIProvider
 
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_LOCAL_URL")
+# Database pool (sync and async engines): size, overflow, pre-ping and recycle seconds (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Create missing tables when the API starts (disable when the schema is managed elsewhere)
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "true").lower() in ("1", "true", "yes")
 WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
 WHATSAPP_PHONE_ID = os.getenv("WHATSAPP_PHONE_ID")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -14,20 +19,112 @@ FERNET_KEY = os.getenv("FERNET_KEY")
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 
+# Webhook ingest pipeline: "inline" processes the payload inside the request, "queue" acknowledges and processes in background
+WEBHOOK_INGEST_MODE = os.getenv("WEBHOOK_INGEST_MODE", "inline")
+WEBHOOK_QUEUE_BACKEND = os.getenv("WEBHOOK_QUEUE_BACKEND", "memory")
+WEBHOOK_QUEUE_REDIS_URL = os.getenv("WEBHOOK_QUEUE_REDIS_URL", CELERY_BROKER_URL)
+WEBHOOK_QUEUE_MAXSIZE = int(os.getenv("WEBHOOK_QUEUE_MAXSIZE", "1000"))
+# Seconds a process keeps a Redis shard after it stops renewing it (dies) before another one takes it over
+WEBHOOK_QUEUE_LEASE = float(os.getenv("WEBHOOK_QUEUE_LEASE", "30"))
+WEBHOOK_CONSUMERS = int(os.getenv("WEBHOOK_CONSUMERS", "4"))
 
-# Agents openai model
-def get_model():
-    api_key = os.getenv('LLM_API_KEY', OPENAI_API_KEY)
+# Per-sender debounce window (seconds) to merge bursts of messages, 0 disables it
+MESSAGE_COALESCE_WINDOW = float(os.getenv("MESSAGE_COALESCE_WINDOW", "0"))
+MESSAGE_COALESCE_MAX_WAIT = float(os.getenv("MESSAGE_COALESCE_MAX_WAIT", "5"))
 
-    return OpenAIModel(
-        'gpt-4o',
-        provider=OpenAIProvider(api_key=api_key)
-    )
+# Webhook deduplication by WhatsApp message id: "memory" (per process) or "redis" (shared)
+WEBHOOK_DEDUP_BACKEND = os.getenv("WEBHOOK_DEDUP_BACKEND", "memory")
+WEBHOOK_DEDUP_REDIS_URL = os.getenv("WEBHOOK_DEDUP_REDIS_URL", CELERY_BROKER_URL)
+WEBHOOK_DEDUP_TTL = int(os.getenv("WEBHOOK_DEDUP_TTL", "86400"))
+WEBHOOK_DEDUP_MAX_SIZE = int(os.getenv("WEBHOOK_DEDUP_MAX_SIZE", "100000"))
 
-def get_classifier_model():
-    api_key = os.getenv('LLM_API_KEY', OPENAI_API_KEY)
+# Reminder proposals waiting for the user's confirmation
+PENDING_REMINDER_TTL = int(os.getenv("PENDING_REMINDER_TTL", "86400"))
+PENDING_REMINDER_PURGE_BATCH = int(os.getenv("PENDING_REMINDER_PURGE_BATCH", "500"))
 
-    return OpenAIModel(
-        'gpt-3.5-turbo-0125',
-        provider=OpenAIProvider(api_key=api_key)
-    )
\ No newline at end of file
+# Due-reminder dispatcher (Celery Beat): how often it polls, reminders claimed per batch,
+# batches per run, seconds before an unsent dispatched reminder is handed out again and reminders per send task
+REMINDER_DISPATCH_INTERVAL = float(os.getenv("REMINDER_DISPATCH_INTERVAL", "5"))
+REMINDER_DISPATCH_BATCH = int(os.getenv("REMINDER_DISPATCH_BATCH", "500"))
+REMINDER_DISPATCH_MAX_BATCHES = int(os.getenv("REMINDER_DISPATCH_MAX_BATCHES", "20"))
+REMINDER_DISPATCH_LEASE = int(os.getenv("REMINDER_DISPATCH_LEASE", "600"))
+REMINDER_SEND_BATCH = int(os.getenv("REMINDER_SEND_BATCH", "50"))
+# Send claim: seconds a worker owns the reminders it is sending, and how often expired claims are reaped.
+# The send task renews the claim on the rest of its batch every third of the lease, so the lease must
+# exceed the worst case of a single send: rate-limiter wait + (retries + 1) x HTTP timeout + backoff
+# (under a minute with the WhatsAppService defaults: 4 attempts x 10 s + 3 backoffs capped at 4 s)
+REMINDER_SEND_LEASE = int(os.getenv("REMINDER_SEND_LEASE", "300"))
+REMINDER_REAP_INTERVAL = float(os.getenv("REMINDER_REAP_INTERVAL", "60"))
+REMINDER_BACKFILL_BATCH = int(os.getenv("REMINDER_BACKFILL_BATCH", "1000"))
+
+# Reminder message rendering (Celery Beat): how often it runs, how far ahead of the due time,
+# reminders per model request, requests per run and how long a run keeps a batch claimed
+REMINDER_RENDER_INTERVAL = float(os.getenv("REMINDER_RENDER_INTERVAL", "10"))
+REMINDER_RENDER_WINDOW = int(os.getenv("REMINDER_RENDER_WINDOW", "604800"))
+REMINDER_RENDER_BATCH = int(os.getenv("REMINDER_RENDER_BATCH", "20"))
+REMINDER_RENDER_MAX_BATCHES = int(os.getenv("REMINDER_RENDER_MAX_BATCHES", "10"))
+REMINDER_RENDER_LEASE = int(os.getenv("REMINDER_RENDER_LEASE", "300"))
+
+# Outbound WhatsApp throttling (messages per second and burst size)
+OUTBOUND_RATE_PER_PHONE = float(os.getenv("OUTBOUND_RATE_PER_PHONE", "20"))
+OUTBOUND_BURST_PER_PHONE = float(os.getenv("OUTBOUND_BURST_PER_PHONE", "40"))
+OUTBOUND_RATE_PER_RECIPIENT = float(os.getenv("OUTBOUND_RATE_PER_RECIPIENT", "1"))
+OUTBOUND_BURST_PER_RECIPIENT = float(os.getenv("OUTBOUND_BURST_PER_RECIPIENT", "5"))
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "4"))
+
+# Speculative agent execution: "off", "general" (always start the general agent with the classifier)
+# or "auto" (start the reminder agent instead when the message looks like a reminder)
+AGENT_SPECULATIVE_MODE = os.getenv("AGENT_SPECULATIVE_MODE", "off")
+
+# Build the agents and the graph in the API startup hook ("false": on the first message)
+AGENT_GRAPH_WARMUP = os.getenv("AGENT_GRAPH_WARMUP", "true").lower() in ("1", "true", "yes")
+
+# Conversation context: "tool" (agents call get_conversation_context) or "inject" (rendered into the prompt)
+AGENT_CONTEXT_MODE = os.getenv("AGENT_CONTEXT_MODE", "tool")
+AGENT_CONTEXT_TOKEN_BUDGET = int(os.getenv("AGENT_CONTEXT_TOKEN_BUDGET", "600"))
+
+# LangGraph checkpointer: "memory" (bounded LRU in this process), "sql" (main database) or "sqlite" (local file)
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "memory")
+CHECKPOINTER_SQLITE_PATH = os.getenv("CHECKPOINTER_SQLITE_PATH", "checkpoints.sqlite")
+CHECKPOINTER_MAX_THREADS = int(os.getenv("CHECKPOINTER_MAX_THREADS", "1000"))
+CHECKPOINTER_KEEP_LAST = int(os.getenv("CHECKPOINTER_KEEP_LAST", "2"))
+
+# Conversation sessions (graph state per user): "memory" (per process) or "redis" (shared by every worker)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", CELERY_BROKER_URL)
+SESSION_TTL = int(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_HISTORY = int(os.getenv("SESSION_MAX_HISTORY", "20"))
+
+# Rolling summary of long sessions: "off", "extractive" (no model) or "model" (classifier model)
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "off")
+SUMMARY_KEEP_TURNS = int(os.getenv("SUMMARY_KEEP_TURNS", "3"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "200"))
+
+
+
+# LLM models (name and optional OpenAI-compatible base URL per role, e.g. a local stub server in tests)
+LLM_API_KEY = os.getenv("LLM_API_KEY", OPENAI_API_KEY)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_AGENT_MODEL = os.getenv("LLM_AGENT_MODEL", "gpt-4o")
+LLM_AGENT_BASE_URL = os.getenv("LLM_AGENT_BASE_URL", LLM_BASE_URL)
+LLM_CLASSIFIER_MODEL = os.getenv("LLM_CLASSIFIER_MODEL", "gpt-3.5-turbo-0125")
+LLM_CLASSIFIER_BASE_URL = os.getenv("LLM_CLASSIFIER_BASE_URL", LLM_BASE_URL)
+LLM_REMINDER_MESSAGE_MODEL = os.getenv("LLM_REMINDER_MESSAGE_MODEL", "gpt-4o")
+LLM_REMINDER_MESSAGE_BASE_URL = os.getenv("LLM_REMINDER_MESSAGE_BASE_URL", LLM_BASE_URL)
+# Reminder message model price in USD per million input / output tokens (cost reported by the render task)
+LLM_REMINDER_MESSAGE_INPUT_COST = float(os.getenv("LLM_REMINDER_MESSAGE_INPUT_COST", "2.5"))
+LLM_REMINDER_MESSAGE_OUTPUT_COST = float(os.getenv("LLM_REMINDER_MESSAGE_OUTPUT_COST", "10"))
+
+# Shared HTTP pool for the LLM clients
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+
+# Admission control for agent runs: concurrent graph runs, per-model caps ("agent=16,classifier=32"),
+# bounded wait queue and the longest a message may wait before getting the "busy" reply
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_CONCURRENCY_PER_MODEL = os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "agent=24,classifier=32")
+LLM_ADMISSION_QUEUE_SIZE = int(os.getenv("LLM_ADMISSION_QUEUE_SIZE", "100"))
+LLM_ADMISSION_TIMEOUT = float(os.getenv("LLM_ADMISSION_TIMEOUT", "10"))
@@ -0,0 +1,185 @@
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from sqlalchemy import delete, select, update
+from app.config import REMINDER_SEND_BATCH
+from app.database import SessionLocal, engine
+from app.models import Base, Reminder, User
+from app.services.reminder_dispatcher import claim_for_sending, finish_sending, new_claim_token, reap_expired_claims, utc_now
+
+
+class RecordingSender:
+    """
+    Stands in for WhatsAppService.send_reminder: counts the messages each phone receives and
+    takes `latency` seconds per send, like the real API call that opens the race window.
+    """
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.deliveries = Counter()
+        self._lock = threading.Lock()
+
+    def send_reminder(self, phone_number: str, message: str) -> bool:
+        time.sleep(self.latency)
+        with self._lock:
+            self.deliveries[phone_number] += 1
+        return True
+
+    def summary(self, phones: list[str]) -> dict:
+        counts = [self.deliveries[phone] for phone in phones]
+        return {
+            "messages_sent": sum(counts),
+            "delivered": sum(1 for count in counts if count),
+            "duplicates": sum(count - 1 for count in counts if count > 1),
+            "missing": counts.count(0),
+        }
+
+
+def seed(prefix: str, reminders: int) -> tuple[list[int], list[str]]:
+    """
+      🛈 Un usuario por recordatorio (el teléfono identifica cada entrega), todos vencidos
+    """
+    due = utc_now() - timedelta(minutes=1)
+    phones = [f"{prefix}{i:07d}" for i in range(reminders)]
+    with SessionLocal() as db:
+        users = [User(phone_number=phone, name="Stress", email=f"{phone}@stress.local", timezone="UTC") for phone in phones]
+        db.add_all(users)
+        db.flush()
+        items = [Reminder(user_id=user.id, text="stress", date=due.date(), hour=due.time(), due_at_utc=due) for user in users]
+        db.add_all(items)
+        db.commit()
+        return [item.id for item in items], phones
+
+
+def cleanup(prefix: str):
+    with SessionLocal() as db:
+        user_ids = select(User.id).where(User.phone_number.like(f"{prefix}%")).scalar_subquery()
+        db.execute(delete(Reminder).where(Reminder.user_id.in_(user_ids)))
+        db.execute(delete(User).where(User.phone_number.like(f"{prefix}%")))
+        db.commit()
+
+
+def deliveries(reminder_ids: list[int], copies: int, batch_size: int, rng: random.Random) -> list[list[int]]:
+    # Every reminder reaches `copies` different send tasks (acks_late redelivery, a second dispatch...)
+    batches = []
+    for _ in range(copies):
+        shuffled = list(reminder_ids)
+        rng.shuffle(shuffled)
+        batches += [shuffled[start:start + batch_size] for start in range(0, len(shuffled), batch_size)]
+    rng.shuffle(batches)
+    return batches
+
+
+def check_then_send(reminder_ids: list[int], sender: RecordingSender):
+    # Previous send task: read the unsent ones, send, then mark them as sent
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Reminder.id, User.phone_number)
+            .join(User, User.id == Reminder.user_id)
+            .where(Reminder.id.in_(reminder_ids), Reminder.send.is_(False))
+        ).all()
+        for row in rows:
+            sender.send_reminder(row.phone_number, "stress")
+        db.execute(update(Reminder).where(Reminder.id.in_([row.id for row in rows])).values(send=True))
+        db.commit()
+
+
+def stale_release(reminder_id: int) -> dict:
+    """
+      🛈 Un worker lento (A) cuyo reclamo caducó intenta soltar un recordatorio que otro (B) ya ha
+      vuelto a reclamar: no debe poder, y un tercero (C) no debe conseguirlo mientras B lo envía
+    """
+    with SessionLocal() as db:
+        token_a, token_b, token_c = new_claim_token(), new_claim_token(), new_claim_token()
+        claimed_a = claim_for_sending(db, [reminder_id], token_a, lease_sec=0)
+        reaped = reap_expired_claims(db)
+        claimed_b = claim_for_sending(db, [reminder_id], token_b)
+        released_by_a = finish_sending(db, [reminder_id], Reminder.STATUS_PENDING, token_a)
+        claimed_c = claim_for_sending(db, [reminder_id], token_c)
+        finish_sending(db, claimed_b, Reminder.STATUS_SENT, token_b)
+
+    return {
+        "ok": bool(claimed_a) and reaped >= 1 and bool(claimed_b) and released_by_a == 0 and not claimed_c,
+        "released_by_stale_worker": released_by_a,
+        "claimed_by_third_worker": len(claimed_c),
+    }
+
+
+def run(send, batches: list[list[int]], workers: int):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(send, batches))
+
+
+def stress(
+    reminders: int = 1000,
+    workers: int = 16,
+    copies: int = 3,
+    batch_size: int = REMINDER_SEND_BATCH,
+    crashed: float = 0.1,
+    latency: float = 0.002,
+) -> dict:
+    """
+      🛈 Entrega cada recordatorio vencido a `copies` tareas de envío que corren a la vez en `workers`
+      hilos, con el envío anterior (leer `send` → enviar → marcar) y con el reclamo previo
+      (send_whatsapp_reminders). En el segundo caso una fracción `crashed` la reclama antes un
+      worker que muere sin enviar: el reaper la devuelve y una reentrega la envía.
+
+      Cuenta los mensajes por teléfono: el reclamo previo debe dar 0 duplicados y 0 perdidos. Además
+      comprueba que un worker con el reclamo caducado no puede soltar uno que ya es de otro.
+    """
+    from app.tasks import reminders as reminder_tasks
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    prefix = f"9{int(time.time()) % 100000:05d}"
+    report = {"reminders": reminders, "workers": workers, "copies": copies, "batch_size": batch_size}
+
+    try:
+        # Before: check-then-send
+        reminder_ids, phones = seed(prefix + "0", reminders)
+        sender = RecordingSender(latency)
+        run(lambda batch: check_then_send(batch, sender), deliveries(reminder_ids, copies, batch_size, rng), workers)
+        report["check_then_send"] = sender.summary(phones)
+
+        # After: claim-before-send
+        reminder_ids, phones = seed(prefix + "1", reminders)
+        with SessionLocal() as db:
+            # Workers that died right after claiming (lease already over)
+            abandoned = claim_for_sending(db, rng.sample(reminder_ids, int(reminders * crashed)), new_claim_token(), lease_sec=0)
+
+        sender = RecordingSender(latency)
+        original_send = reminder_tasks.whatsapp_client.send_reminder
+        reminder_tasks.whatsapp_client.send_reminder = sender.send_reminder
+        try:
+            send = lambda batch: reminder_tasks.send_whatsapp_reminders.apply(args=[batch])
+            run(send, deliveries(reminder_ids, copies, batch_size, rng), workers)
+            with SessionLocal() as db:
+                reaped = reap_expired_claims(db)
+            run(send, deliveries(reminder_ids, 1, batch_size, rng), workers)
+        finally:
+            reminder_tasks.whatsapp_client.send_reminder = original_send
+
+        report["claim_before_send"] = {**sender.summary(phones), "abandoned_claims": len(abandoned), "reaped": reaped}
+
+        # Expired claim released by its old owner after someone else reclaimed it
+        reminder_ids, _ = seed(prefix + "2", 1)
+        report["stale_release"] = stale_release(reminder_ids[0])
+    finally:
+        cleanup(prefix)
+
+    after = report["claim_before_send"]
+    report["ok"] = after["duplicates"] == 0 and after["missing"] == 0 and report["stale_release"]["ok"]
+    return report
+
+
+if __name__ == "__main__":
+    # python -m app.delivery_stress [recordatorios] [workers]   (escribe en DATABASE_LOCAL_URL: usa una base de pruebas)
+    reminders = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    result = stress(reminders=reminders, workers=workers)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["ok"] else 1)
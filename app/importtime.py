@@ -0,0 +1,84 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+
+# Entry points: `uvicorn app.main:app` and `celery -A app.celery_app worker` (which loads the tasks module)
+ENTRY_POINTS = {
+    "api": ["app.main"],
+    "worker": ["app.celery_app", "app.tasks.reminders"],
+}
+
+# Modules each entry point must not load at import time
+FORBIDDEN_MODULES = {
+    "api": ["pydantic_ai", "langgraph", "openai"],
+    "worker": ["pydantic_ai", "langgraph", "openai", "httpx", "fastapi"],
+}
+
+# Budget in milliseconds for the whole import (best of `runs`, warm file cache)
+BUDGETS_MS = {"api": 5000, "worker": 3500}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure(modules: list[str], runs: int = 3) -> dict:
+    """
+      🛈 Importa los módulos en un proceso nuevo con `-X importtime` y devuelve el total
+      (mejor de `runs`), los paquetes que más tardan y todos los módulos cargados
+    """
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+            capture_output=True, text=True, env=os.environ, check=True,
+        )
+
+        total_us = 0
+        packages: dict[str, int] = {}
+        loaded = set()
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+            loaded.add(name)
+            # Top-level lines (one space of indent) add up to the whole import
+            if len(indent) == 1:
+                total_us += cumulative_us
+            root = name.split(".")[0]
+            packages[root] = packages.get(root, 0) + self_us
+
+        if best is None or total_us < best["total_us"]:
+            best = {"total_us": total_us, "packages": packages, "loaded": loaded}
+
+    return best
+
+
+def check(entry_point: str, budget_ms: float | None = None, runs: int = 3) -> dict:
+    measured = measure(ENTRY_POINTS[entry_point], runs=runs)
+    budget_ms = BUDGETS_MS[entry_point] if budget_ms is None else budget_ms
+    total_ms = measured["total_us"] / 1000
+    forbidden = sorted(
+        module for module in FORBIDDEN_MODULES[entry_point]
+        if any(name == module or name.startswith(module + ".") for name in measured["loaded"])
+    )
+    slowest = sorted(measured["packages"].items(), key=lambda item: item[1], reverse=True)[:10]
+
+    return {
+        "entry_point": entry_point,
+        "modules": ENTRY_POINTS[entry_point],
+        "import_ms": round(total_ms, 1),
+        "budget_ms": budget_ms,
+        "forbidden_loaded": forbidden,
+        "slowest_packages_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "ok": total_ms <= budget_ms and not forbidden,
+    }
+
+
+if __name__ == "__main__":
+    # python -m app.importtime [api|worker ...]   (sale con código 1 si se pasa del presupuesto)
+    reports = [check(entry_point) for entry_point in (sys.argv[1:] or ENTRY_POINTS)]
+    print(json.dumps(reports, indent=2))
+    sys.exit(0 if all(report["ok"] for report in reports) else 1)
@@ -1,8 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.database import Base, engine
+from app.config import DB_CREATE_SCHEMA, AGENT_GRAPH_WARMUP
+from app.database import Base, async_engine
 from app.routers import user, message, reminder, memory, whatsapp
+from app.services.webhook_queue import webhook_pipeline, message_coalescer
+from app.services.whatsapp import async_client as whatsapp_async_client
+from app.services.outbound import outbound_dispatcher
+from app.services.llm import llm_registry
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema creation runs at startup, not on import (workers and scripts never touch it)
+    if DB_CREATE_SCHEMA:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    # Build the agents and the graph before the first message instead of inside it
+    if AGENT_GRAPH_WARMUP:
+        from app.services.agents.agent_graph import get_agent_graph
+        get_agent_graph()
+
+    # Background consumers for the webhook ingest queue and outbound sends
+    await outbound_dispatcher.start()
+    await webhook_pipeline.start()
+    yield
+    await message_coalescer.flush_all()
+    await webhook_pipeline.stop()
+    await outbound_dispatcher.stop()
+    await whatsapp_async_client.aclose()
+    await llm_registry.aclose()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Routers
 app.include_router(user.router)
@@ -11,10 +42,8 @@ app.include_router(reminder.router)
 app.include_router(memory.router)
 app.include_router(whatsapp.router)
 
-Base.metadata.create_all(bind=engine)
-
 @app.get("/")
 
 
 def read_root():
-    return {"message": "¡Hello this app create reminders for you with whatsapp!"}
\ No newline at end of file
+    return {"message": "¡Hello this app create reminders for you with whatsapp!"}
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
+from uuid import uuid4
 import pytz
-from sqlalchemy import Column, Integer, String, Text, Boolean, Date, DateTime, ForeignKey, Time
+from sqlalchemy import Column, Integer, String, Text, Boolean, Date, DateTime, ForeignKey, Time, LargeBinary, Index, bindparam, event, inspect, select, update
 from sqlalchemy.orm import relationship
 from sqlalchemy_utils import StringEncryptedType
 from sqlalchemy_utils.types.encrypted.encrypted_type import FernetEngine
@@ -9,6 +10,11 @@ from .database import Base
 from app.config import FERNET_KEY
 
 
+def utc_now() -> datetime:
+    # The DateTime columns are "timestamp without time zone": store naive UTC (asyncpg rejects aware values)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class User(Base):
     __tablename__ = "user"
 
@@ -21,8 +27,8 @@ class User(Base):
     silent_mode = Column(Boolean, default=False)
     language = Column(String(2), default="es")
     birth_date = Column(Date, nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
     reminders = relationship("Reminder", back_populates="user")
     messages = relationship("Message", back_populates="user")
     memories = relationship("Memory", back_populates="user")
@@ -37,6 +43,20 @@ class User(Base):
 
 class Reminder(Base):
     __tablename__ = "reminder"
+    __table_args__ = (
+        # Due-reminder dispatcher: unsent reminders by due time
+        Index("ix_reminder_send_due_at_utc", "send", "due_at_utc"),
+        # A user's pending reminders, in due order
+        Index("ix_reminder_user_send_due_at_utc", "user_id", "send", "due_at_utc"),
+        # Lease reaper: reminders stuck in "sending"
+        Index("ix_reminder_status_claim_expires_at", "status", "claim_expires_at"),
+    )
+
+    # Delivery states: pending → sending (claimed by one send worker) → sent / failed
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"))
@@ -44,45 +64,160 @@ class Reminder(Base):
     date = Column(Date)
     hour = Column(Time)
     send = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # Personalized message generated when the reminder is confirmed, with a {cuando} placeholder
+    # for the day and hour (NULL: the send task uses the fixed template)
+    rendered_text = Column(StringEncryptedType(UnicodeText, FERNET_KEY, FernetEngine), nullable=True)
+    # When a render run took it (naive UTC): overlapping runs skip it until the lease is over
+    render_claimed_at = Column(DateTime, nullable=True)
+    # Naive UTC instant the reminder is due, so the dispatcher doesn't need the user's timezone.
+    # Kept in sync with date/hour and the user's timezone by the listeners below
+    due_at_utc = Column(DateTime, nullable=True)
+    # When the dispatcher handed it to a send worker (NULL: not dispatched yet)
+    dispatched_at = Column(DateTime, nullable=True)
+    # Only the worker that moves it to "sending" delivers it; `send` follows "sent" for older queries
+    status = Column(String(16), default=STATUS_PENDING, server_default=STATUS_PENDING, nullable=False)
+    # Naive UTC end of the "sending" lease, after which the reaper hands it back as "pending"
+    claim_expires_at = Column(DateTime, nullable=True)
+    # Owner of the "sending" claim: only that worker may release it or mark it failed
+    claim_token = Column(String(32), nullable=True)
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
     user = relationship("User", back_populates="reminders")
 
+    @staticmethod
+    def due_at_for(date, hour, timezone_name: str | None) -> datetime:
+        """Local date + hour in the user's timezone → naive UTC datetime."""
+        try:
+            tz = pytz.timezone(timezone_name or "UTC")
+        except (pytz.exceptions.UnknownTimeZoneError, ValueError):
+            tz = pytz.UTC
+        return tz.localize(datetime.combine(date, hour)).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+class PendingReminder(Base):
+    __tablename__ = "pending_reminder"
+
+    id = Column(String(32), primary_key=True, default=lambda: uuid4().hex)
+    user_id = Column(Integer, ForeignKey("user.id"), index=True)
+    text = Column(StringEncryptedType(UnicodeText, FERNET_KEY, FernetEngine), nullable=False)
+    date = Column(Date)
+    hour = Column(Time)
+    created_at = Column(DateTime, default=utc_now)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    user = relationship("User")
+
 
 class Message(Base):
     __tablename__ = "message"
+    __table_args__ = (
+        # Conversation history: a user's latest messages
+        Index("ix_message_user_id_created_at", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"))
     user_text = Column(StringEncryptedType(UnicodeText, FERNET_KEY, FernetEngine), nullable=False)
     response_text = Column(StringEncryptedType(UnicodeText, FERNET_KEY, FernetEngine), nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
     user = relationship("User", back_populates="messages")
 
 
 
 class Memory(Base):
     __tablename__ = "memory"
+    __table_args__ = (
+        Index("ix_memory_user_id_important", "user_id", "important"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"))
     key = Column(String(255), nullable=False)
     value = Column(Text, nullable=False)
     important = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
     user = relationship("User", back_populates="memories")
-    
-    
-    
-    
-    
-    
-    
-    
-    
 
-    
-    
-    
\ No newline at end of file
+
+
+class GraphCheckpoint(Base):
+    """ LangGraph checkpoints (agent conversation state), serialized by app.services.checkpointer """
+    __tablename__ = "graph_checkpoint"
+
+    thread_id = Column(String(150), primary_key=True)
+    checkpoint_ns = Column(String(150), primary_key=True, default="")
+    checkpoint_id = Column(String(64), primary_key=True)
+    parent_checkpoint_id = Column(String(64), nullable=True)
+    checkpoint_type = Column(String(64), nullable=False)
+    checkpoint = Column(LargeBinary, nullable=False)
+    metadata_type = Column(String(64), nullable=False)
+    checkpoint_metadata = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=utc_now)
+
+
+
+class GraphCheckpointWrite(Base):
+    """ Pending writes of a checkpoint (e.g. interrupts) """
+    __tablename__ = "graph_checkpoint_write"
+
+    thread_id = Column(String(150), primary_key=True)
+    checkpoint_ns = Column(String(150), primary_key=True, default="")
+    checkpoint_id = Column(String(64), primary_key=True)
+    task_id = Column(String(64), primary_key=True)
+    idx = Column(Integer, primary_key=True)
+    channel = Column(String(150), nullable=False)
+    value_type = Column(String(64), nullable=False)
+    value = Column(LargeBinary, nullable=False)
+    task_path = Column(String(255), nullable=False, default="")
+
+
+# ----- Keep Reminder.due_at_utc in sync -----
+def _user_timezone(connection, user_id: int | None) -> str | None:
+    if user_id is None:
+        return None
+    return connection.execute(select(User.timezone).where(User.id == user_id)).scalar()
+
+
+@event.listens_for(Reminder, "before_insert")
+def set_reminder_due_at_utc(mapper, connection, target: Reminder):
+    if target.due_at_utc is None and target.date and target.hour:
+        target.due_at_utc = Reminder.due_at_for(target.date, target.hour, _user_timezone(connection, target.user_id))
+
+
+@event.listens_for(Reminder, "before_update")
+def update_reminder_due_at_utc(mapper, connection, target: Reminder):
+    state = inspect(target)
+    if state.attrs.text.history.has_changes():
+        # The pre-rendered message no longer matches the text (and a render in flight must not save one)
+        target.rendered_text = None
+        target.render_claimed_at = None
+    if not any(state.attrs[name].history.has_changes() for name in ("date", "hour", "user_id")):
+        return
+    if target.date and target.hour:
+        target.due_at_utc = Reminder.due_at_for(target.date, target.hour, _user_timezone(connection, target.user_id))
+        # Rescheduled: let the dispatcher pick it up again at the new time
+        target.dispatched_at = None
+        if target.status == Reminder.STATUS_FAILED:
+            target.status = Reminder.STATUS_PENDING
+
+
+@event.listens_for(User, "after_update")
+def update_user_reminders_due_at_utc(mapper, connection, target: User):
+    if not inspect(target).attrs.timezone.history.has_changes():
+        return
+
+    pending = connection.execute(
+        select(Reminder.id, Reminder.date, Reminder.hour)
+        .where(Reminder.user_id == target.id, Reminder.send.is_(False), Reminder.date.is_not(None), Reminder.hour.is_not(None))
+    ).all()
+    if pending:
+        connection.execute(
+            update(Reminder.__table__)
+            .where(Reminder.__table__.c.id == bindparam("reminder_id"))
+            .values(due_at_utc=bindparam("due_at_utc"), dispatched_at=None),
+            [
+                {"reminder_id": reminder_id, "due_at_utc": Reminder.due_at_for(reminder_date, reminder_hour, target.timezone)}
+                for reminder_id, reminder_date, reminder_hour in pending
+            ],
+        )
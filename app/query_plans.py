@@ -0,0 +1,209 @@
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, desc, select, text
+from sqlalchemy.engine import make_url
+from app.models import Base, Memory, Message, Reminder
+from app.services.reminder_dispatcher import due_reminders_query, utc_now
+
+
+# Phone prefix of the seeded users: the only ones allowed in the target database
+BENCH_PHONE_PREFIX = "bench"
+
+
+def hot_queries(now: datetime, user_id: int) -> dict:
+    """
+      🛈 Las consultas calientes tal y como las lanza la aplicación, con las mismas columnas (las
+      filas completas salvo en el dispatcher), para que el plan incluya las lecturas de la tabla
+    """
+    return {
+        # dispatch_due_reminders (Celery Beat, every few seconds): only the ids
+        "dispatcher_due_reminders": due_reminders_query(now),
+        # GET /reminders/user/{id}/pending
+        "user_pending_reminders": (
+            select(Reminder)
+            .where(Reminder.user_id == user_id, Reminder.send.is_(False), Reminder.due_at_utc >= now)
+            .order_by(Reminder.due_at_utc)
+        ),
+        # get_active_reminders (reminder agent tool)
+        "user_active_reminders": select(Reminder).where(Reminder.user_id == user_id, Reminder.send.is_(False)),
+        # get_user_conversation_history (new session)
+        "conversation_history": (
+            select(Message)
+            .where(Message.user_id == user_id)
+            .order_by(desc(Message.created_at))
+            .limit(5)
+        ),
+        # GET /memories/user/{id}/important
+        "important_memories": select(Memory).where(Memory.user_id == user_id, Memory.important.is_(True)),
+    }
+
+
+def seed(engine, rows: int, users: int = 100_000, chunk: int = 50_000, now: datetime | None = None) -> list[int]:
+    """
+      🛈 Inserta `users` usuarios y `rows` filas en reminder, message y memory con SQL directo
+      (cifrando el texto una sola vez). Devuelve los ids de los usuarios
+    """
+    now = now or utc_now()
+    # A real Fernet token, so the full-row queries can decrypt what they read
+    ciphertext = Reminder.__table__.c.text.type.process_bind_param("bench", engine.dialect)
+    sqlite = engine.dialect.name == "sqlite"
+    rng = random.Random(42)
+
+    def value(v):
+        # Same text formats SQLAlchemy uses for SQLite DATE / TIME / DATETIME
+        if not sqlite:
+            return v
+        return v.strftime("%Y-%m-%d %H:%M:%S.%f") if isinstance(v, datetime) else v.isoformat()
+
+    with engine.begin() as conn:
+        existing_users = conn.execute(text('SELECT COUNT(*) FROM "user"')).scalar()
+        for start in range(existing_users, users, chunk):
+            conn.execute(
+                text('INSERT INTO "user" (phone_number, name, email, timezone) VALUES (:phone, :name, :email, :timezone)'),
+                [
+                    {"phone": f"{BENCH_PHONE_PREFIX}{i:09d}", "name": "Bench", "email": f"bench{i}@example.com", "timezone": "Europe/Madrid"}
+                    for i in range(start, min(start + chunk, users))
+                ],
+            )
+        # Ids don't start at 1 once the sequence has been used (a previous run cleaned up)
+        user_ids = list(conn.execute(text('SELECT id FROM "user" ORDER BY id')).scalars())
+
+    statements = {
+        "reminder": text(
+            "INSERT INTO reminder (user_id, text, date, hour, send, due_at_utc, created_at, updated_at) "
+            "VALUES (:user_id, :text, :date, :hour, :send, :due_at_utc, :created_at, :created_at)"
+        ),
+        "message": text(
+            "INSERT INTO message (user_id, user_text, response_text, created_at, updated_at) "
+            "VALUES (:user_id, :text, :text, :created_at, :created_at)"
+        ),
+        "memory": text(
+            'INSERT INTO memory (user_id, "key", value, important, created_at, updated_at) '
+            "VALUES (:user_id, 'k', 'v', :important, :created_at, :created_at)"
+        ),
+    }
+
+    with engine.begin() as conn:
+        for table, statement in statements.items():
+            for start in range(0, rows, chunk):
+                batch = []
+                for _ in range(min(chunk, rows - start)):
+                    # ~90% of reminders already sent, the rest spread over the past week and the next year
+                    due_at = now + timedelta(minutes=rng.randint(-7 * 24 * 60, 365 * 24 * 60))
+                    created_at = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+                    batch.append({
+                        "user_id": rng.choice(user_ids),
+                        "text": ciphertext,
+                        "date": value(due_at.date()),
+                        "hour": value(due_at.time().replace(microsecond=0)),
+                        "send": rng.random() < 0.9,
+                        "due_at_utc": value(due_at),
+                        "created_at": value(created_at),
+                        "important": rng.random() < 0.1,
+                    })
+                conn.execute(statement, batch)
+    return user_ids
+
+
+def check_scratch(engine):
+    """
+      🛈 Solo se siembra y se borra en una base vacía o con datos de una ejecución anterior: si hay
+      algún usuario que no sea del benchmark, se para
+    """
+    with engine.connect() as conn:
+        others = conn.execute(
+            text('SELECT COUNT(*) FROM "user" WHERE phone_number NOT LIKE :prefix'),
+            {"prefix": f"{BENCH_PHONE_PREFIX}%"},
+        ).scalar()
+    if others:
+        raise SystemExit(
+            f"{make_url(engine.url).render_as_string(hide_password=True)} tiene {others} usuarios que no son del "
+            "benchmark: usa una base de datos vacía o de pruebas"
+        )
+
+
+def cleanup(engine):
+    bench_users = 'SELECT id FROM "user" WHERE phone_number LIKE :prefix'
+    with engine.begin() as conn:
+        for table in ("reminder", "message", "memory"):
+            conn.execute(text(f"DELETE FROM {table} WHERE user_id IN ({bench_users})"), {"prefix": f"{BENCH_PHONE_PREFIX}%"})
+        conn.execute(text(f'DELETE FROM "user" WHERE id IN ({bench_users})'), {"prefix": f"{BENCH_PHONE_PREFIX}%"})
+
+
+def explain(conn, statement) -> list[str]:
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+    return [row[0] for row in conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}"))]
+
+
+def run_queries(engine, queries: dict, runs: int = 20) -> dict:
+    report = {}
+    with engine.connect() as conn:
+        for name, statement in queries.items():
+            plan = explain(conn, statement)
+            started_at = time.perf_counter()
+            for _ in range(runs):
+                conn.execute(statement).all()
+            report[name] = {
+                "avg_ms": round((time.perf_counter() - started_at) / runs * 1000, 3),
+                "plan": plan,
+            }
+            conn.rollback()
+    return report
+
+
+def benchmark(url: str, rows: int = 10_000_000, users: int = 100_000, compare: bool = True, keep: bool = False) -> dict:
+    """
+      🛈 Plan y latencia de cada consulta caliente con `rows` filas por tabla, con los índices
+      compuestos y (con `compare`) sin ellos.
+
+      Solo sobre una base vacía o de pruebas (ver check_scratch). Al terminar borra lo sembrado,
+      salvo con `keep`, que lo deja para la siguiente ejecución (sembrar 10M filas tarda)
+    """
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    check_scratch(engine)
+
+    try:
+        with engine.connect() as conn:
+            existing = conn.execute(text("SELECT COUNT(*) FROM reminder")).scalar()
+        started_at = time.perf_counter()
+        user_ids = seed(engine, max(rows - existing, 0), users=users)
+        if existing < rows:
+            print(f"Seeded {rows - existing} rows per table in {time.perf_counter() - started_at:.0f}s", file=sys.stderr)
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+
+        now = utc_now()
+        queries = hot_queries(now, user_id=user_ids[len(user_ids) // 2])
+        report = {"rows_per_table": rows, "users": users, "with_indexes": run_queries(engine, queries)}
+
+        if compare:
+            composite = [index for table in (Reminder.__table__, Message.__table__, Memory.__table__) for index in table.indexes if len(index.columns) > 1]
+            for index in composite:
+                index.drop(bind=engine)
+            # Fresh connections, so no prepared statement keeps the old plan
+            engine.dispose()
+            try:
+                report["without_composite_indexes"] = run_queries(engine, queries, runs=3)
+            finally:
+                for index in composite:
+                    index.create(bind=engine)
+    finally:
+        if not keep:
+            cleanup(engine)
+        engine.dispose()
+    return report
+
+
+if __name__ == "__main__":
+    # python -m app.query_plans <url> [filas] [--keep]   (10M filas por tabla por defecto; base vacía o de pruebas)
+    args = [arg for arg in sys.argv[1:] if arg != "--keep"]
+    if not args:
+        sys.exit("Uso: python -m app.query_plans <url> [filas] [--keep]")
+    rows = int(args[1]) if len(args) > 1 else 10_000_000
+    print(json.dumps(benchmark(args[0], rows=rows, keep="--keep" in sys.argv), indent=2, default=str))
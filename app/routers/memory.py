@@ -28,7 +28,7 @@ def get_user_memories(user_id: int, db: Session = Depends(get_db)):
 # Endpoint to get all user important memories
 @router.get("/user/{user_id}/important", response_model=list[schemas.MemoryOut])
 def get_user_important_memories(user_id: int, db: Session = Depends(get_db)):
-    user_important_memories = db.query(models.Memory).filter(models.Memory.user_id == user_id, models.Memory.important).all()
+    user_important_memories = db.query(models.Memory).filter(models.Memory.user_id == user_id, models.Memory.important.is_(True)).all()
     return user_important_memories
 
 
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
-from datetime import datetime, timezone
+from app.services.reminder_dispatcher import utc_now
 
 
 router = APIRouter(prefix="/reminders", tags=["reminders"])
@@ -32,21 +32,22 @@ def get_pending_user_reminders(user_id: int, db: Session = Depends(get_db)):
         db.query(models.Reminder)
         .filter(
             models.Reminder.user_id == user_id,
-            not models.Reminder.send,
-            models.Reminder.date_hour >= datetime.now(timezone.utc)
+            models.Reminder.send.is_(False),
+            models.Reminder.due_at_utc >= utc_now()
         )
-        .order_by(models.Reminder.date_hour.asc())
+        .order_by(models.Reminder.due_at_utc.asc())
         .all()
     )
 
 
 # Endpoint to update a user reminder
 @router.put("/{reminder_id}", response_model=schemas.ReminderOut)
-def update_reminder(reminder_id: int, reminder: schemas.ReminderUpdate, db: Session = Depends(get_db)):
+def update_reminder(reminder_id: int, reminder_update: schemas.ReminderUpdate, db: Session = Depends(get_db)):
     reminder = db.query(models.Reminder).filter(models.Reminder.id == reminder_id).first()
     if not reminder:
         raise HTTPException(status_code=404, detail="Reminder not found")
-    for field, value in reminder.dict(exclude_unset=True).items():
+    # due_at_utc follows date/hour through the Reminder listeners
+    for field, value in reminder_update.model_dump(exclude_unset=True).items():
         setattr(reminder, field, value)
     db.commit()
     db.refresh(reminder)
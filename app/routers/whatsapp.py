@@ -1,152 +1,83 @@
 from fastapi import APIRouter, Request, Depends
-import requests
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app import models
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from fastapi.responses import PlainTextResponse
 from app.config import WHATSAPP_ACCESS_TOKEN
 from fastapi.responses import JSONResponse
-from app.models import Message, Reminder
-from app.services.graph_runner import get_agent_response
-from app.services.whatsapp import send_whatsapp_message, send_confirm_reminder_whatsapp, mark_whatsapp_message_as_read
-from app.services.reminders_tasks import create_reminder
+from app.services.whatsapp_webhook import extract_sender_messages, load_users_by_phone, process_sender_messages
+from app.services.dedup import message_deduplicator
+from app.services.outbound import outbound_dispatcher
+from app.services.agents.intent_rules import intent_fast_path
+from app.services.session_store import session_store
+from app.services.summarizer import conversation_summarizer
+from app.services.llm import llm_registry
+from app.services.admission import admission_controller
+from app.services.webhook_queue import webhook_pipeline, message_coalescer, QueueFullError
 
 router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
 
-pending_reminders: dict[str, dict] = {}
 
 # Endpoint to receive whatsapp requests
 @router.post("/")
-async def receive_whatsapp(request: Request,  db: Session = Depends(get_db)):
-    data = await request.json()
-
-    if "entry" in data:
-        for entry in data["entry"]:
-            for change in entry.get("changes", []):
-                value = change.get("value", {})
-                messages = value.get("messages", [])
-
-                if not messages:
-                    continue
-                
-                # Group messages by sender
-                messages_by_sender = {}
-                for message in messages:
-                    sender = message["from"]
-
-                    if sender not in messages_by_sender:
-                        messages_by_sender[sender] = []
-                    
-                    messages_by_sender[sender].append(message)
-
-                
-                # Process each sender's messages
-                for sender, messages in messages_by_sender.items():
-                    # Obtener usuario de la conversación
-                    try:
-                        user = db.query(models.User).filter(models.User.phone_number == sender).first()
-                    except Exception as e:
-                        print(f"❌ Error getting user: {e}")
-                        user = None
-
-                    # Mark message as read
-                    last_msg = messages[-1]
-
-                    # 1) Mark message as read
-                    msg_id = last_msg.get("id")
-                    if msg_id:
-                        mark_whatsapp_message_as_read(msg_id)
-
-                    if not user:
-                        send_whatsapp_message(sender, 'Por favor, regístrate en la aplicación para poder ayudarte.')
-                        break
-
-
-                    # 2) If message is interactive
-                    if last_msg.get("type") == "interactive":
-                        interactive = last_msg.get("interactive", {})
-
-                        if interactive.get("type") == "button_reply":
-                            button_id = interactive["button_reply"]["id"]
-
-                            if button_id == "accept_reminder":
-                                reminder_data = pending_reminders.get(sender)
-            
-                                if reminder_data is None:
-                                    send_whatsapp_message(sender, 'Ese recordatorio ha sido descartado anteriormente!')
-
-                                if reminder_data and user: 
-                                    try:
-                                        # Los datos ya son objetos date y time
-                                        reminder_date = reminder_data["date"]
-                                        reminder_hour = reminder_data["hour"]
-                                        
-                                        print(f"🕐 Creando recordatorio - Fecha: {reminder_date}, Hora: {reminder_hour}, Usuario: {user.timezone}")
-                                        
-                                        create_reminder(db, user, reminder_data["text"], reminder_date, reminder_hour)
-
-                                        pending_reminders.pop(sender,None)
-                                        send_whatsapp_message(sender, 'Perfecto! Te lo recordare sin falta!')
-                                    except Exception as e:
-                                        print(f"❌ Error saving reminder: {e}")
-                                        print(f"❌ Tipo de datos - date: {type(reminder_data['date'])}, hour: {type(reminder_data['hour'])}")
-                            
-                            elif button_id == "reject_reminder":
-                                reminder_data = pending_reminders.get(sender)
-                                if reminder_data:
-                                    pending_reminders.pop(sender,None)
-                                    send_whatsapp_message(sender, 'No hay problema! Lo descarto.')
-                                else:
-                                    send_whatsapp_message(sender, 'Ese recordatorio ya esta confirmado ✅')
-
-                        continue
-
-
-                    # 3) If message is normal text
-                    if "text" in last_msg:
-                        # Formatear mensajes para la API de OpenAI
-                        combined_message = " ".join([msg["text"]["body"] for msg in messages])
-                        print(f"\n📩 Mensaje recibido de {sender}: {combined_message}")
-                        # Obtener respuesta del asistente
-                        agent_response = await get_agent_response(sender, combined_message, db)
-                        if agent_response is None:
-                            break
-                        
-                        if user and agent_response.reminder_is_complete:
-                            pending_reminders[sender] = {
-                                    "text": agent_response.reminder_text,
-                                    "date": agent_response.reminder_date,
-                                    "hour": agent_response.reminder_hour,
-                            }
-                            
-                            # Enviar mensaje de confirmación por WhatsApp
-                            send_confirm_reminder_whatsapp(sender, agent_response)                    
-                            break
-                        
-                        if user:
-                            if agent_response is None:
-                                break
-
-
-                            try:
-                                new_message = Message(
-                                    user_id=user.id,
-                                    user_text=combined_message,
-                                    response_text=agent_response.agent_response,
-                                )
-                                db.add(new_message)
-                                db.commit()
-                                db.refresh(new_message)
-
-                                # Enviar respuesta por WhatsApp
-                                send_whatsapp_message(sender, agent_response.agent_response)
-                                
-                            except Exception as e:
-                                print(f"❌ Error saving message: {e}")
-                    
+async def receive_whatsapp(request: Request,  db: AsyncSession = Depends(get_async_db)):
+    try:
+        data = await request.json()
+    except ValueError:
+        return JSONResponse(content={"error": "Invalid JSON payload"}, status_code=400)
+
+    # Drop messages already received (WhatsApp retries) before touching the DB or the agents
+    sender_messages = [
+        (sender, new_messages)
+        for sender, messages in extract_sender_messages(data)
+        if (new_messages := await message_deduplicator.filter_new(messages))
+    ]
+
+    # Debounce window: bursts from the same sender are merged into one agent run
+    if message_coalescer.enabled:
+        for sender, messages in sender_messages:
+            await message_coalescer.add(sender, messages)
+
+        return JSONResponse(content={"status": "ok"}, status_code=200)
+
+    # Ingest mode: enqueue and acknowledge right away
+    if webhook_pipeline.enabled:
+        for i, (sender, messages) in enumerate(sender_messages):
+            try:
+                await webhook_pipeline.submit(sender, messages)
+            except QueueFullError:
+                # WhatsApp redelivers the webhook later, so the pending ids must not count as seen
+                for _, pending in sender_messages[i:]:
+                    await message_deduplicator.forget(pending)
+                return JSONResponse(content={"error": "Queue is full"}, status_code=503)
+
+        return JSONResponse(content={"status": "ok"}, status_code=200)
+
+    # Process each sender's messages (users resolved in a single query)
+    users = await load_users_by_phone(db, [sender for sender, _ in sender_messages])
+    for sender, messages in sender_messages:
+        await process_sender_messages(sender, messages, db, users)
 
     return JSONResponse(content={"status": "ok"}, status_code=200)
-                            
+
+
+@router.get("/metrics")
+async def webhook_metrics():
+    from app.services.agents.agent_graph import get_agent_graph, is_agent_graph_built, speculation_stats
+
+    return {
+        "pipeline": await webhook_pipeline.metrics(),
+        "coalescer": message_coalescer.metrics(),
+        "dedup": message_deduplicator.metrics(),
+        "outbound": outbound_dispatcher.metrics(),
+        "intent_fast_path": intent_fast_path.metrics(),
+        "speculation": speculation_stats.metrics(),
+        # Only once the graph exists: building it here would open the checkpointer for a metrics read
+        "checkpointer": get_agent_graph().checkpointer.metrics() if is_agent_graph_built() else None,
+        "sessions": session_store.metrics(),
+        "summarizer": conversation_summarizer.metrics(),
+        "llm": llm_registry.metrics(),
+        "admission": admission_controller.metrics(),
+    }
 
 
 @router.get("/")
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from app.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONCURRENCY_PER_MODEL,
+    LLM_ADMISSION_QUEUE_SIZE,
+    LLM_ADMISSION_TIMEOUT,
+)
+from app.services.metrics import Histogram
+
+
+BUSY_REPLY = "Dame un momento 🙏 Ahora mismo estoy atendiendo muchos mensajes, escríbeme de nuevo en un ratito."
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def parse_model_limits(value: str) -> dict[str, int]:
+    """
+      🛈 "agent=24,classifier=32" -> {"agent": 24, "classifier": 32}
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        role, _, limit = item.partition("=")
+        limits[role.strip()] = int(limit)
+    return limits
+
+
+class AdmissionController:
+    """
+    Caps concurrent agent graph runs (and model calls per model role) so a traffic spike queues here
+    instead of fanning out into hundreds of simultaneous LLM calls that end in 429s and retries.
+
+    The wait queue is bounded and every wait has a deadline: when either is exceeded the caller
+    gets AdmissionRejected and answers with BUSY_REPLY.
+    """
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        model_limits: dict[str, int] | None = None,
+        max_queue: int = LLM_ADMISSION_QUEUE_SIZE,
+        wait_timeout: float = LLM_ADMISSION_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.model_limits = parse_model_limits(LLM_MAX_CONCURRENCY_PER_MODEL) if model_limits is None else model_limits
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._model_semaphores = {role: asyncio.Semaphore(limit) for role, limit in self.model_limits.items()}
+
+        # Metrics
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.model_in_flight = {role: 0 for role in self.model_limits}
+        self.model_timeouts = {role: 0 for role in self.model_limits}
+        self.queue_wait = Histogram()
+
+    async def _acquire(self, semaphore: asyncio.Semaphore, deadline: float) -> bool:
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+          🛈 Plaza para ejecutar el grafo; lanza AdmissionRejected si la cola está llena o se agota la espera
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected("queue_full")
+
+        started_at = time.monotonic()
+        self.waiting += 1
+        try:
+            acquired = await self._acquire(self._semaphore, started_at + self.wait_timeout)
+        finally:
+            self.waiting -= 1
+        self.queue_wait.observe(time.monotonic() - started_at)
+
+        if not acquired:
+            self.rejected["timeout"] += 1
+            raise AdmissionRejected("timeout")
+
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def model_slot(self, role: str):
+        """
+          🛈 Plaza para una llamada al modelo de un rol ("agent", "classifier"...); sin límite si el rol no tiene
+        """
+        semaphore = self._model_semaphores.get(role)
+        if semaphore is None:
+            yield
+            return
+
+        if not await self._acquire(semaphore, time.monotonic() + self.wait_timeout):
+            self.model_timeouts[role] += 1
+            raise AdmissionRejected("timeout")
+
+        self.model_in_flight[role] += 1
+        try:
+            yield
+        finally:
+            self.model_in_flight[role] -= 1
+            semaphore.release()
+
+    def metrics(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "model_limits": self.model_limits,
+            "max_queue": self.max_queue,
+            "wait_timeout_sec": self.wait_timeout,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "model_in_flight": self.model_in_flight,
+            "model_timeouts": self.model_timeouts,
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
+
+
+admission_controller = AdmissionController()
@@ -3,10 +3,12 @@ from pydantic_ai import Agent, RunContext
 from typing import List, Dict, Any
 from dataclasses import dataclass
 from pydantic import BaseModel
-from app.config import get_model
+from app.config import AGENT_CONTEXT_MODE
+from app.services.llm import llm_registry
+from app.services.agents.context import conversation_context_prompt, only_in_tool_mode
 
 # logfire.configure(send_to_logfire='never')
-model = get_model()
+model = llm_registry.model("agent")
 
 class AgentResponse(BaseModel):
     """Response model for the agent."""
@@ -23,6 +25,7 @@ class AgentDeps:
     email: str
     birth_date: date
     conversation_history: List[Dict[str, Any]]
+    context_mode: str = AGENT_CONTEXT_MODE
 
 system_prompt="""
     Act as a Spanish assistant, you are like the user’s best friend (but never say that you are an assistant or a secretary).  
@@ -34,8 +37,6 @@ system_prompt="""
     - strikethrough with ~text~  
     - (and no markdown or HTML)  
 
-    Use the tool `get_conversation_context` to retrieve the conversation history when needed.  
-
     # Main Functions
 
     1. **Day Organization**: Help the user plan their daily tasks by offering suggestions based on the information provided.  
@@ -78,6 +79,14 @@ agent = Agent(
 
 
 
+@agent.system_prompt
+def add_conversation_context(ctx: RunContext[AgentDeps]) -> str:
+    return conversation_context_prompt(
+        ctx.deps,
+        "Use the tool `get_conversation_context` to retrieve the conversation history when needed.",
+    )
+
+
 @agent.tool
 def get_user_name(ctx: RunContext) -> str:
     return ctx.deps.name
@@ -92,7 +101,7 @@ def get_user_email(ctx: RunContext) -> str:
     return ctx.deps.email
 
 
-@agent.tool
+@agent.tool(prepare=only_in_tool_mode)
 def get_conversation_context(ctx: RunContext) -> List[Dict[str, Any]]:
     """Obtiene el contexto de conversación del usuario"""
     history = ctx.deps.conversation_history or []
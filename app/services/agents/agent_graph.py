@@ -1,5 +1,6 @@
-from datetime import timezone
-from langgraph.checkpoint.memory import MemorySaver
+import asyncio
+import time
+from datetime import datetime, timezone
 from langgraph.graph import StateGraph, END
 from typing import Dict, Any, List
 from typing_extensions import TypedDict
@@ -9,8 +10,13 @@ from datetime import date
 
 # Import the agents
 from app.services.agents.agent import agent, AgentDeps
-from app.services.agents.reminder_agent import reminder_agent, ReminderDeps
+from app.services.agents.reminder_agent import reminder_agent, ReminderDeps, ReminderResponse
 from app.services.agents.classifier_agent import classifier_agent, IntentDeps
+from app.services.agents.intent_rules import intent_fast_path, looks_like_reminder
+from app.services.agents.date_parser import parse_reminder
+from app.config import AGENT_SPECULATIVE_MODE
+from app.services.checkpointer import build_checkpointer
+from app.services.admission import admission_controller
 
 
 # logfire.configure(send_to_logfire='never')
@@ -34,26 +40,62 @@ class AgentState(TypedDict):
     agent_results: str
     reminder_results: str
     intent: str
+    speculative_hit: bool
+
+
+
+class SpeculationStats:
+    """
+    Latency saved by speculative runs against the tokens spent on discarded ones.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.latency_saved_sec = 0.0
+        self.tokens_wasted = 0
+
+    def metrics(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "mode": AGENT_SPECULATIVE_MODE,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "cancelled_runs": self.cancelled,
+            "latency_saved_seconds": round(self.latency_saved_sec, 3),
+            "tokens_wasted": self.tokens_wasted,
+        }
+
+
+speculation_stats = SpeculationStats()
 
 
 
 # ----- Node: Agent -----
 async def agent_node(state: AgentState) -> Dict[str, Any]:
+    update, _ = await run_general_agent(state)
+    return update
+
+
+async def run_general_agent(state: AgentState) -> tuple[Dict[str, Any], int]:
+    """ Run the general agent, returns the state update and the tokens used """
 
     print("\n🤖 AGENT INICIADO")
 
-    result = await agent.run(
-        state["user_input"],
-        deps = AgentDeps(
-            user_id=state["user_id"],
-            name=state["name"],
-            surname=state["surname"],
-            phone_number=state["phone_number"],
-            email=state["email"],
-            birth_date=state["birth_date"],
-            conversation_history=state["conversation_history"]
+    async with admission_controller.model_slot("agent"):
+        result = await agent.run(
+            state["user_input"],
+            deps = AgentDeps(
+                user_id=state["user_id"],
+                name=state["name"],
+                surname=state["surname"],
+                phone_number=state["phone_number"],
+                email=state["email"],
+                birth_date=state["birth_date"],
+                conversation_history=state["conversation_history"]
+            )
         )
-    )
     
     output = result.output
     print(f"🤖 AGENT OUTPUT: {output}")
@@ -62,29 +104,50 @@ async def agent_node(state: AgentState) -> Dict[str, Any]:
         "agent_results": output,
         "is_reminder": output.is_reminder,
         "intent": "general"
-    }
+    }, result.usage().total_tokens or 0
 
 
 
 # ----- Node: Reminder agent -----
 async def get_reminder_node(state: AgentState) -> Dict[str, Any]:
-    print("\n📋 REMINDER INICIADO")
+    update, _ = await run_reminder_agent(state)
+    return update
 
 
-    result = await reminder_agent.run(
-        state["user_input"], 
-        deps=ReminderDeps(
+async def run_reminder_agent(state: AgentState) -> tuple[Dict[str, Any], int]:
+    """ Run the reminder agent, returns the state update and the tokens used """
+    print("\n📋 REMINDER INICIADO")
+
+    # Unambiguous requests ("recuérdame X el jueves a las 12:30") are resolved locally
+    parsed = parse_reminder(state["user_input"], datetime.now(state["timezone"] or timezone.utc))
+    if parsed.is_complete:
+        output = ReminderResponse(
             user_id=state["user_id"],
-            timezone=state["timezone"],
-            conversation_history=state["conversation_history"]
-        ),
-    )
+            agent_response="De acuerdo, crearé el recordatorio.",
+            reminder_text=parsed.reminder_text,
+            reminder_date=parsed.reminder_date,
+            reminder_hour=parsed.reminder_hour,
+            reminder_is_complete=True,
+        )
+        print(f"⚡ REMINDER FAST PATH: {output}")
+        return { "reminder_results": output}, 0
+
+    async with admission_controller.model_slot("agent"):
+        result = await reminder_agent.run(
+            state["user_input"], 
+            deps=ReminderDeps(
+                user_id=state["user_id"],
+                timezone=state["timezone"],
+                conversation_history=state["conversation_history"],
+                prefilled=parsed.slots(),
+            ),
+        )
     
 
     output = result.output
     print(f"📋 REMINDER OUTPUT: {output}")
 
-    return { "reminder_results": output}
+    return { "reminder_results": output}, result.usage().total_tokens or 0
 
 
 
@@ -114,26 +177,97 @@ async def get_next_user_message_node(state: AgentState) -> Dict[str, Any]:
 
 
 # ----- Node: Intent classifier agent  -----
-async def get_intent_classifier_node(state: AgentState) -> Dict[str, Any]:
-    print("\n🤖 INTENT CLASSIFIER INICIADO")
-
-    result = await classifier_agent.run(
-        state["user_input"],
-        deps=IntentDeps(
-            user_id= state["user_id"],
-            conversation_history= state["conversation_history"]
-        ),
-    )
+SPECULATIVE_RUNNERS = {
+    "general": run_general_agent,
+    "reminder": run_reminder_agent,
+}
+
+
+def get_speculative_branch(state: AgentState) -> str | None:
+    """ Branch to start at the same time as the classifier, according to AGENT_SPECULATIVE_MODE """
+    if AGENT_SPECULATIVE_MODE == "general":
+        return "general"
+    if AGENT_SPECULATIVE_MODE == "auto":
+        return "reminder" if looks_like_reminder(state["user_input"]) else "general"
+    return None
+
+
+async def run_classifier(state: AgentState) -> str:
+    async with admission_controller.model_slot("classifier"):
+        result = await classifier_agent.run(
+            state["user_input"],
+            deps=IntentDeps(
+                user_id= state["user_id"],
+                conversation_history= state["conversation_history"]
+            ),
+        )
 
     output = result.output
     print(f"🤖 INTENT CLASSIFIER OUTPUT: {output}")
+    intent_fast_path.store(state["user_input"], state["conversation_history"], output.intent)
+
+    return output.intent
+
+
+async def get_intent_classifier_node(state: AgentState) -> Dict[str, Any]:
+    print("\n🤖 INTENT CLASSIFIER INICIADO")
 
-    return { "intent": output.intent}
+    # Fast path: deterministic rules and recent classifications, no model call
+    intent = intent_fast_path.lookup(state["user_input"], state["conversation_history"])
+    if intent is not None:
+        print(f"⚡ INTENT CLASSIFIER FAST PATH: {intent}")
+        return { "intent": intent, "speculative_hit": False}
+
+    branch = get_speculative_branch(state)
+    if branch is None:
+        return { "intent": await run_classifier(state), "speculative_hit": False}
+
+    # Speculative mode: run the likely agent while the classifier decides
+    async def timed_branch():
+        branch_started_at = time.perf_counter()
+        update, tokens = await SPECULATIVE_RUNNERS[branch](state)
+        return update, tokens, time.perf_counter() - branch_started_at
+
+    started_at = time.perf_counter()
+    speculative_task = asyncio.create_task(timed_branch())
+    try:
+        intent = await run_classifier(state)
+    except BaseException:
+        speculative_task.cancel()
+        raise
+    classifier_time = time.perf_counter() - started_at
+
+    if intent == branch:
+        update, _, branch_time = await speculative_task
+        # Sequential run would have taken classifier_time + branch_time
+        saved = classifier_time + branch_time - (time.perf_counter() - started_at)
+        speculation_stats.hits += 1
+        speculation_stats.latency_saved_sec += saved
+        print(f"⚡ SPECULATIVE HIT ({branch}), ahorrados {saved:.2f}s")
+        return { **update, "intent": intent, "speculative_hit": True}
+
+    # Wrong guess: discard the result (or stop the run if it is still going)
+    speculation_stats.misses += 1
+    if speculative_task.done():
+        if not speculative_task.cancelled() and speculative_task.exception() is None:
+            speculation_stats.tokens_wasted += speculative_task.result()[1]
+    else:
+        speculative_task.cancel()
+        speculation_stats.cancelled += 1
+    print(f"🗑️ SPECULATIVE MISS ({branch} vs {intent})")
+
+    return { "intent": intent, "speculative_hit": False}
 
 
 
 # ----- Functions for the graph -----
 def route_task(state: AgentState):
+    # The speculative run already produced this intent's result
+    if state.get("speculative_hit"):
+        if state["intent"] == "reminder":
+            return is_reminder_complete(state)
+        return "get_next_user_message"
+
     if state["intent"] == "reminder":
         return "get_reminder"
     elif state["intent"] == "general":
@@ -153,8 +287,8 @@ def is_reminder_complete(state: AgentState):
 
 
 # Build the graph
-def build_agent_graph():
-    """ Build and return the agent graph """
+def build_agent_graph(checkpointer=None):
+    """ Build and return the agent graph (with the configured checkpointer unless one is given) """
 
     # Create the graph using the AgentState
     graph = StateGraph(AgentState)
@@ -171,7 +305,7 @@ def build_agent_graph():
     graph.add_conditional_edges(
         "intent_classifier",
         route_task,
-        ["get_reminder", "agent", END ]
+        ["get_reminder", "agent", "get_next_user_message", END ]
     )
 
     graph.add_conditional_edges(
@@ -186,16 +320,29 @@ def build_agent_graph():
 
 
     # Compile the graph
-    memory = MemorySaver()
-    compiled_graph = graph.compile(checkpointer=memory)
+    compiled_graph = graph.compile(checkpointer=checkpointer or build_checkpointer())
 
     return compiled_graph
 
 
 
 # ----- Export the graph -----
-try:
-    agent_graph = build_agent_graph()
-except Exception as e:
-    print(f"Error building agent graph: {e}")
-    raise
\ No newline at end of file
+_agent_graph = None
+
+
+def get_agent_graph():
+    """
+      🛈 Grafo compilado, construido en el primer uso (o en el arranque de la API, ver `main.lifespan`)
+    """
+    global _agent_graph
+    if _agent_graph is None:
+        try:
+            _agent_graph = build_agent_graph()
+        except Exception as e:
+            print(f"Error building agent graph: {e}")
+            raise
+    return _agent_graph
+
+
+def is_agent_graph_built() -> bool:
+    return _agent_graph is not None
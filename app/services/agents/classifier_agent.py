@@ -2,12 +2,14 @@ from pydantic_ai import Agent, ModelRetry, RunContext
 from dataclasses import dataclass
 import logfire
 from pydantic import BaseModel
-from app.config import get_classifier_model
+from app.config import AGENT_CONTEXT_MODE
+from app.services.llm import llm_registry
+from app.services.agents.context import conversation_context_prompt, only_in_tool_mode
 from typing import List, Dict, Any
 
 
 logfire.configure(send_to_logfire='never')
-model = get_classifier_model()
+model = llm_registry.model("classifier")
 
 GENERAL = "general"
 REMINDER = "reminder"
@@ -20,6 +22,7 @@ class Intent(BaseModel):
 class IntentDeps:
     user_id: int
     conversation_history: List[Dict[str, Any]]
+    context_mode: str = AGENT_CONTEXT_MODE
 
 system_prompt = f"""
     You are an intent classifier agent.  
@@ -32,7 +35,6 @@ system_prompt = f"""
     - {UNKNOWN}: Use ONLY when the message is clearly the end of the conversation (e.g., "Adiós", "Hasta luego", "Vale") OR when the message has no meaning (random characters, nonsense).  
 
     # Context usage
-    - You must ALWAYS call the tool `get_conversation_context` to retrieve the entire conversation history BEFORE classifying.  
     - The classification must ALWAYS take into account both:  
     1. The user’s latest message.  
     2. The full conversation context.  
@@ -87,7 +89,14 @@ def validate_result(ctx: RunContext, result: Intent) -> Intent:
         )
     return result
 
-@classifier_agent.tool
+@classifier_agent.system_prompt
+def add_conversation_context(ctx: RunContext[IntentDeps]) -> str:
+    return conversation_context_prompt(
+        ctx.deps,
+        "You must ALWAYS call the tool `get_conversation_context` to retrieve the entire conversation history BEFORE classifying.",
+    )
+
+@classifier_agent.tool(prepare=only_in_tool_mode)
 def get_conversation_context(ctx: RunContext) -> List[Dict[str, Any]]:
     """Obtiene el contexto de conversación del usuario"""
     history = ctx.deps.conversation_history or []
@@ -0,0 +1,76 @@
+import math
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, List, Dict, Any
+from app.config import AGENT_CONTEXT_MODE, AGENT_CONTEXT_TOKEN_BUDGET
+
+if TYPE_CHECKING:
+    from pydantic_ai import RunContext
+    from pydantic_ai.tools import ToolDefinition
+
+
+TOOL_MODE = "tool"
+INJECT_MODE = "inject"
+
+ROLE_LABELS = {"user": "Usuario", "assistant": "Asistente", "system": "Contexto"}
+MAX_MESSAGE_CHARS = 400
+
+
+def estimate_tokens(text: str) -> int:
+    """
+      🛈 Aproximación barata (~4 caracteres por token), suficiente para recortar el historial
+    """
+    return math.ceil(len(text) / 4)
+
+
+def render_conversation_history(history: List[Dict[str, Any]] | None, token_budget: int = AGENT_CONTEXT_TOKEN_BUDGET) -> str:
+    """
+      🛈 Historial en formato compacto ("Usuario: ..." / "Asistente: ..."), quedándose con los
+      mensajes más recientes que quepan en `token_budget`
+    """
+    lines = []
+    used = 0
+    for message in reversed(history or []):
+        content = " ".join(str(message.get("content") or "").split())
+        if not content:
+            continue
+        if len(content) > MAX_MESSAGE_CHARS:
+            content = content[:MAX_MESSAGE_CHARS] + "…"
+
+        line = f"{ROLE_LABELS.get(message.get('role'), message.get('role', '?'))}: {content}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+
+    return "\n".join(reversed(lines))
+
+
+def render_today(tz: timezone | None) -> str:
+    return datetime.now(tz or timezone.utc).strftime("%A %d/%m/%Y %H:%M")
+
+
+def conversation_context_prompt(deps, tool_instruction: str, include_today: bool = False) -> str:
+    """
+      🛈 En modo "tool" devuelve la instrucción de usar la herramienta; en modo "inject" el propio contexto
+    """
+    if deps.context_mode != INJECT_MODE:
+        return tool_instruction
+
+    history = render_conversation_history(deps.conversation_history)
+    sections = [
+        "# Conversation context",
+        "Recent messages, oldest first. They are already here: do not call any tool to fetch them.",
+        history or "(no previous messages)",
+    ]
+    if include_today:
+        sections.append(f"Today (user's timezone) is {render_today(deps.timezone)}. Use it to resolve relative dates.")
+    return "\n".join(sections)
+
+
+async def only_in_tool_mode(ctx: "RunContext", tool_def: "ToolDefinition") -> "ToolDefinition | None":
+    """
+      🛈 `prepare` para las herramientas que sobran cuando el contexto ya va en el prompt
+    """
+    return None if ctx.deps.context_mode == INJECT_MODE else tool_def
+
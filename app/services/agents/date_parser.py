@@ -0,0 +1,270 @@
+import json
+import re
+import sys
+import time as time_module
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+
+
+WEEKDAYS = {
+    "lunes": 0, "martes": 1, "miercoles": 2, "miércoles": 2, "jueves": 3,
+    "viernes": 4, "sabado": 5, "sábado": 5, "domingo": 6,
+}
+
+MONTHS = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+
+TRIGGER_PATTERN = re.compile(
+    r"^\s*(?:oye,?\s+)?(?:por favor,?\s+)?"
+    r"(?:recu[eé]rdame|recordarme|av[ií]same|ap[uú]ntame|apunta|"
+    r"(?:crea|pon|ponme|hazme)\s+(?:un|una)\s+(?:recordatorio|alarma|aviso)|"
+    r"(?:un\s+)?recordatorio|(?:una\s+)?alarma)"
+    r"(?:\s+(?:para|de|que)\b)?\s*",
+    re.IGNORECASE,
+)
+
+WEEKDAY_NAMES = "|".join(WEEKDAYS)
+MONTH_NAMES = "|".join(MONTHS)
+
+DATE_PATTERNS = [
+    ("day_after_tomorrow", re.compile(r"\bpasado\s+ma[nñ]ana\b", re.IGNORECASE)),
+    # "mañana" as a day, not "por/de la mañana"
+    ("tomorrow", re.compile(r"(?<!la\s)\bma[nñ]ana\b", re.IGNORECASE)),
+    # "esta tarde/noche" also sets the period of a bare hour that follows ("esta noche a las 10")
+    ("today", re.compile(r"\b(?:hoy|esta\s+(tarde|noche))\b", re.IGNORECASE)),
+    ("weekday", re.compile(rf"\b(?:el\s+|este\s+|el\s+pr[oó]ximo\s+|el\s+que\s+viene\s+)?({WEEKDAY_NAMES})\b", re.IGNORECASE)),
+    ("numeric", re.compile(r"\b(?:el\s+(?:d[ií]a\s+)?)?(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2,4}))?\b", re.IGNORECASE)),
+    ("month_name", re.compile(rf"\b(?:el\s+(?:d[ií]a\s+)?)?(\d{{1,2}})\s+de\s+({MONTH_NAMES})(?:\s+(?:de|del)\s+(\d{{4}}))?\b", re.IGNORECASE)),
+]
+
+TIME_PATTERN = re.compile(
+    r"\b(?P<prefix>a\s+las?\s+|las?\s+)?"
+    r"(?P<hour>\d{1,2})(?:[:.](?P<minute>\d{2})|(?P<suffix>h)\b)?"
+    r"(?:\s+y\s+(?P<fraction>media|cuarto)|\s+menos\s+(?P<minus>cuarto))?"
+    r"(?:\s+(?:de\s+la\s+|por\s+la\s+|del\s+)?(?P<period>ma[nñ]ana|tarde|noche|madrugada)|\s*(?P<meridiem>am|pm)\b)?",
+    re.IGNORECASE,
+)
+NOON_PATTERN = re.compile(r"\ba\s+(?:las\s+12\s+del\s+)?mediod[ií]a\b", re.IGNORECASE)
+VAGUE_TIME_PATTERN = re.compile(
+    r"\b(?:sobre|hacia|sobre\s+las|hacia\s+las|m[aá]s\s+o\s+menos|a\s+eso\s+de|a\s+primera\s+hora|"
+    r"por\s+la\s+(?:ma[nñ]ana|tarde|noche)|de\s+(?:ma[nñ]ana|tarde|noche)|en\s+un\s+rato|luego)\b",
+    re.IGNORECASE,
+)
+
+# Date words still in the text after the matches ("el lunes 5 ..."): the model has to read those
+LEFTOVER_DATE_PATTERN = re.compile(
+    rf"\b(?:\d{{1,4}}|d[ií]as?|pr[oó]xim[oa]|que\s+viene|semana|{WEEKDAY_NAMES}|{MONTH_NAMES})\b",
+    re.IGNORECASE,
+)
+
+FILLER_PATTERN = re.compile(r"^(?:(?:que\s+)?tengo\s+que\s+|que\s+|de\s+|para\s+|a\s+)|[\s,.;:!?¡¿]+$", re.IGNORECASE)
+
+
+@dataclass
+class ParsedReminder:
+    """Slots found in a message by the local parser."""
+    reminder_text: str | None = None
+    reminder_date: date | None = None
+    reminder_hour: time | None = None
+    has_trigger: bool = False
+    ambiguous: list[str] = field(default_factory=list)
+    in_past: bool = False
+
+    @property
+    def is_complete(self) -> bool:
+        return bool(self.has_trigger and self.reminder_text and self.reminder_date and self.reminder_hour and not self.ambiguous and not self.in_past)
+
+    def slots(self) -> dict:
+        return {
+            "reminder_text": self.reminder_text,
+            "reminder_date": self.reminder_date.isoformat() if self.reminder_date else None,
+            "reminder_hour": self.reminder_hour.strftime("%H:%M") if self.reminder_hour else None,
+        }
+
+
+def _resolve_date(kind: str, match: re.Match, today: date) -> date | None:
+    if kind == "today":
+        return today
+    if kind == "tomorrow":
+        return today + timedelta(days=1)
+    if kind == "day_after_tomorrow":
+        return today + timedelta(days=2)
+    if kind == "weekday":
+        days_ahead = (WEEKDAYS[match.group(1).lower()] - today.weekday()) % 7
+        # "el jueves" said on a Thursday: today or next week? Leave it to the model
+        return today + timedelta(days=days_ahead) if days_ahead else None
+
+    if kind == "numeric":
+        day, month, year = int(match.group(1)), int(match.group(2)), match.group(3)
+    else:
+        day, month, year = int(match.group(1)), MONTHS[match.group(2).lower()], match.group(3)
+
+    try:
+        if year:
+            year = int(year)
+            return date(year + 2000 if year < 100 else year, month, day)
+        candidate = date(today.year, month, day)
+        return candidate if candidate >= today else date(today.year + 1, month, day)
+    except ValueError:
+        return None
+
+
+def _resolve_time(match: re.Match, day_period: str | None = None) -> tuple[time | None, bool, int]:
+    """
+    Returns the time, whether it is ambiguous and how many days it moves the date: "las 12 de
+    la noche" is 00:00 of the next day. `day_period` is the "tarde"/"noche" of "esta tarde/noche".
+    """
+    hour = int(match.group("hour"))
+    minute = int(match.group("minute")) if match.group("minute") else 0
+
+    if match.group("fraction") == "media":
+        minute = 30
+    elif match.group("fraction") == "cuarto":
+        minute = 15
+    elif match.group("minus"):
+        hour, minute = hour - 1, 45
+
+    period = (match.group("period") or match.group("meridiem") or "").lower()
+    if day_period:
+        # "esta noche a las 10 de la mañana": contradictory, leave it to the model
+        if period and period not in (day_period, "pm"):
+            return None, True, 0
+        period = day_period
+
+    days = 0
+    if period == "noche" and hour == 12:
+        hour, days = 0, 1
+    elif period == "noche" and 0 < hour < 6:
+        # "las 2 de la noche": tonight's 02:00 (tomorrow) or 14:00? Leave it to the model
+        return None, True, 0
+    elif period in ("tarde", "noche", "pm") and hour < 12:
+        hour += 12
+    elif period in ("mañana", "manana", "madrugada", "am") and hour == 12:
+        hour = 0
+
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return None, True, 0
+
+    # "a las 9" or "a las 9 y media" with no period could be morning or evening ("cenar mañana a las 9");
+    # written 24-hour times ("9:00", "9h") are taken as said
+    explicit = bool(period) or bool(match.group("minute") or match.group("suffix")) or hour >= 13 or hour == 0
+    return time(hour, minute), not explicit, days
+
+
+def parse_reminder(message: str, now: datetime) -> ParsedReminder:
+    """
+      🛈 Extrae texto, fecha y hora de un recordatorio en español sin llamar al modelo.
+
+      `now` debe estar en la zona horaria del usuario.
+    """
+    parsed = ParsedReminder()
+    remaining = message.strip()
+
+    trigger = TRIGGER_PATTERN.match(remaining)
+    if trigger:
+        parsed.has_trigger = True
+        remaining = remaining[trigger.end():]
+
+    # Dates
+    dates = []
+    day_period = None
+    for kind, pattern in DATE_PATTERNS:
+        for match in pattern.finditer(remaining):
+            resolved = _resolve_date(kind, match, now.date())
+            dates.append(resolved)
+            if kind == "today" and match.group(1):
+                day_period = match.group(1).lower()
+            remaining = remaining[:match.start()] + " " * (match.end() - match.start()) + remaining[match.end():]
+
+    if len(set(dates)) > 1 or None in dates:
+        parsed.ambiguous.append("date")
+    elif dates:
+        parsed.reminder_date = dates[0]
+
+    # Times
+    times = []
+    if NOON_PATTERN.search(remaining):
+        times.append((time(12, 0), False, 0))
+        remaining = NOON_PATTERN.sub(" ", remaining)
+
+    for match in TIME_PATTERN.finditer(remaining):
+        # A bare number is only a time when it looks like one ("a las 9", "9:30", "9h", "9 de la tarde")
+        if not any(match.group(name) for name in ("prefix", "minute", "suffix", "period", "meridiem")):
+            continue
+        times.append(_resolve_time(match, day_period))
+        remaining = remaining[:match.start()] + " " * (match.end() - match.start()) + remaining[match.end():]
+
+    if len({(t, days) for t, _, days in times}) > 1 or any(t is None or ambiguous for t, ambiguous, _ in times):
+        parsed.ambiguous.append("time")
+    elif times and times[0][2] and not parsed.reminder_date:
+        # "a las 12 de la noche" moves the day: without a date the model has to pick both
+        parsed.ambiguous.append("time")
+    elif times:
+        parsed.reminder_hour, _, days = times[0]
+        if days:
+            parsed.reminder_date += timedelta(days=days)
+
+    # "sobre las 9", "por la tarde"... anything vague left after the exact matches
+    if VAGUE_TIME_PATTERN.search(remaining):
+        if "time" not in parsed.ambiguous:
+            parsed.ambiguous.append("time")
+        remaining = VAGUE_TIME_PATTERN.sub(" ", remaining)
+
+    # Text: what is left once trigger, date and time are removed
+    text = re.sub(r"\s+", " ", remaining).strip(" ,.;:!?¡¿")
+    text = re.sub(r"\b(?:el|este|a|para|de)\s*$", "", text, flags=re.IGNORECASE).strip(" ,.;:!?¡¿")
+    previous = None
+    while previous != text:
+        previous = text
+        text = FILLER_PATTERN.sub("", text).strip()
+    parsed.reminder_text = text or None
+
+    if text and LEFTOVER_DATE_PATTERN.search(text) and "date" not in parsed.ambiguous:
+        parsed.ambiguous.append("date")
+
+    if parsed.reminder_date and parsed.reminder_hour:
+        parsed.in_past = datetime.combine(parsed.reminder_date, parsed.reminder_hour) <= now.replace(tzinfo=None)
+
+    return parsed
+
+
+def evaluate_corpus(path: str) -> dict:
+    """
+      🛈 Evalúa el parser contra un corpus JSONL:
+      {"text": ..., "now": "YYYY-MM-DDTHH:MM", "expected": {"reminder_text", "reminder_date", "reminder_hour"} | null}
+    """
+    total = correct = short_circuited = 0
+    errors = []
+
+    started_at = time_module.perf_counter()
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            if not line.strip():
+                continue
+            sample = json.loads(line)
+            total += 1
+
+            parsed = parse_reminder(sample["text"], datetime.fromisoformat(sample["now"]))
+            predicted = parsed.slots() if parsed.is_complete else None
+            short_circuited += predicted is not None
+
+            if predicted == sample["expected"]:
+                correct += 1
+            else:
+                errors.append({"text": sample["text"], "expected": sample["expected"], "predicted": predicted})
+    elapsed = time_module.perf_counter() - started_at
+
+    return {
+        "samples": total,
+        "accuracy": round(correct / total, 4) if total else 0.0,
+        "short_circuit_rate": round(short_circuited / total, 4) if total else 0.0,
+        "avg_latency_us": round(elapsed / total * 1e6, 2) if total else 0.0,
+        "errors": errors,
+    }
+
+
+if __name__ == "__main__":
+    # python -m app.services.agents.date_parser app/services/agents/corpus/dates.jsonl
+    print(json.dumps(evaluate_corpus(sys.argv[1]), indent=2, ensure_ascii=False, default=str))
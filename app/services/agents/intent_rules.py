@@ -0,0 +1,197 @@
+import json
+import re
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Any
+
+
+GENERAL = "general"
+REMINDER = "reminder"
+UNKNOWN = "unknown"
+
+
+GREETINGS = {
+    "hola", "holi", "holaa", "buenas", "hey", "ey", "saludos",
+    "buenos dias", "buenas tardes", "buenas noches",
+    "que tal", "hola que tal", "como estas", "hola como estas", "que tal estas", "hola que tal estas",
+    "hola buenas", "hola buenos dias", "hola buenas tardes", "hola buenas noches",
+}
+
+FAREWELLS = {
+    "adios", "hasta luego", "hasta manana", "hasta pronto", "nos vemos", "chao", "chau", "agur",
+    "vale", "vale hasta luego", "vale adios", "ok", "okey", "okay", "vale ok", "perfecto adios",
+    "buenas noches adios", "venga hasta luego", "venga adios",
+}
+
+REMINDER_PATTERN = re.compile(
+    r"\b("
+    r"recuerdame|recordarme|recuerdamelo|recordatorios?|alarmas?|"
+    r"avisame|avisarme|ponme una alarma|pon una alarma|programa un aviso"
+    r")\b"
+)
+
+DATE_TIME_HINT_PATTERN = re.compile(
+    r"\b(manana|pasado manana|hoy|lunes|martes|miercoles|jueves|viernes|sabado|domingo|a las \d{1,2})\b"
+    r"|\b\d{1,2}:\d{2}\b|\b\d{1,2}/\d{1,2}(/\d{2,4})?\b"
+)
+
+KEYBOARD_ROWS = ("qwertyuiop", "asdfghjkl", "zxcvbnm")
+VOWELS = set("aeiou")
+
+
+def normalize_text(text: str) -> str:
+    """
+      🛈 Minúsculas, sin tildes, sin signos ni emojis y con espacios simples
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^a-z0-9\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _is_nonsense(normalized: str) -> bool:
+    if not normalized:
+        return True
+
+    tokens = normalized.split()
+    if len(tokens) != 1:
+        return False
+
+    token = tokens[0]
+    if token.isdigit():
+        return False
+
+    # Keyboard mashing ("asdfgh", "qwerty")
+    if len(token) >= 4 and any(token[i:i + 4] in row for row in KEYBOARD_ROWS for i in range(len(token) - 3)):
+        return True
+
+    # Long words without vowels ("jjjjj", "xkcdzz")
+    return len(token) >= 5 and not VOWELS.intersection(token)
+
+
+def classify_by_rules(text: str) -> str | None:
+    """
+      🛈 Clasificación determinista; devuelve None cuando las reglas no están seguras
+    """
+    normalized = normalize_text(text)
+
+    if REMINDER_PATTERN.search(normalized):
+        return REMINDER
+    if normalized in GREETINGS:
+        return GENERAL
+    if normalized in FAREWELLS:
+        return UNKNOWN
+    if _is_nonsense(normalized):
+        return UNKNOWN
+    return None
+
+
+def looks_like_reminder(text: str) -> bool:
+    """
+      🛈 Heurística barata (no concluyente) para adelantar el agente de recordatorios
+    """
+    normalized = normalize_text(text)
+    return bool(REMINDER_PATTERN.search(normalized) or DATE_TIME_HINT_PATTERN.search(text.lower()) or DATE_TIME_HINT_PATTERN.search(normalized))
+
+
+class IntentFastPath:
+    """
+    Rule-based pre-classifier plus a bounded cache of recent model classifications.
+
+    The cache key includes the assistant's last turn, since short answers ("a las 5", "sí")
+    depend on what the assistant asked before.
+    """
+    def __init__(self, max_cache_size: int = 2048):
+        self.max_cache_size = max_cache_size
+        self._cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+        # Metrics
+        self.rule_hits = 0
+        self.cache_hits = 0
+        self.model_calls = 0
+
+    def _cache_key(self, text: str, conversation_history: List[Dict[str, Any]] | None) -> tuple[str, str]:
+        # The current user message is already at the end of the history: look past it
+        last_reply = next(
+            (turn.get("content", "") for turn in reversed(conversation_history or []) if turn.get("role") == "assistant"),
+            "",
+        )
+        return normalize_text(text), normalize_text(str(last_reply))[-200:]
+
+    def lookup(self, text: str, conversation_history: List[Dict[str, Any]] | None = None) -> str | None:
+        intent = classify_by_rules(text)
+        if intent is not None:
+            self.rule_hits += 1
+            return intent
+
+        key = self._cache_key(text, conversation_history)
+        intent = self._cache.get(key)
+        if intent is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return intent
+
+        self.model_calls += 1
+        return None
+
+    def store(self, text: str, conversation_history: List[Dict[str, Any]] | None, intent: str):
+        key = self._cache_key(text, conversation_history)
+        self._cache[key] = intent
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.max_cache_size:
+            self._cache.popitem(last=False)
+
+    def metrics(self) -> dict:
+        total = self.rule_hits + self.cache_hits + self.model_calls
+        return {
+            "rule_hits": self.rule_hits,
+            "cache_hits": self.cache_hits,
+            "model_calls": self.model_calls,
+            "hit_rate": round((self.rule_hits + self.cache_hits) / total, 4) if total else 0.0,
+            "cached_entries": len(self._cache),
+        }
+
+
+intent_fast_path = IntentFastPath()
+
+
+def evaluate_corpus(path: str) -> dict:
+    """
+      🛈 Evalúa las reglas contra un corpus JSONL etiquetado ({"text": ..., "intent": ...})
+    """
+    total = covered = correct = 0
+    errors = []
+
+    started_at = time.perf_counter()
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            if not line.strip():
+                continue
+            sample = json.loads(line)
+            total += 1
+
+            predicted = classify_by_rules(sample["text"])
+            if predicted is None:
+                continue
+
+            covered += 1
+            if predicted == sample["intent"]:
+                correct += 1
+            else:
+                errors.append({"text": sample["text"], "expected": sample["intent"], "predicted": predicted})
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "samples": total,
+        "coverage": round(covered / total, 4) if total else 0.0,
+        "precision": round(correct / covered, 4) if covered else 0.0,
+        "avg_latency_us": round(elapsed / total * 1e6, 2) if total else 0.0,
+        "errors": errors,
+    }
+
+
+if __name__ == "__main__":
+    # python -m app.services.agents.intent_rules app/services/agents/corpus/intents.jsonl
+    print(json.dumps(evaluate_corpus(sys.argv[1]), indent=2, ensure_ascii=False))
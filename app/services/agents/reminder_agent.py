@@ -2,13 +2,15 @@ from pydantic_ai import Agent,ModelRetry, RunContext
 from dataclasses import dataclass
 from datetime import date, time, timezone as tz, datetime
 from pydantic import BaseModel
-from app.config import get_model
+from app.config import AGENT_CONTEXT_MODE
+from app.services.llm import llm_registry
+from app.services.agents.context import conversation_context_prompt, only_in_tool_mode
 from typing import List, Dict, Any
 
 
 
 # logfire.configure(send_to_logfire='never')
-model = get_model()
+model = llm_registry.model("agent")
 
 
 class ReminderResponse(BaseModel):
@@ -25,6 +27,8 @@ class ReminderDeps:
     user_id: int
     timezone: tz = tz.utc
     conversation_history: List[Dict[str, Any]] = None
+    prefilled: Dict[str, Any] = None  # Slots already found by the local date parser
+    context_mode: str = AGENT_CONTEXT_MODE
 
 system_prompt="""
     You are a Reminder Assistant. Your goal is to help the user create clear, complete reminders.
@@ -33,10 +37,9 @@ system_prompt="""
     ✅ Only accept date and time when the user states them explicitly and unambiguously.  
 
     # Tools
-    - You must ALWAYS use `get_conversation_context` to have the full context of the conversation in order to better understand the reminder.  
     - If the conversation history contains information about a reminder that was already created or saved before, you must IGNORE it and only consider the user’s current request.  
     - Use `get_active_reminders` ONLY when the user explicitly asks to view their pending reminders; never reconstruct a reminders list from conversation context.  
-    - You must ALWAYS call `get_today_date` to determine the current day and year, and use it to resolve any relative expressions like 'mañana', 'el jueves', 'next Monday', etc., into an absolute YYYY-MM-DD date.  
+    - Use today's date to resolve any relative expressions like 'mañana', 'el jueves', 'next Monday', etc., into an absolute YYYY-MM-DD date.  
 
     # Language Policy
     - All clarifying questions to the user must always be asked in **Spanish**, short and direct.  
@@ -66,7 +69,7 @@ system_prompt="""
 
     4. Ambiguity rules:  
     - “por la tarde”, “a primera hora”, “sobre las 9” → ambiguous → ask for an exact HH:MM.  
-    - “el jueves” or “mañana” → resolve to YYYY-MM-DD using `get_today_date`. If unclear, ask.  
+    - “el jueves” or “mañana” → resolve to YYYY-MM-DD using today's date. If unclear, ask.  
     - Multiple candidate dates/times → ask the user to choose one exact date/time.  
     - If reminder text itself is unclear → ask to clarify the text first.  
 
@@ -143,6 +146,27 @@ reminder_agent = Agent(
     retries=3
 )
 
+@reminder_agent.system_prompt
+def add_conversation_context(ctx: RunContext[ReminderDeps]) -> str:
+    return conversation_context_prompt(
+        ctx.deps,
+        "You must ALWAYS use `get_conversation_context` to have the full context of the conversation in order to better understand the reminder. "
+        "You must ALWAYS call `get_today_date` to determine the current day and year.",
+        include_today=True,
+    )
+
+
+@reminder_agent.system_prompt
+def add_prefilled_slots(ctx: RunContext[ReminderDeps]) -> str:
+    slots = {key: value for key, value in (ctx.deps.prefilled or {}).items() if value}
+    if not slots:
+        return ""
+    return (
+        "The local parser already extracted these values from the user's message; trust them and "
+        f"only ask for what is still missing or ambiguous: {slots}"
+    )
+
+
 @reminder_agent.output_validator
 def validate_result(ctx: RunContext, result: ReminderResponse) -> ReminderResponse:
     if result.reminder_is_complete:
@@ -166,7 +190,7 @@ def validate_result(ctx: RunContext, result: ReminderResponse) -> ReminderRespon
 
 # --- Tools ---
 
-@reminder_agent.tool
+@reminder_agent.tool(prepare=only_in_tool_mode)
 def get_today_date(ctx: RunContext) -> datetime:
     now = datetime.now(ctx.deps.timezone or tz.UTC)
     return now.strftime("%A %d/%m/%Y %H:%M")
@@ -176,7 +200,7 @@ def get_today_date(ctx: RunContext) -> datetime:
 def get_user_id(ctx: RunContext) -> int:
     return ctx.deps.user_id
 
-@reminder_agent.tool
+@reminder_agent.tool(prepare=only_in_tool_mode)
 def get_conversation_context(ctx: RunContext) -> List[Dict[str, Any]]:
     """Obtiene el contexto de conversación del usuario"""
     history = ctx.deps.conversation_history or []
@@ -184,19 +208,21 @@ def get_conversation_context(ctx: RunContext) -> List[Dict[str, Any]]:
 
 
 @reminder_agent.tool
-def get_active_reminders(ctx: RunContext) -> List[Dict[str, Any]]:
+async def get_active_reminders(ctx: RunContext) -> List[Dict[str, Any]]:
     """Obtiene los recordatarios activos del usuario"""
     print("Recopilando los recordatorios")
     user_id = ctx.deps.user_id
     # Importar las dependencias necesarias
-    from app.database import get_db
+    from sqlalchemy import select
+    from app.database import AsyncSessionLocal
     from app import models
-    
-    # Obtener la sesión de base de datos
-    db = next(get_db())
 
     try:
-        reminders = db.query(models.Reminder).filter(models.Reminder.user_id == user_id, not models.Reminder.send).all()
+        # Sesión asíncrona: la consulta no bloquea el event loop mientras corren otros agentes
+        async with AsyncSessionLocal() as db:
+            reminders = (await db.scalars(
+                select(models.Reminder).where(models.Reminder.user_id == user_id, models.Reminder.send.is_(False))
+            )).all()
 
         reminders_list = []
         for reminder in reminders:
@@ -215,7 +241,4 @@ def get_active_reminders(ctx: RunContext) -> List[Dict[str, Any]]:
 
     except Exception as e:
         # En caso de error, retornar lista vacía
-        return "No hay reminders activos"
-    finally:
-        # Cerrar la sesión de base de datos
-        db.close()
\ No newline at end of file
+        return "No hay reminders activos"
\ No newline at end of file
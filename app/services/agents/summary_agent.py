@@ -0,0 +1,23 @@
+from pydantic_ai import Agent
+from app.services.llm import llm_registry
+
+
+model = llm_registry.model("classifier")
+
+system_prompt = """
+    You keep a running summary of a WhatsApp conversation between a user and their Spanish assistant.
+
+    You receive the current summary (it may be empty) and the messages that are being removed from the conversation.
+    Return the updated summary:
+    - In Spanish, as short bullet points, at most 120 words.
+    - Keep facts that may matter later: personal details the user shared, plans, pending questions and the reminders being discussed.
+    - Drop greetings, small talk and anything already resolved.
+    - Never invent information.
+    """
+
+summary_agent = Agent(
+    model=model,
+    system_prompt=system_prompt,
+    output_type=str,
+    retries=1
+)
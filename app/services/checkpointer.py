@@ -0,0 +1,353 @@
+import asyncio
+import base64
+import hashlib
+import zlib
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+from cryptography.fernet import Fernet
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import (
+    FERNET_KEY,
+    CHECKPOINTER_BACKEND,
+    CHECKPOINTER_SQLITE_PATH,
+    CHECKPOINTER_MAX_THREADS,
+    CHECKPOINTER_KEEP_LAST,
+)
+from app.database import Base, SessionLocal
+from app.models import GraphCheckpoint, GraphCheckpointWrite
+
+
+class CompactSerializer(JsonPlusSerializer):
+    """
+    msgpack (LangGraph's default) plus zlib for payloads worth compressing and, optionally,
+    Fernet encryption for stores outside the process (the state holds the user's messages).
+    The applied steps are recorded in the type tag, e.g. "msgpack+zlib+fernet".
+    """
+    def __init__(self, compress_min_bytes: int = 256, encrypt: bool = False):
+        super().__init__()
+        self.compress_min_bytes = compress_min_bytes
+        # Same key derivation as the encrypted columns (sqlalchemy_utils' FernetEngine)
+        self.fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(FERNET_KEY.encode()).digest())) if encrypt else None
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if len(data) >= self.compress_min_bytes:
+            compressed = zlib.compress(data, 6)
+            if len(compressed) < len(data):
+                type_, data = f"{type_}+zlib", compressed
+        if self.fernet is not None and data:
+            type_, data = f"{type_}+fernet", self.fernet.encrypt(data)
+        return type_, data
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith("+fernet"):
+            type_, payload = type_[:-len("+fernet")], self.fernet.decrypt(payload)
+        if type_.endswith("+zlib"):
+            type_, payload = type_[:-len("+zlib")], zlib.decompress(payload)
+        return super().loads_typed((type_, payload))
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    In-process checkpointer that keeps only the last `keep_last` checkpoints per thread and at most
+    `max_threads` threads, evicting the least recently used one.
+    """
+    def __init__(self, max_threads: int = CHECKPOINTER_MAX_THREADS, keep_last: int = CHECKPOINTER_KEEP_LAST, serde=None):
+        super().__init__(serde=serde or CompactSerializer())
+        self.max_threads = max_threads
+        self.keep_last = max(1, keep_last)
+
+        self._threads: OrderedDict[str, None] = OrderedDict()
+        # (thread_id, checkpoint_ns) -> checkpoint_id -> channel versions it references
+        self._versions: dict[tuple[str, str], dict[str, ChannelVersions]] = {}
+        self._blob_keys: dict[tuple[str, str], set] = {}
+
+        # Metrics
+        self.evicted_threads = 0
+        self.pruned_checkpoints = 0
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        # Avoid the defaultdict creating empty entries for unknown (or evicted) threads
+        if config["configurable"]["thread_id"] not in self.storage:
+            return None
+        return super().get_tuple(config)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        versions = self._versions.setdefault((thread_id, checkpoint_ns), {})
+        versions[checkpoint["id"]] = dict(checkpoint["channel_versions"])
+        self._blob_keys.setdefault((thread_id, checkpoint_ns), set()).update(
+            (thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()
+        )
+        self._prune(thread_id, checkpoint_ns)
+
+        self._threads[thread_id] = None
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            oldest, _ = self._threads.popitem(last=False)
+            self.delete_thread(oldest)
+            self.evicted_threads += 1
+
+        return next_config
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.keep_last:
+            return
+
+        versions = self._versions[(thread_id, checkpoint_ns)]
+        for checkpoint_id in sorted(checkpoints)[:-self.keep_last]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            versions.pop(checkpoint_id, None)
+            self.pruned_checkpoints += 1
+
+        # Channel values only referenced by the pruned checkpoints
+        referenced = {(channel, version) for channel_versions in versions.values() for channel, version in channel_versions.items()}
+        blob_keys = self._blob_keys[(thread_id, checkpoint_ns)]
+        for key in [key for key in blob_keys if (key[2], key[3]) not in referenced]:
+            self.blobs.pop(key, None)
+            blob_keys.discard(key)
+
+    def delete_thread(self, thread_id: str) -> None:
+        for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+            for checkpoint_id in checkpoints:
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            for key in self._blob_keys.pop((thread_id, checkpoint_ns), ()):
+                self.blobs.pop(key, None)
+            self._versions.pop((thread_id, checkpoint_ns), None)
+        self._threads.pop(thread_id, None)
+
+    def metrics(self) -> dict:
+        stored_bytes = sum(len(data) for (_, data) in self.blobs.values())
+        stored_bytes += sum(
+            len(checkpoint[1]) + len(metadata[1])
+            for namespaces in self.storage.values()
+            for checkpoints in namespaces.values()
+            for checkpoint, metadata, _ in checkpoints.values()
+        )
+        return {
+            "backend": "memory",
+            "threads": len(self._threads),
+            "max_threads": self.max_threads,
+            "keep_last": self.keep_last,
+            "evicted_threads": self.evicted_threads,
+            "pruned_checkpoints": self.pruned_checkpoints,
+            "stored_bytes": stored_bytes,
+        }
+
+
+class SQLCheckpointSaver(BaseCheckpointSaver[int]):
+    """
+    Checkpointer backed by SQLAlchemy: the main database by default, or any other engine
+    (e.g. a local SQLite file). Each checkpoint is stored whole, compressed and encrypted, and
+    only the last `keep_last` per thread are kept.
+    """
+    def __init__(self, engine=None, keep_last: int = CHECKPOINTER_KEEP_LAST, serde=None):
+        super().__init__(serde=serde or CompactSerializer(encrypt=True))
+        self.keep_last = max(1, keep_last)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine) if engine is not None else SessionLocal
+
+        # Metrics
+        self.pruned_checkpoints = 0
+
+    @classmethod
+    def from_sqlite(cls, path: str = CHECKPOINTER_SQLITE_PATH, **kwargs) -> "SQLCheckpointSaver":
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine, tables=[GraphCheckpoint.__table__, GraphCheckpointWrite.__table__])
+        return cls(engine=engine, **kwargs)
+
+    def _to_tuple(self, db, row: GraphCheckpoint) -> CheckpointTuple:
+        writes = (
+            db.query(GraphCheckpointWrite)
+            .filter(
+                GraphCheckpointWrite.thread_id == row.thread_id,
+                GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                GraphCheckpointWrite.checkpoint_id == row.checkpoint_id,
+            )
+            .order_by(GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+            .all()
+        )
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns, "checkpoint_id": row.checkpoint_id}},
+            checkpoint=self.serde.loads_typed((row.checkpoint_type, row.checkpoint)),
+            metadata=self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns, "checkpoint_id": row.parent_checkpoint_id}}
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[(write.task_id, write.channel, self.serde.loads_typed((write.value_type, write.value))) for write in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        with self.session_factory() as db:
+            query = db.query(GraphCheckpoint).filter(GraphCheckpoint.thread_id == thread_id, GraphCheckpoint.checkpoint_ns == checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                row = query.filter(GraphCheckpoint.checkpoint_id == checkpoint_id).first()
+            else:
+                row = query.order_by(GraphCheckpoint.checkpoint_id.desc()).first()
+            return self._to_tuple(db, row) if row else None
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        with self.session_factory() as db:
+            query = db.query(GraphCheckpoint)
+            if config:
+                query = query.filter(GraphCheckpoint.thread_id == config["configurable"]["thread_id"])
+                if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                    query = query.filter(GraphCheckpoint.checkpoint_ns == checkpoint_ns)
+                if checkpoint_id := get_checkpoint_id(config):
+                    query = query.filter(GraphCheckpoint.checkpoint_id == checkpoint_id)
+            if before and (before_id := get_checkpoint_id(before)):
+                query = query.filter(GraphCheckpoint.checkpoint_id < before_id)
+
+            results = []
+            for row in query.order_by(GraphCheckpoint.checkpoint_id.desc()):
+                if limit is not None and len(results) >= limit:
+                    break
+                checkpoint_tuple = self._to_tuple(db, row)
+                if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                results.append(checkpoint_tuple)
+
+        yield from results
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_data = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self.session_factory() as db:
+            db.merge(GraphCheckpoint(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+                checkpoint_type=checkpoint_type,
+                checkpoint=checkpoint_data,
+                metadata_type=metadata_type,
+                checkpoint_metadata=metadata_data,
+            ))
+            db.flush()
+
+            stale = [
+                checkpoint_id for (checkpoint_id,) in
+                db.query(GraphCheckpoint.checkpoint_id)
+                .filter(GraphCheckpoint.thread_id == thread_id, GraphCheckpoint.checkpoint_ns == checkpoint_ns)
+                .order_by(GraphCheckpoint.checkpoint_id.desc())
+                .offset(self.keep_last)
+                .all()
+            ]
+            if stale:
+                for model in (GraphCheckpoint, GraphCheckpointWrite):
+                    db.query(model).filter(
+                        model.thread_id == thread_id,
+                        model.checkpoint_ns == checkpoint_ns,
+                        model.checkpoint_id.in_(stale),
+                    ).delete(synchronize_session=False)
+                self.pruned_checkpoints += len(stale)
+            db.commit()
+
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with self.session_factory() as db:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                key = (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx)
+                # Regular writes are idempotent; special ones (errors, interrupts...) are overwritten
+                if write_idx >= 0 and db.get(GraphCheckpointWrite, key) is not None:
+                    continue
+                value_type, value_data = self.serde.dumps_typed(value)
+                db.merge(GraphCheckpointWrite(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint_id,
+                    task_id=task_id,
+                    idx=write_idx,
+                    channel=channel,
+                    value_type=value_type,
+                    value=value_data,
+                    task_path=task_path,
+                ))
+            db.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.session_factory() as db:
+            db.query(GraphCheckpointWrite).filter(GraphCheckpointWrite.thread_id == thread_id).delete(synchronize_session=False)
+            db.query(GraphCheckpoint).filter(GraphCheckpoint.thread_id == thread_id).delete(synchronize_session=False)
+            db.commit()
+
+    # The graph runs async: keep the blocking database calls off the event loop
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(lambda: [*self.list(config, filter=filter, before=before, limit=limit)])
+        for checkpoint_tuple in results:
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def metrics(self) -> dict:
+        return {"backend": "sql", "keep_last": self.keep_last, "pruned_checkpoints": self.pruned_checkpoints}
+
+
+def build_checkpointer(backend: str = CHECKPOINTER_BACKEND) -> BaseCheckpointSaver:
+    """
+      🛈 Checkpointer del grafo según CHECKPOINTER_BACKEND ("memory", "sql" o "sqlite")
+    """
+    if backend == "sql":
+        return SQLCheckpointSaver()
+    if backend == "sqlite":
+        return SQLCheckpointSaver.from_sqlite()
+    return BoundedMemorySaver()
+
@@ -0,0 +1,101 @@
+import time
+from collections import OrderedDict
+from app.config import (
+    WEBHOOK_DEDUP_BACKEND,
+    WEBHOOK_DEDUP_REDIS_URL,
+    WEBHOOK_DEDUP_TTL,
+    WEBHOOK_DEDUP_MAX_SIZE,
+)
+
+
+class MessageDeduplicator:
+    """
+    Drops WhatsApp messages already received (Meta retries webhooks), keyed on the message id.
+
+    Keeps a bounded TTL set (oldest ids evicted first) in process and, optionally, a shared Redis set so every worker sees the same ids.
+    """
+    def __init__(
+        self,
+        backend: str = WEBHOOK_DEDUP_BACKEND,
+        ttl_sec: int = WEBHOOK_DEDUP_TTL,
+        max_size: int = WEBHOOK_DEDUP_MAX_SIZE,
+        redis_url: str = WEBHOOK_DEDUP_REDIS_URL,
+        key_prefix: str = "whatsapp:seen",
+    ):
+        self.backend = backend
+        self.ttl_sec = ttl_sec
+        self.max_size = max_size
+        self.key_prefix = key_prefix
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._redis = None
+
+        if backend == "redis":
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url)
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def _seen_locally(self, message_id: str) -> bool:
+        now = time.monotonic()
+
+        # Expire from the oldest end
+        while self._seen:
+            expires_at = next(iter(self._seen.values()))
+            if expires_at > now:
+                break
+            self._seen.popitem(last=False)
+
+        if message_id in self._seen:
+            return True
+
+        self._seen[message_id] = now + self.ttl_sec
+        if len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+        return False
+
+    async def is_duplicate(self, message_id: str) -> bool:
+        """
+          🛈 Devuelve True si el mensaje ya se recibió antes (y lo registra si es nuevo)
+        """
+        duplicate = self._seen_locally(message_id)
+
+        if not duplicate and self._redis is not None:
+            try:
+                is_new = await self._redis.set(f"{self.key_prefix}:{message_id}", 1, nx=True, ex=self.ttl_sec)
+                duplicate = not is_new
+            except Exception as e:
+                print(f"⚠️ Error comprobando duplicados en Redis: {e}")
+
+        if duplicate:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return duplicate
+
+    async def filter_new(self, messages: list[dict]) -> list[dict]:
+        return [message for message in messages if not await self.is_duplicate(message["id"])]
+
+    async def forget(self, messages: list[dict]):
+        """
+          🛈 Olvida los ids para que la reentrega del webhook se procese (ej: cola llena)
+        """
+        for message in messages:
+            self._seen.pop(message["id"], None)
+            if self._redis is not None:
+                try:
+                    await self._redis.delete(f"{self.key_prefix}:{message['id']}")
+                except Exception as e:
+                    print(f"⚠️ Error borrando id duplicado en Redis: {e}")
+
+    def metrics(self) -> dict:
+        return {
+            "backend": self.backend,
+            "tracked_ids": len(self._seen),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+message_deduplicator = MessageDeduplicator()
@@ -1,16 +1,22 @@
-from app.services.agents.agent_graph import agent_graph
+from app.services.session_store import session_store
+from app.services.summarizer import conversation_summarizer
+from app.services.admission import admission_controller, AdmissionRejected, BUSY_REPLY
 from app.models import User, Message
-from sqlalchemy.orm import Session
-from datetime import timezone as dt_timezone, datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import timezone as dt_timezone, datetime
 
 
-user_states = {}
-
-
-def get_user_conversation_history(user_id: int, db: Session):
+async def get_user_conversation_history(user_id: int, db: AsyncSession):
+    # Only read when a session starts: while it lives (SESSION_TTL) the session store keeps the history
     try:
-        last_five_messages = db.query(Message).filter(Message.user_id == user_id).order_by(Message.created_at.desc()).limit(5).all()
-        
+        last_five_messages = (await db.scalars(
+            select(Message)
+            .where(Message.user_id == user_id)
+            .order_by(Message.created_at.desc())
+            .limit(5)
+        )).all()
+
         conversation_history = []
 
         for msg in reversed(last_five_messages):
@@ -28,22 +34,22 @@ def get_user_conversation_history(user_id: int, db: Session):
         print(f"❌ Error getting user conversation history: {e}")
         return []
 
-async def get_agent_response(phone_number: str, user_input: str, db: Session):
+async def get_agent_response(phone_number: str, user_input: str, db: AsyncSession, user: User | None = None):
 
-    cleanup_inactive_states() # Remove inactive states
-
-    # Search user by phone number in db
-    user: User = db.query(User).filter(User.phone_number == phone_number).first()
+    # Search user by phone number in db (unless the webhook already resolved it)
+    if user is None:
+        user = (await db.scalars(select(User).where(User.phone_number == phone_number))).first()
     
     if not user:
         return "User not found"
     
-    conversation_history = get_user_conversation_history(user.id, db)
-
     # message = ModelRequest.user_text_prompt(user_input)
 
 
-    if phone_number not in user_states:
+    state = await session_store.get(phone_number)
+    is_new_session = state is None
+    if is_new_session:
+        conversation_history = await get_user_conversation_history(user.id, db)
 
         user_timezone = dt_timezone.utc
 
@@ -66,7 +72,7 @@ async def get_agent_response(phone_number: str, user_input: str, db: Session):
             "phone_number": user.phone_number,
             "birth_date": user.birth_date,
             "email": user.email,
-            "conversation_history": conversation_history,
+            "conversation_history": session_store.new_history(conversation_history),
             "agent_results": None,
             "reminder_results": None,
             "last_interaction": datetime.now(dt_timezone.utc),
@@ -76,11 +82,6 @@ async def get_agent_response(phone_number: str, user_input: str, db: Session):
         # new_message = ModelMessagesTypeAdapter.dump_json([
         #     ModelRequest.user_text_prompt(user_input)
         # ])
-        state = user_states[phone_number]
-
-        if "conversation_history" not in state:
-            state["conversation_history"] = []
-            
         current_message = {
             "role": "user",
             "content": user_input,
@@ -90,39 +91,47 @@ async def get_agent_response(phone_number: str, user_input: str, db: Session):
         state["user_input"] = user_input
         state["last_interaction"] = datetime.now(dt_timezone.utc)
         
-    user_states[phone_number] = state
+    await session_store.set(phone_number, state)
 
     config = {"configurable": {"thread_id": f"user_{user.id}"}}
+
+    # The agents (pydantic-ai, langgraph, OpenAI SDK) are only imported once a message needs them
+    from app.services.agents.agent_graph import get_agent_graph
+    from app.services.agents.agent import AgentResponse
     
     try:
-        updated_state = await agent_graph.ainvoke(state, config=config)
-        user_states[phone_number] = updated_state
+        async with admission_controller.admit():
+            updated_state = await get_agent_graph().ainvoke(
+                {**state, "conversation_history": conversation_summarizer.build_context(state)},
+                config=config,
+            )
+        # Keep the session's own fields (history ring buffer, summary, last_interaction)
+        state.update({key: value for key, value in updated_state.items() if key != "conversation_history"})
 
         current_intent = updated_state.get("intent", "").lower()
 
+        response = None
         if current_intent == "reminder" and updated_state.get("reminder_results"):
-            return updated_state["reminder_results"]
-        
+            response = updated_state["reminder_results"]
         # Si no hay reminder_results, devolver agent_results (aunque sea None)
-        if current_intent == "general" and "agent_results" in updated_state:
-            return updated_state["agent_results"]
-
-        return None
+        elif current_intent == "general" and "agent_results" in updated_state:
+            response = updated_state["agent_results"]
+
+        # Record the whole turn so the summary can fold it later
+        if is_new_session:
+            state["conversation_history"].append({"role": "user", "content": user_input, "timestamp": datetime.now()})
+        if getattr(response, "agent_response", None):
+            state["conversation_history"].append({"role": "assistant", "content": response.agent_response})
+        conversation_summarizer.compact(phone_number, state)
+        await session_store.set(phone_number, state)
+
+        return response
                 
+    except AdmissionRejected as e:
+        # Overloaded: answer right away instead of queueing more model calls
+        print(f"⏳ Agentes saturados ({e.reason}), respuesta de espera para {phone_number}")
+        return AgentResponse(agent_response=BUSY_REPLY)
+
     except Exception as e:
         print(f"Error en getting a response: {str(e)}")
         return None
-
-
-
-# Función para limpiar estados inactivos
-def cleanup_inactive_states():
-    global user_states
-    current_time = datetime.now(dt_timezone.utc)
-    inactive_threshold = current_time - timedelta(minutes=30)
-    
-    user_states = {
-        phone: state 
-        for phone, state in user_states.items() 
-        if state.get("last_interaction", datetime.min.replace(tzinfo=dt_timezone.utc)) > inactive_threshold
-    }
\ No newline at end of file
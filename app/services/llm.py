@@ -0,0 +1,171 @@
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from app.config import (
+    LLM_API_KEY,
+    LLM_AGENT_MODEL,
+    LLM_AGENT_BASE_URL,
+    LLM_CLASSIFIER_MODEL,
+    LLM_CLASSIFIER_BASE_URL,
+    LLM_REMINDER_MESSAGE_MODEL,
+    LLM_REMINDER_MESSAGE_BASE_URL,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_TIMEOUT,
+    LLM_CONNECT_TIMEOUT,
+)
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+    from pydantic_ai.models.openai import OpenAIModel
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    name: str
+    base_url: str | None = None
+
+
+MODEL_CONFIGS = {
+    "agent": ModelConfig(LLM_AGENT_MODEL, LLM_AGENT_BASE_URL),
+    "classifier": ModelConfig(LLM_CLASSIFIER_MODEL, LLM_CLASSIFIER_BASE_URL),
+    "reminder_message": ModelConfig(LLM_REMINDER_MESSAGE_MODEL, LLM_REMINDER_MESSAGE_BASE_URL),
+}
+
+
+class ConnectionStats:
+    """
+    Counts requests and new TCP connections through httpcore's `trace` extension:
+    every request that did not open a connection reused a pooled one.
+    """
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self._lock = threading.Lock()
+
+    def _record(self, event: str):
+        with self._lock:
+            if event == "connection.connect_tcp.complete":
+                self.new_connections += 1
+            elif event.endswith(".send_request_headers.started"):
+                self.requests += 1
+
+    def sync_trace(self, event: str, info: dict):
+        self._record(event)
+
+    async def async_trace(self, event: str, info: dict):
+        self._record(event)
+
+    def snapshot(self) -> dict:
+        reused = max(0, self.requests - self.new_connections)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+class LLMRegistry:
+    """
+    One LLM client per process and base URL, shared by every agent (async) and by the Celery
+    tasks (sync), over a tuned keep-alive pool. Models are built once per role from MODEL_CONFIGS.
+
+    httpx, the OpenAI SDK and pydantic-ai are imported on the first client, so importing the registry is cheap.
+    """
+    def __init__(self, model_configs: dict[str, ModelConfig] = MODEL_CONFIGS, api_key: str | None = LLM_API_KEY):
+        self.model_configs = model_configs
+        self.api_key = api_key
+        self.stats = ConnectionStats()
+
+        self._async_clients: dict[str | None, "AsyncOpenAI"] = {}
+        self._sync_clients: dict[str | None, "OpenAI"] = {}
+        self._models: dict[str, "OpenAIModel"] = {}
+        self._lock = threading.Lock()
+
+    def config(self, role: str) -> ModelConfig:
+        return self.model_configs[role]
+
+    def _pool_options(self) -> dict:
+        import httpx
+        return {
+            "limits": httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            "timeout": httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        }
+
+    def async_client(self, base_url: str | None = None) -> "AsyncOpenAI":
+        with self._lock:
+            client = self._async_clients.get(base_url)
+            if client is None:
+                import httpx
+                from openai import AsyncOpenAI
+                stats = self.stats
+
+                async def add_trace(request: httpx.Request):
+                    request.extensions["trace"] = stats.async_trace
+
+                client = self._async_clients[base_url] = AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=base_url,
+                    http_client=httpx.AsyncClient(**self._pool_options(), event_hooks={"request": [add_trace]}),
+                )
+            return client
+
+    def sync_client(self, base_url: str | None = None) -> "OpenAI":
+        with self._lock:
+            client = self._sync_clients.get(base_url)
+            if client is None:
+                import httpx
+                from openai import OpenAI
+                stats = self.stats
+
+                def add_trace(request: httpx.Request):
+                    request.extensions["trace"] = stats.sync_trace
+
+                client = self._sync_clients[base_url] = OpenAI(
+                    api_key=self.api_key,
+                    base_url=base_url,
+                    http_client=httpx.Client(**self._pool_options(), event_hooks={"request": [add_trace]}),
+                )
+            return client
+
+    def model(self, role: str) -> "OpenAIModel":
+        """
+          🛈 Modelo de pydantic-ai para un rol ("agent", "classifier"...), sobre el cliente compartido
+        """
+        model = self._models.get(role)
+        if model is None:
+            from pydantic_ai.models.openai import OpenAIModel
+            from pydantic_ai.providers.openai import OpenAIProvider
+            config = self.config(role)
+            model = self._models[role] = OpenAIModel(
+                config.name,
+                provider=OpenAIProvider(openai_client=self.async_client(config.base_url)),
+            )
+        return model
+
+    async def aclose(self):
+        for client in self._async_clients.values():
+            await client.close()
+        for client in self._sync_clients.values():
+            client.close()
+        self._async_clients.clear()
+        self._sync_clients.clear()
+        self._models.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "models": {role: {"name": config.name, "base_url": config.base_url} for role, config in self.model_configs.items()},
+            "async_clients": len(self._async_clients),
+            "sync_clients": len(self._sync_clients),
+            "connections": self.stats.snapshot(),
+        }
+
+
+llm_registry = LLMRegistry()
@@ -0,0 +1,116 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+from app.config import MESSAGE_COALESCE_WINDOW, MESSAGE_COALESCE_MAX_WAIT
+
+
+@dataclass
+class _SenderBuffer:
+    messages: list[dict] = field(default_factory=list)
+    first_at: float = 0.0
+    deadline: float = 0.0
+    task: asyncio.Task | None = None
+
+
+class MessageCoalescer:
+    """
+    Per-sender debounce window: text messages that arrive close together (even in
+    different webhooks) are merged into a single agent run.
+
+    The window restarts with every new message but never exceeds `max_wait` since the first one.
+    Interactive messages (button replies) are never delayed.
+    """
+    def __init__(
+        self,
+        on_flush: Callable[[str, list[dict]], Awaitable[None]],
+        window: float = MESSAGE_COALESCE_WINDOW,
+        max_wait: float = MESSAGE_COALESCE_MAX_WAIT,
+    ):
+        self.on_flush = on_flush
+        self.window = window
+        self.max_wait = max(max_wait, window)
+        self.enabled = window > 0
+
+        self._buffers: dict[str, _SenderBuffer] = {}
+        self._locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+        # Metrics
+        self.messages_in = 0
+        self.flushes = 0
+
+    async def add(self, sender: str, messages: list[dict]):
+        """
+          🛈 Añade mensajes al buffer del remitente y (re)inicia su ventana
+        """
+        self.messages_in += len(messages)
+
+        if any(msg.get("type") == "interactive" for msg in messages):
+            # Send what was pending first so the conversation keeps its order
+            await self._flush_now(sender)
+            await self._dispatch(sender, messages)
+            return
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        buffer = self._buffers.get(sender)
+        if buffer is None:
+            buffer = _SenderBuffer(first_at=now)
+            self._buffers[sender] = buffer
+
+        buffer.messages.extend(messages)
+        buffer.deadline = min(now + self.window, buffer.first_at + self.max_wait)
+
+        if buffer.task is None:
+            buffer.task = asyncio.create_task(self._wait_and_flush(sender, buffer))
+
+    async def _wait_and_flush(self, sender: str, buffer: _SenderBuffer):
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = buffer.deadline - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        if self._buffers.get(sender) is buffer:
+            self._buffers.pop(sender)
+            await self._dispatch(sender, buffer.messages)
+
+    async def _flush_now(self, sender: str):
+        buffer = self._buffers.pop(sender, None)
+        if buffer is None:
+            return
+        if buffer.task is not None:
+            buffer.task.cancel()
+        await self._dispatch(sender, buffer.messages)
+
+    async def _dispatch(self, sender: str, messages: list[dict]):
+        lock, users = self._locks.get(sender, (asyncio.Lock(), 0))
+        self._locks[sender] = (lock, users + 1)
+        try:
+            async with lock:
+                self.flushes += 1
+                await self.on_flush(sender, messages)
+        except Exception as e:
+            print(f"❌ Error processing coalesced messages from {sender}: {e}")
+        finally:
+            lock, users = self._locks[sender]
+            if users <= 1:
+                self._locks.pop(sender)
+            else:
+                self._locks[sender] = (lock, users - 1)
+
+    async def flush_all(self):
+        for sender in list(self._buffers):
+            await self._flush_now(sender)
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "window_seconds": self.window,
+            "max_wait_seconds": self.max_wait,
+            "pending_senders": len(self._buffers),
+            "messages_in": self.messages_in,
+            "flushes": self.flushes,
+            "agent_runs_saved": max(self.messages_in - self.flushes, 0),
+        }
@@ -1,24 +1,59 @@
-from app.config import OPENAI_API_KEY
-from openai import OpenAI
-from datetime import datetime
+import json
+from app.services.llm import llm_registry
 
 
-    
-def crear_mensaje_personalizado(reminder_text: str, reminder_date: str, reminder_hour: str, user_name: str):
+REMINDER_TEMPLATE_INSTRUCTIONS = "Create a personalized reminder message for the user based on the reminder text. Be concise and to the point, make a short message. Speak like is your lifelong friend, call him by his name. You must speak in spanish from spain. Do not write the day or the hour: write the literal placeholder {cuando} exactly once where they go (it will be replaced by something like 'hoy a las 10:00' or 'mañana a las 9:30')."
+
+# One message per reminder id, so a whole batch comes back in a single response
+REMINDER_TEMPLATES_FORMAT = {
+    "type": "json_schema",
+    "name": "reminder_messages",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "messages": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"id": {"type": "integer"}, "text": {"type": "string"}},
+                    "required": ["id", "text"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["messages"],
+        "additionalProperties": False,
+    },
+}
+
+
+def crear_plantilla_recordatorio(reminder_text: str, user_name: str | None, client=None):
     '''
-        Crea mensaje personalizado para enviar el recordatorio
+        Crea el mensaje personalizado de un recordatorio, con {cuando} en lugar del día y la hora
+        (se rellena al enviarlo). Devuelve la respuesta completa (texto y uso de tokens)
     '''
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    config = llm_registry.config("reminder_message")
+    client = client or llm_registry.sync_client(config.base_url)
 
-    response = client.responses.create(
-        model="gpt-4o",
-        instructions=f"Create a personalized reminder message for the user based on the reminder text, date and hour; if the date is the same as  {today_date()}, you must say that it is today, and the same with tomorrow etc. Be concise and to the point, make a short message. Speak like is your lifelong friend, call him by his name. You must speak in spanish from spain.",
-        input=f"Reminder me, {user_name}, that you need to {reminder_text} on {reminder_date} at {reminder_hour}",
+    return client.responses.create(
+        model=config.name,
+        instructions=REMINDER_TEMPLATE_INSTRUCTIONS,
+        input=f"Reminder me, {user_name}, that you need to {reminder_text} {{cuando}}",
     )
-    return response.output_text
-
 
 
-def today_date():
-    return datetime.now().strftime("%A %d/%m/%Y")
+def crear_plantillas_recordatorios(reminders: list[dict], client=None):
+    '''
+        Igual que crear_plantilla_recordatorio pero para un lote ({"id", "name", "text"} por
+        recordatorio) en una sola petición con salida estructurada: {"messages": [{"id", "text"}]}
+    '''
+    config = llm_registry.config("reminder_message")
+    client = client or llm_registry.sync_client(config.base_url)
 
+    return client.responses.create(
+        model=config.name,
+        instructions=REMINDER_TEMPLATE_INSTRUCTIONS + " You will receive several reminders as JSON: write one message for each, for its user, and return it with the same id.",
+        input=json.dumps(reminders, ensure_ascii=False),
+        text={"format": REMINDER_TEMPLATES_FORMAT},
+    )
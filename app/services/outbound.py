@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from app.config import OUTBOUND_WORKERS
+from app.services.metrics import Histogram
+from app.services.rate_limit import outbound_rate_limiter
+from app.services.whatsapp import AsyncWhatsAppService, async_client
+
+
+# Priority lanes: lower value goes first
+INTERACTIVE = 0
+READ_RECEIPT = 1
+BULK = 2
+
+LANE_NAMES = {INTERACTIVE: "interactive", READ_RECEIPT: "read_receipt", BULK: "bulk"}
+
+
+@dataclass(order=True)
+class _OutboundJob:
+    lane: int
+    seq: int
+    kind: str = field(compare=False)
+    recipient: str = field(compare=False)
+    args: tuple = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    superseded: bool = field(default=False, compare=False)
+
+
+class OutboundDispatcher:
+    """
+    Single outbound path for the API process: every Graph API call is queued in a priority lane
+    (interactive replies > read receipts > bulk reminders) and sent by a pool of workers through the
+    rate-limited async client.
+
+    Read receipts for the same recipient are coalesced: marking the latest message as read covers the earlier ones.
+    """
+    def __init__(self, client: AsyncWhatsAppService = async_client, workers: int = OUTBOUND_WORKERS):
+        self.client = client
+        self.workers = max(1, workers)
+
+        self._queue: asyncio.PriorityQueue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._pending_reads: dict[str, _OutboundJob] = {}
+        self._depth = {name: 0 for name in LANE_NAMES.values()}
+
+        # Metrics
+        self.sent = {name: 0 for name in LANE_NAMES.values()}
+        self.failed = {name: 0 for name in LANE_NAMES.values()}
+        self.read_receipts_coalesced = 0
+        self.wait_time = {name: Histogram() for name in LANE_NAMES.values()}
+
+    def _ensure_started(self):
+        if not self._tasks:
+            self._queue = asyncio.PriorityQueue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def start(self):
+        self._ensure_started()
+
+    async def stop(self, drain_timeout: float = 10.0):
+        if not self._tasks:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print("⚠️ Dispatcher de salida detenido con envíos pendientes")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending_reads.clear()
+        self._depth = {name: 0 for name in LANE_NAMES.values()}
+
+    def _enqueue(self, lane: int, kind: str, recipient: str, *args) -> _OutboundJob:
+        self._ensure_started()
+        job = _OutboundJob(
+            lane=lane,
+            seq=next(self._seq),
+            kind=kind,
+            recipient=recipient,
+            args=args,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        self._queue.put_nowait(job)
+        self._depth[LANE_NAMES[lane]] += 1
+        return job
+
+    def send_text(self, phone_number: str, message: str, lane: int = INTERACTIVE) -> asyncio.Future:
+        """
+          🛈 Encola un mensaje de texto; se puede esperar (await) el resultado del envío
+        """
+        return self._enqueue(lane, "text", phone_number, phone_number, message).future
+
+    def send_confirm_reminder(self, phone_number: str, response, proposal_id: str) -> asyncio.Future:
+        return self._enqueue(INTERACTIVE, "confirm_reminder", phone_number, phone_number, response, proposal_id).future
+
+    def mark_read(self, message_id: str, recipient: str) -> asyncio.Future:
+        """
+          🛈 Encola el "leído"; si ya había uno pendiente para el mismo usuario, lo sustituye
+        """
+        previous = self._pending_reads.get(recipient)
+        if previous is not None and not previous.future.done():
+            previous.superseded = True
+            self.read_receipts_coalesced += 1
+
+        job = self._enqueue(READ_RECEIPT, "read", recipient, message_id)
+        self._pending_reads[recipient] = job
+        return job.future
+
+    async def _execute(self, job: _OutboundJob) -> bool:
+        if job.kind == "text":
+            return await self.client.send_text(*job.args)
+        if job.kind == "confirm_reminder":
+            return await self.client.send_confirm_reminder(*job.args)
+        if job.kind == "read":
+            return await self.client.mark_read(*job.args)
+        raise ValueError(f"Unknown outbound job {job.kind}")
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            lane = LANE_NAMES[job.lane]
+            self._depth[lane] -= 1
+            try:
+                if job.kind == "read" and self._pending_reads.get(job.recipient) is job:
+                    self._pending_reads.pop(job.recipient)
+
+                if job.superseded:
+                    job.future.set_result(True)
+                    continue
+
+                self.wait_time[lane].observe(time.monotonic() - job.enqueued_at)
+                result = await self._execute(job)
+                if result:
+                    self.sent[lane] += 1
+                else:
+                    self.failed[lane] += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            except Exception as e:
+                self.failed[lane] += 1
+                print(f"❌ Error en envío de salida ({job.kind}): {e}")
+                if not job.future.done():
+                    job.future.set_result(False)
+            finally:
+                self._queue.task_done()
+
+    def metrics(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": dict(self._depth),
+            "sent": self.sent,
+            "failed": self.failed,
+            "read_receipts_coalesced": self.read_receipts_coalesced,
+            "wait_time_seconds": {lane: histogram.snapshot() for lane, histogram in self.wait_time.items()},
+            "rate_limiter": outbound_rate_limiter.metrics(),
+        }
+
+
+outbound_dispatcher = OutboundDispatcher()
@@ -0,0 +1,90 @@
+from datetime import date, time, timedelta
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import PENDING_REMINDER_TTL
+from app.models import PendingReminder, User, utc_now
+
+
+ACCEPT_PREFIX = "accept_reminder"
+REJECT_PREFIX = "reject_reminder"
+
+
+def build_button_id(action: str, proposal_id: str) -> str:
+    return f"{action}:{proposal_id}"
+
+
+def parse_button_id(button_id: str) -> tuple[str, str | None]:
+    """
+      🛈 Separa la acción y el id de propuesta del botón ("accept_reminder:<id>")
+    """
+    action, _, proposal_id = button_id.partition(":")
+    return action, proposal_id or None
+
+
+async def create_pending_reminder(db: AsyncSession, user: User, text: str, date: date, hour: time) -> PendingReminder:
+    """
+      🛈 Guarda una propuesta de recordatorio a la espera de confirmación
+    """
+    now = utc_now()
+    pending = PendingReminder(
+        user_id=user.id,
+        text=text,
+        date=date,
+        hour=hour,
+        created_at=now,
+        expires_at=now + timedelta(seconds=PENDING_REMINDER_TTL),
+    )
+    db.add(pending)
+    await db.commit()
+    return pending
+
+
+async def take_pending_reminder(db: AsyncSession, user: User, proposal_id: str | None) -> PendingReminder | None:
+    """
+      🛈 Reclama la propuesta (la borra en la transacción actual) para que solo un worker la procese.
+      Sin id (botones antiguos) se usa la última propuesta vigente del usuario.
+    """
+    now = utc_now()
+    query = select(PendingReminder).where(
+        PendingReminder.user_id == user.id,
+        PendingReminder.expires_at > now,
+    )
+    if proposal_id:
+        query = query.where(PendingReminder.id == proposal_id)
+
+    pending = (await db.scalars(query.order_by(PendingReminder.created_at.desc()).limit(1))).first()
+    if pending is None:
+        return None
+
+    # Conditional delete: if another worker already took it, nothing is deleted
+    deleted = await db.execute(
+        delete(PendingReminder).where(PendingReminder.id == pending.id).execution_options(synchronize_session=False)
+    )
+    if not deleted.rowcount:
+        return None
+
+    # Keep the loaded values usable after the commit
+    db.expunge(pending)
+    return pending
+
+
+def purge_expired_pending_reminders(db: Session, batch_size: int = 500) -> int:
+    """
+      🛈 Borra en lotes las propuestas caducadas
+    """
+    now = utc_now()
+    total = 0
+
+    while True:
+        expired_ids = [
+            row.id for row in
+            db.query(PendingReminder.id).filter(PendingReminder.expires_at <= now).limit(batch_size).all()
+        ]
+        if not expired_ids:
+            break
+
+        total += db.query(PendingReminder).filter(PendingReminder.id.in_(expired_ids)).delete(synchronize_session=False)
+        db.commit()
+
+    return total
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from app.config import (
+    OUTBOUND_RATE_PER_PHONE,
+    OUTBOUND_BURST_PER_PHONE,
+    OUTBOUND_RATE_PER_RECIPIENT,
+    OUTBOUND_BURST_PER_RECIPIENT,
+)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations: `reserve()` takes a token and returns how long
+    the caller has to wait before using it, so it works from both async and sync code.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class OutboundRateLimiter:
+    """
+    Throttles Graph API calls with one bucket per sending phone id and one per recipient.
+    """
+    def __init__(
+        self,
+        rate_per_phone: float = OUTBOUND_RATE_PER_PHONE,
+        burst_per_phone: float = OUTBOUND_BURST_PER_PHONE,
+        rate_per_recipient: float = OUTBOUND_RATE_PER_RECIPIENT,
+        burst_per_recipient: float = OUTBOUND_BURST_PER_RECIPIENT,
+        max_recipients: int = 10000,
+    ):
+        self.rate_per_phone = rate_per_phone
+        self.burst_per_phone = burst_per_phone
+        self.rate_per_recipient = rate_per_recipient
+        self.burst_per_recipient = burst_per_recipient
+        self.max_recipients = max_recipients
+
+        self._phones: dict[str, TokenBucket] = {}
+        self._recipients: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.throttled = 0
+        self.retry_after_pauses = 0
+
+    def _reserve(self, phone_id: str, recipient: str | None) -> float:
+        with self._lock:
+            phone_bucket = self._phones.get(phone_id)
+            if phone_bucket is None:
+                phone_bucket = self._phones[phone_id] = TokenBucket(self.rate_per_phone, self.burst_per_phone)
+            wait = phone_bucket.reserve()
+
+            if recipient:
+                recipient_bucket = self._recipients.get(recipient)
+                if recipient_bucket is None:
+                    recipient_bucket = self._recipients[recipient] = TokenBucket(self.rate_per_recipient, self.burst_per_recipient)
+                    if len(self._recipients) > self.max_recipients:
+                        self._recipients.popitem(last=False)
+                else:
+                    self._recipients.move_to_end(recipient)
+                wait = max(wait, recipient_bucket.reserve())
+
+            if wait > 0:
+                self.throttled += 1
+            return wait
+
+    async def acquire(self, phone_id: str, recipient: str | None = None):
+        wait = self._reserve(phone_id, recipient)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, phone_id: str, recipient: str | None = None):
+        wait = self._reserve(phone_id, recipient)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, phone_id: str, seconds: float):
+        """
+          🛈 Detiene todos los envíos de un número durante `seconds` (cabecera Retry-After)
+        """
+        with self._lock:
+            bucket = self._phones.get(phone_id)
+            if bucket is None:
+                bucket = self._phones[phone_id] = TokenBucket(self.rate_per_phone, self.burst_per_phone)
+            bucket.pause(seconds)
+            self.retry_after_pauses += 1
+
+    def metrics(self) -> dict:
+        return {
+            "rate_per_phone": self.rate_per_phone,
+            "rate_per_recipient": self.rate_per_recipient,
+            "tracked_recipients": len(self._recipients),
+            "throttled": self.throttled,
+            "retry_after_pauses": self.retry_after_pauses,
+        }
+
+
+outbound_rate_limiter = OutboundRateLimiter()
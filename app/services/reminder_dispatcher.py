@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+from app.config import REMINDER_DISPATCH_BATCH, REMINDER_DISPATCH_LEASE, REMINDER_SEND_LEASE, REMINDER_BACKFILL_BATCH
+from app.models import Reminder, User, utc_now
+
+
+def claimable_condition(now: datetime, lease_sec: int = REMINDER_DISPATCH_LEASE):
+    return or_(Reminder.dispatched_at.is_(None), Reminder.dispatched_at <= now - timedelta(seconds=lease_sec))
+
+
+def due_reminders_query(now: datetime, batch_size: int = REMINDER_DISPATCH_BATCH, lease_sec: int = REMINDER_DISPATCH_LEASE):
+    # Served by ix_reminder_send_due_at_utc
+    return (
+        select(Reminder.id)
+        .where(
+            Reminder.send.is_(False),
+            Reminder.due_at_utc <= now,
+            Reminder.status == Reminder.STATUS_PENDING,
+            claimable_condition(now, lease_sec),
+        )
+        .order_by(Reminder.due_at_utc)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def claim_due_reminders(
+    db: Session,
+    now: datetime | None = None,
+    batch_size: int = REMINDER_DISPATCH_BATCH,
+    lease_sec: int = REMINDER_DISPATCH_LEASE,
+) -> list[int]:
+    """
+      🛈 Reclama un lote de recordatorios vencidos y sin enviar, en orden de vencimiento.
+
+      Las filas se bloquean con `FOR UPDATE SKIP LOCKED`, así varios dispatchers a la vez se reparten
+      los lotes sin esperarse. Un recordatorio despachado que sigue sin enviarse pasado `lease_sec`
+      vuelve a estar disponible. Se marca `dispatched_at` en la misma transacción.
+    """
+    now = now or utc_now()
+    claimable = claimable_condition(now, lease_sec)
+
+    reminder_ids = list(db.scalars(due_reminders_query(now, batch_size, lease_sec)))
+    if not reminder_ids:
+        db.commit()
+        return []
+
+    # Same condition again: without row locks (SQLite) a concurrent claim just updates nothing
+    claimed = list(db.scalars(
+        update(Reminder)
+        .where(Reminder.id.in_(reminder_ids), claimable)
+        .values(dispatched_at=now)
+        .returning(Reminder.id)
+        .execution_options(synchronize_session=False)
+    ))
+    db.commit()
+    return claimed
+
+
+def new_claim_token() -> str:
+    return uuid4().hex
+
+
+def claim_for_sending(
+    db: Session,
+    reminder_ids: list[int],
+    claim_token: str,
+    now: datetime | None = None,
+    lease_sec: int = REMINDER_SEND_LEASE,
+) -> list[int]:
+    """
+      🛈 Pasa a "sending" los recordatorios de la lista que siguen "pending" y devuelve solo esos.
+
+      Es un único UPDATE condicional: si el mismo recordatorio llega a dos workers (reentrega con
+      `acks_late`, un segundo despacho...), la fila solo vuelve a uno de ellos y solo ese lo envía.
+      El reclamo lleva el `claim_token` del worker (uno nuevo por intento) y caduca a los `lease_sec`
+      segundos (ver `reap_expired_claims`).
+    """
+    if not reminder_ids:
+        return []
+    now = now or utc_now()
+
+    claimed = list(db.scalars(
+        update(Reminder)
+        .where(Reminder.id.in_(reminder_ids), Reminder.status == Reminder.STATUS_PENDING, Reminder.send.is_(False))
+        .values(status=Reminder.STATUS_SENDING, claim_token=claim_token, claim_expires_at=now + timedelta(seconds=lease_sec))
+        .returning(Reminder.id)
+        .execution_options(synchronize_session=False)
+    ))
+    db.commit()
+    return claimed
+
+
+def finish_sending(db: Session, reminder_ids: list[int], status: str, claim_token: str) -> int:
+    """
+      🛈 Cierra el envío de recordatorios reclamados: "sent" (marca también `send`), "failed", o
+      "pending" para que un reintento los vuelva a reclamar.
+
+      "pending" y "failed" solo se aplican si el reclamo sigue siendo de `claim_token`: un worker
+      cuyo reclamo caducó y que otro ya ha vuelto a reclamar no puede soltárselo.
+      "sent" se aplica aunque el reclamo ya no sea suyo: el mensaje salió, y marcarlo evita que el
+      reaper lo devuelva a "pending" o que otro worker lo reclame y lo envíe otra vez.
+    """
+    if not reminder_ids:
+        return 0
+
+    statement = update(Reminder).where(Reminder.id.in_(reminder_ids))
+    if status == Reminder.STATUS_SENT:
+        statement = statement.where(Reminder.status != Reminder.STATUS_SENT).values(
+            status=status, send=True, claim_token=None, claim_expires_at=None,
+        )
+    else:
+        statement = statement.where(
+            Reminder.status == Reminder.STATUS_SENDING,
+            Reminder.claim_token == claim_token,
+        ).values(status=status, claim_token=None, claim_expires_at=None)
+
+    result = db.execute(statement.execution_options(synchronize_session=False))
+    db.commit()
+    return result.rowcount
+
+
+def renew_claims(
+    db: Session,
+    reminder_ids: list[int],
+    claim_token: str,
+    now: datetime | None = None,
+    lease_sec: int = REMINDER_SEND_LEASE,
+) -> list[int]:
+    """
+      🛈 Alarga el reclamo de los recordatorios que siguen siendo de `claim_token` y devuelve solo
+      esos: los que el reaper ya devolvió (o reclamó otro worker) no se deben enviar
+    """
+    if not reminder_ids:
+        return []
+    now = now or utc_now()
+
+    renewed = list(db.scalars(
+        update(Reminder)
+        .where(Reminder.id.in_(reminder_ids), Reminder.status == Reminder.STATUS_SENDING, Reminder.claim_token == claim_token)
+        .values(claim_expires_at=now + timedelta(seconds=lease_sec))
+        .returning(Reminder.id)
+        .execution_options(synchronize_session=False)
+    ))
+    db.commit()
+    return renewed
+
+
+def reap_expired_claims(db: Session, now: datetime | None = None) -> int:
+    """
+      🛈 Devuelve a "pending" los recordatorios cuyo worker no terminó el envío antes de que caducara
+      el reclamo (murió o se colgó), para que el dispatcher los vuelva a despachar
+    """
+    now = now or utc_now()
+    # Served by ix_reminder_status_claim_expires_at
+    result = db.execute(
+        update(Reminder)
+        .where(Reminder.status == Reminder.STATUS_SENDING, Reminder.claim_expires_at <= now)
+        .values(status=Reminder.STATUS_PENDING, claim_token=None, claim_expires_at=None, dispatched_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def backfill_due_at_utc(db: Session, batch_size: int = REMINDER_BACKFILL_BATCH, now: datetime | None = None) -> int:
+    """
+      🛈 Rellena `due_at_utc` de los recordatorios antiguos por lotes (recorriendo por id).
+
+      Solo los que aún no han vencido: los vencidos sin enviar siguen en manos de su tarea ETA
+      y no deben volver a salir por el dispatcher.
+    """
+    now = now or utc_now()
+    total = 0
+    last_id = 0
+
+    while True:
+        rows = db.execute(
+            select(Reminder.id, Reminder.date, Reminder.hour, User.timezone)
+            .join(User, User.id == Reminder.user_id)
+            .where(
+                Reminder.id > last_id,
+                Reminder.due_at_utc.is_(None),
+                Reminder.send.is_(False),
+                Reminder.date.is_not(None),
+                Reminder.hour.is_not(None),
+            )
+            .order_by(Reminder.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        values = [
+            {"id": row.id, "due_at_utc": due_at_utc}
+            for row in rows
+            if (due_at_utc := Reminder.due_at_for(row.date, row.hour, row.timezone)) > now
+        ]
+        if values:
+            # Bulk UPDATE by primary key
+            db.execute(update(Reminder), values)
+        db.commit()
+        total += len(values)
+
+    return total
@@ -0,0 +1,291 @@
+import json
+from datetime import date, datetime, time, timedelta, timezone
+import pytz
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+from app.config import (
+    LLM_REMINDER_MESSAGE_INPUT_COST,
+    LLM_REMINDER_MESSAGE_OUTPUT_COST,
+    REMINDER_RENDER_WINDOW,
+    REMINDER_RENDER_BATCH,
+    REMINDER_RENDER_MAX_BATCHES,
+    REMINDER_RENDER_LEASE,
+)
+from app.models import Reminder, User
+from app.services.openai import crear_plantilla_recordatorio, crear_plantillas_recordatorios
+from app.services.reminder_dispatcher import utc_now
+
+
+# Where the pre-rendered text says when the reminder is ("hoy a las 10:00"), filled in at send time
+WHEN_PLACEHOLDER = "{cuando}"
+
+WEEKDAYS = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+MONTHS = ("enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre")
+
+
+def local_today(timezone_name: str | None) -> date:
+    try:
+        tz = pytz.timezone(timezone_name or "UTC")
+    except (pytz.exceptions.UnknownTimeZoneError, ValueError):
+        tz = pytz.UTC
+    return datetime.now(timezone.utc).astimezone(tz).date()
+
+
+def describe_when(reminder_date: date, reminder_hour: time, today: date) -> str:
+    """
+      🛈 Día y hora del recordatorio relativos a `today`: "hoy a las 10:00", "mañana a las 9:30",
+      "el viernes a las 18:00" o "el lunes 3 de junio a las 10:00"
+    """
+    # "a la 1:05", "a las 13:05"
+    article = "la" if reminder_hour.hour == 1 else "las"
+    hour = f"a {article} {reminder_hour.hour}:{reminder_hour.minute:02d}"
+    days = (reminder_date - today).days
+    if days == 0:
+        return f"hoy {hour}"
+    if days == 1:
+        return f"mañana {hour}"
+    if days == 2:
+        return f"pasado mañana {hour}"
+
+    weekday = WEEKDAYS[reminder_date.weekday()]
+    if 2 < days < 7:
+        return f"el {weekday} {hour}"
+    return f"el {weekday} {reminder_date.day} de {MONTHS[reminder_date.month - 1]} {hour}"
+
+
+def fallback_template(reminder_text: str, user_name: str | None) -> str:
+    """
+      🛈 Plantilla fija para cuando no hay texto pre-generado (sin llamar al modelo)
+    """
+    greeting = f"¡Hola {user_name}!" if user_name else "¡Hola!"
+    return f"{greeting} ⏰ Te recuerdo que {WHEN_PLACEHOLDER} tienes esto pendiente: {reminder_text}"
+
+
+def is_valid_template(template: str | None) -> bool:
+    return bool(template) and template.count(WHEN_PLACEHOLDER) == 1
+
+
+def render_reminder_message(
+    rendered_text: str | None,
+    reminder_text: str,
+    reminder_date: date,
+    reminder_hour: time,
+    user_name: str | None,
+    timezone_name: str | None,
+) -> str:
+    """
+      🛈 Mensaje final del recordatorio en el momento del envío: el texto pre-generado (o la plantilla
+      fija) con el día relativo a hoy en la zona horaria del usuario
+    """
+    template = rendered_text if is_valid_template(rendered_text) else fallback_template(reminder_text, user_name)
+    return template.replace(WHEN_PLACEHOLDER, describe_when(reminder_date, reminder_hour, local_today(timezone_name)))
+
+
+class ReminderMessageRenderer:
+    """
+    Generates the personalized reminder texts with the model in batches: one structured request
+    returns a message per reminder id. When the answer can't be parsed, or a reminder is missing
+    from it or has no valid placeholder, that reminder is generated with its own request.
+
+    Counts requests, tokens and cost so the render task can report calls per reminder.
+    """
+    def __init__(
+        self,
+        client=None,
+        input_cost: float = LLM_REMINDER_MESSAGE_INPUT_COST,
+        output_cost: float = LLM_REMINDER_MESSAGE_OUTPUT_COST,
+    ):
+        # OpenAI-compatible sync client (None: the shared one from llm_registry)
+        self.client = client
+        self.input_cost = input_cost
+        self.output_cost = output_cost
+
+        # Metrics
+        self.calls = 0
+        self.batch_calls = 0
+        self.fallback_calls = 0
+        self.parse_failures = 0
+        self.failures = 0
+        self.reminders = 0
+        self.rejected = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def _record(self, response):
+        self.calls += 1
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.input_tokens += usage.input_tokens or 0
+            self.output_tokens += usage.output_tokens or 0
+
+    def render_one(self, reminder: dict) -> str | None:
+        """
+          🛈 Un recordatorio ({"id", "name", "text"}) en su propia petición; None si el texto no vale
+        """
+        response = crear_plantilla_recordatorio(reminder["text"], reminder["name"], client=self.client)
+        self._record(response)
+        template = response.output_text.strip()
+        return template if is_valid_template(template) else None
+
+    def render_batch(self, reminders: list[dict]) -> dict[int, str]:
+        """
+          🛈 Plantillas {id: texto} de un lote en una sola petición, con la petición individual como
+          respaldo. Si el modelo tampoco da un texto válido se guarda la plantilla fija, así no se
+          vuelve a pedir en cada ejecución.
+        """
+        self.reminders += len(reminders)
+        # A failing request (model down) propagates: retrying each reminder would only multiply the calls
+        response = crear_plantillas_recordatorios(reminders, client=self.client)
+        self._record(response)
+        self.batch_calls += 1
+
+        templates = {}
+        try:
+            for item in json.loads(response.output_text)["messages"]:
+                templates[int(item["id"])] = item["text"].strip()
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.parse_failures += 1
+            templates = {}
+            print(f"⚠️ Respuesta del lote de {len(reminders)} recordatorios no válida, se generan uno a uno: {e}")
+
+        results = {}
+        for reminder in reminders:
+            template = templates.get(reminder["id"])
+            if not is_valid_template(template):
+                self.fallback_calls += 1
+                try:
+                    template = self.render_one(reminder)
+                except Exception as e:
+                    self.failures += 1
+                    print(f"❌ Error generando el mensaje del recordatorio {reminder['id']}: {e}")
+                    continue
+            if template is None:
+                self.rejected += 1
+                template = fallback_template(reminder["text"], reminder["name"])
+            results[reminder["id"]] = template
+        return results
+
+    def metrics(self) -> dict:
+        return {
+            "reminders": self.reminders,
+            "calls": self.calls,
+            "batch_calls": self.batch_calls,
+            "fallback_calls": self.fallback_calls,
+            "parse_failures": self.parse_failures,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "calls_per_reminder": round(self.calls / self.reminders, 3) if self.reminders else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round((self.input_tokens * self.input_cost + self.output_tokens * self.output_cost) / 1_000_000, 6),
+        }
+
+
+def claim_reminders_to_render(
+    db: Session,
+    now: datetime | None = None,
+    window_sec: int = REMINDER_RENDER_WINDOW,
+    batch_size: int = REMINDER_RENDER_BATCH,
+    lease_sec: int = REMINDER_RENDER_LEASE,
+) -> list[int]:
+    """
+      🛈 Reclama un lote de recordatorios sin enviar y sin mensaje que vencen en los próximos
+      `window_sec` segundos, los más próximos primero.
+
+      Como en claim_due_reminders, `FOR UPDATE SKIP LOCKED` y un UPDATE condicional reparten los
+      lotes entre ejecuciones que se solapan. El reclamo caduca a los `lease_sec` segundos, por si
+      la ejecución muere a mitad.
+    """
+    now = now or utc_now()
+    claimable = or_(Reminder.render_claimed_at.is_(None), Reminder.render_claimed_at <= now - timedelta(seconds=lease_sec))
+
+    # Served by ix_reminder_send_due_at_utc
+    reminder_ids = list(db.scalars(
+        select(Reminder.id)
+        .where(
+            Reminder.send.is_(False),
+            Reminder.due_at_utc > now,
+            Reminder.due_at_utc <= now + timedelta(seconds=window_sec),
+            Reminder.rendered_text.is_(None),
+            claimable,
+        )
+        .order_by(Reminder.due_at_utc)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ))
+    if not reminder_ids:
+        db.commit()
+        return []
+
+    # Same condition again: without row locks (SQLite) a concurrent claim just updates nothing
+    claimed = list(db.scalars(
+        update(Reminder)
+        .where(Reminder.id.in_(reminder_ids), Reminder.rendered_text.is_(None), claimable)
+        .values(render_claimed_at=now)
+        .returning(Reminder.id)
+        .execution_options(synchronize_session=False)
+    ))
+    db.commit()
+    return claimed
+
+
+def render_pending_reminders(
+    db: Session,
+    renderer: ReminderMessageRenderer,
+    now: datetime | None = None,
+    window_sec: int = REMINDER_RENDER_WINDOW,
+    batch_size: int = REMINDER_RENDER_BATCH,
+    max_batches: int = REMINDER_RENDER_MAX_BATCHES,
+    lease_sec: int = REMINDER_RENDER_LEASE,
+) -> int:
+    """
+      🛈 Genera y guarda los mensajes de los recordatorios sin enviar y sin mensaje que vencen en los
+      próximos `window_sec` segundos, en lotes de `batch_size` reclamados uno a uno. Si falla la
+      petición de un lote (modelo caído) se suelta el lote y se para hasta la siguiente ejecución
+    """
+    now = now or utc_now()
+    rendered = 0
+
+    for _ in range(max_batches):
+        claimed = claim_reminders_to_render(db, now, window_sec, batch_size, lease_sec)
+        if not claimed:
+            break
+
+        rows = db.execute(
+            select(Reminder.id, Reminder.text, User.name)
+            .join(User, User.id == Reminder.user_id)
+            .where(Reminder.id.in_(claimed))
+            .order_by(Reminder.due_at_utc)
+        ).all()
+        chunk = [{"id": row.id, "name": row.name, "text": row.text} for row in rows]
+        try:
+            templates = renderer.render_batch(chunk)
+        except Exception as e:
+            renderer.failures += 1
+            print(f"❌ Error generando los mensajes de {len(chunk)} recordatorios: {e}")
+            db.execute(
+                update(Reminder)
+                .where(Reminder.id.in_(claimed), Reminder.render_claimed_at == now)
+                .values(render_claimed_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            break
+
+        # Only while the claim is still ours: an edited text clears it, and the message would be stale.
+        # Reminders that got no message keep the claim and are retried once it expires
+        for reminder_id, template in templates.items():
+            saved = db.execute(
+                update(Reminder)
+                .where(Reminder.id == reminder_id, Reminder.render_claimed_at == now)
+                .values(rendered_text=template, render_claimed_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            rendered += saved.rowcount
+        db.commit()
+
+        if len(claimed) < batch_size:
+            break
+
+    return rendered
+
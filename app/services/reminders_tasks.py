@@ -1,30 +1,22 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import Reminder, User
-from app.tasks.reminders import schedule_reminder
-from datetime import datetime, date, time
+from datetime import date, time
 import pytz
 
 
-def create_reminder(db, user: User, text: str, date: date, hour: time):
+async def create_reminder(db: AsyncSession, user: User, text: str, date: date, hour: time):
     """
-    🛈 FUNCIÓN PRINCIPAL: Crear recordatorio + programar en Celery
+    🛈 FUNCIÓN PRINCIPAL: Crear recordatorio con su hora UTC de vencimiento
+
+    No se programa nada en Celery: `dispatch_due_reminders` (Celery Beat) lo recoge cuando vence.
+    El mensaje personalizado lo genera `render_reminder_messages` (Celery Beat) por lotes, no el envío.
     """
-    # 1. Crear en DB
-    reminder = Reminder(user_id=user.id, text=text, date=date, hour=hour)
+    due_at_utc = Reminder.due_at_for(date, hour, user.timezone)
+
+    reminder = Reminder(user_id=user.id, text=text, date=date, hour=hour, due_at_utc=due_at_utc)
     db.add(reminder)
-    db.commit()
-    
-    # 2. Programar en Celery
-    user_tz = pytz.timezone(user.timezone)
-    reminder_datetime = user_tz.localize(datetime.combine(date, hour))
-    utc_datetime = reminder_datetime.astimezone(pytz.UTC)
-    
-    # 🚀 AQUÍ SE PROGRAMA EN CELERY
-    print("🔧 Debug - Antes de llamar schedule_reminder:")
-    print(f"  - reminder_id: {reminder.id} (tipo: {type(reminder.id)})")
-    print(f"  - utc_datetime: {utc_datetime} (tipo: {type(utc_datetime)})")
-    print(f"  - timezone: {user.timezone} (tipo: {type(user.timezone)})")
-    
-    schedule_reminder.delay(reminder.id, utc_datetime, user.timezone)
-    
-    print(f"✅ Recordatorio creado y programado para {reminder_datetime}")
-    return reminder
\ No newline at end of file
+    await db.commit()
+
+    reminder_datetime = pytz.UTC.localize(due_at_utc).astimezone(user.get_timezone_obj())
+    print(f"✅ Recordatorio {reminder.id} creado para {reminder_datetime} ({due_at_utc} UTC)")
+    return reminder
@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict
+from app.config import SESSION_BACKEND, SESSION_REDIS_URL, SESSION_TTL, SESSION_MAX_HISTORY
+
+
+class SessionStore:
+    """
+    Conversation state per phone number with a sliding TTL.
+
+    In memory, sessions live in an OrderedDict kept in last-access order, so expired ones are
+    always at the front and expiry pops them one by one (amortized O(1) per message).
+    With the "redis" backend the state is shared by every worker and Redis expires it, so the
+    store never sees an expiry and reports `expired` as None.
+
+    The conversation history is a ring buffer of the last `max_history` messages.
+    """
+    def __init__(
+        self,
+        backend: str = SESSION_BACKEND,
+        ttl_sec: int = SESSION_TTL,
+        max_history: int = SESSION_MAX_HISTORY,
+        redis_url: str = SESSION_REDIS_URL,
+        key_prefix: str = "whatsapp:session",
+    ):
+        self.backend = backend
+        self.ttl_sec = ttl_sec
+        self.max_history = max_history
+        self.key_prefix = key_prefix
+        self._sessions: OrderedDict[str, tuple[float, Dict[str, Any]]] = OrderedDict()
+        self._redis = None
+        self._serde = None
+
+        if backend == "redis":
+            import redis.asyncio as redis
+            from app.services.checkpointer import CompactSerializer
+            self._redis = redis.from_url(redis_url)
+            self._serde = CompactSerializer(encrypt=True)
+
+        # Metrics
+        self.expired = 0
+
+    def _expire(self, now: float):
+        while self._sessions:
+            expires_at, _ = next(iter(self._sessions.values()))
+            if expires_at > now:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def new_history(self, messages=()) -> deque:
+        return deque(messages, maxlen=self.max_history)
+
+    async def get(self, key: str) -> Dict[str, Any] | None:
+        if self._redis is not None:
+            raw = await self._redis.get(f"{self.key_prefix}:{key}")
+            if raw is None:
+                return None
+            type_, _, payload = raw.partition(b"\n")
+            state = self._serde.loads_typed((type_.decode(), payload))
+            state["conversation_history"] = self.new_history(state.get("conversation_history") or ())
+            return state
+
+        self._expire(time.monotonic())
+        entry = self._sessions.get(key)
+        return entry[1] if entry else None
+
+    async def set(self, key: str, state: Dict[str, Any]):
+        """
+          🛈 Guarda el estado y renueva su TTL; el historial queda como ring buffer
+        """
+        if not isinstance(state.get("conversation_history"), deque) or state["conversation_history"].maxlen != self.max_history:
+            state["conversation_history"] = self.new_history(state.get("conversation_history") or ())
+
+        if self._redis is not None:
+            type_, payload = self._serde.dumps_typed({**state, "conversation_history": list(state["conversation_history"])})
+            await self._redis.set(f"{self.key_prefix}:{key}", type_.encode() + b"\n" + payload, ex=self.ttl_sec)
+            return
+
+        now = time.monotonic()
+        self._sessions.pop(key, None)
+        self._sessions[key] = (now + self.ttl_sec, state)
+        self._expire(now)
+
+    async def delete(self, key: str):
+        if self._redis is not None:
+            await self._redis.delete(f"{self.key_prefix}:{key}")
+        else:
+            self._sessions.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def metrics(self) -> dict:
+        return {
+            "backend": self.backend,
+            "ttl_sec": self.ttl_sec,
+            "max_history": self.max_history,
+            "active_sessions": len(self._sessions) if self._redis is None else None,
+            "expired": self.expired if self._redis is None else None,
+        }
+
+
+session_store = SessionStore()
+
@@ -0,0 +1,138 @@
+import asyncio
+import re
+from typing import List, Dict, Any
+from app.config import SUMMARY_MODE, SUMMARY_KEEP_TURNS, SUMMARY_MAX_TOKENS
+from app.services.agents.context import estimate_tokens
+from app.services.admission import admission_controller
+from app.services.metrics import Histogram
+from app.services.session_store import session_store
+
+
+TOKEN_BUCKETS = (50, 100, 200, 400, 800, 1600, 3200, 6400)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+class ConversationSummarizer:
+    """
+    Keeps the last `keep_turns` turns of a session verbatim and folds older messages into a running
+    summary stored with the session, so the context handed to the agents stays bounded.
+
+    Folding happens in a background task after the reply has been sent; until it finishes the
+    agents see the previous summary.
+    """
+    def __init__(self, mode: str = SUMMARY_MODE, keep_turns: int = SUMMARY_KEEP_TURNS, max_tokens: int = SUMMARY_MAX_TOKENS):
+        self.mode = mode
+        self.keep_messages = max(1, keep_turns) * 2
+        self.max_tokens = max_tokens
+        self._tasks: dict[str, asyncio.Task] = {}
+
+        # Metrics
+        self.refreshes = 0
+        self.failures = 0
+        self.folded_messages = 0
+        self.context_tokens = Histogram(TOKEN_BUCKETS)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("extractive", "model")
+
+    def build_context(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+          🛈 Historial para los agentes: resumen (si lo hay) + últimos turnos; registra su tamaño en tokens
+        """
+        context = list(state["conversation_history"])
+        if state.get("conversation_summary"):
+            context.insert(0, {"role": "system", "content": f"Resumen de la conversación anterior:\n{state['conversation_summary']}"})
+
+        self.context_tokens.observe(sum(estimate_tokens(str(message.get("content") or "")) for message in context))
+        return context
+
+    def compact(self, key: str, state: Dict[str, Any]):
+        """
+          🛈 Saca del historial lo que exceda los últimos turnos y programa su resumen
+        """
+        history = state["conversation_history"]
+        if not self.enabled or len(history) <= self.keep_messages:
+            return
+
+        older = [history.popleft() for _ in range(len(history) - self.keep_messages)]
+        state["summary_pending"] = [*(state.get("summary_pending") or []), *older]
+
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            self._tasks[key] = asyncio.create_task(self._refresh(key))
+
+    async def _refresh(self, key: str):
+        try:
+            while True:
+                state = await session_store.get(key)
+                pending = list((state or {}).get("summary_pending") or [])
+                if not pending:
+                    return
+
+                summary = await self.summarize(state.get("conversation_summary") or "", pending)
+
+                # Re-read: the session may have changed while summarizing
+                state = await session_store.get(key)
+                if state is None:
+                    return
+                state["conversation_summary"] = summary
+                state["summary_pending"] = (state.get("summary_pending") or [])[len(pending):]
+                await session_store.set(key, state)
+
+                self.refreshes += 1
+                self.folded_messages += len(pending)
+        except Exception as e:
+            self.failures += 1
+            print(f"❌ Error resumiendo la conversación de {key}: {e}")
+        finally:
+            self._tasks.pop(key, None)
+
+    async def summarize(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        if self.mode == "model":
+            try:
+                from app.services.agents.summary_agent import summary_agent
+
+                transcript = "\n".join(f"{message.get('role')}: {message.get('content')}" for message in messages)
+                async with admission_controller.model_slot("classifier"):
+                    result = await summary_agent.run(f"Current summary:\n{summary or '(empty)'}\n\nMessages being removed:\n{transcript}")
+                return self._trim(result.output.strip().splitlines())
+            except Exception as e:
+                self.failures += 1
+                print(f"⚠️ Resumen con modelo fallido, se usa el extractivo: {e}")
+        return self.extractive_summary(summary, messages)
+
+    def extractive_summary(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        """
+          🛈 Sin modelo: primera frase de cada mensaje del usuario, recortando por el principio
+        """
+        lines = summary.splitlines() if summary else []
+        for message in messages:
+            if message.get("role") != "user":
+                continue
+            content = " ".join(str(message.get("content") or "").split())
+            if not content:
+                continue
+            first_sentence = SENTENCE_END.split(content, maxsplit=1)[0]
+            lines.append(f"- El usuario dijo: {first_sentence[:160]}")
+        return self._trim(lines)
+
+    def _trim(self, lines: List[str]) -> str:
+        # Oldest lines go first once the summary exceeds its budget
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.max_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def metrics(self) -> dict:
+        return {
+            "mode": self.mode,
+            "keep_messages": self.keep_messages,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "folded_messages": self.folded_messages,
+            "running": len(self._tasks),
+            "context_tokens_per_turn": self.context_tokens.snapshot(),
+        }
+
+
+conversation_summarizer = ConversationSummarizer()
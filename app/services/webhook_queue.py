@@ -0,0 +1,306 @@
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+import zlib
+from app.config import (
+    WEBHOOK_INGEST_MODE,
+    WEBHOOK_QUEUE_BACKEND,
+    WEBHOOK_QUEUE_REDIS_URL,
+    WEBHOOK_QUEUE_MAXSIZE,
+    WEBHOOK_QUEUE_LEASE,
+    WEBHOOK_CONSUMERS,
+)
+from app.database import AsyncSessionLocal
+from app.services.message_coalescer import MessageCoalescer
+from app.services.metrics import Histogram
+from app.services.whatsapp_webhook import process_sender_messages
+
+
+class QueueFullError(Exception):
+    """The ingest queue has no room left for new messages."""
+
+
+class MemoryWebhookQueue:
+    """
+    In-process queue: one asyncio.Queue per shard.
+    """
+    def __init__(self, shards: int, maxsize: int):
+        self._queues = [asyncio.Queue(maxsize=maxsize) for _ in range(shards)]
+
+    async def put(self, shard: int, item: dict):
+        try:
+            self._queues[shard].put_nowait(item)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Shard {shard} is full")
+
+    async def get(self, shard: int) -> dict | None:
+        return await self._queues[shard].get()
+
+    async def ack(self, shard: int):
+        self._queues[shard].task_done()
+
+    async def depth(self) -> list[int]:
+        return [queue.qsize() for queue in self._queues]
+
+    async def join(self):
+        for queue in self._queues:
+            await queue.join()
+
+    async def close(self):
+        return None
+
+
+# Push only while the shard has room: LLEN and RPUSH in one step, so concurrent puts can't overshoot maxsize
+PUT_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+return redis.call('RPUSH', KEYS[1], ARGV[1])
+"""
+# Extend / drop the shard lease only if this consumer still holds it
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisWebhookQueue:
+    """
+    Redis-backed queue (one list per shard) so several API processes share the work.
+
+    Each shard is consumed by a single process at a time, the one holding its lease (a key renewed
+    every `lease_sec / 3` seconds), so one sender's messages are still handled in order. The others
+    retry the lease and take the shard over if its owner dies.
+
+    get() moves the item with BLMOVE into the shard's processing list, and ack() removes it once
+    handled. An item left there by an owner that died is delivered again, before anything else in
+    the shard, by the next owner: delivery is at least once.
+    """
+    def __init__(self, url: str, shards: int, maxsize: int, lease_sec: float = WEBHOOK_QUEUE_LEASE, key_prefix: str = "whatsapp:webhook"):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._shards = shards
+        self._maxsize = maxsize
+        self._lease_ms = int(lease_sec * 1000)
+        self._key_prefix = key_prefix
+        self.consumer_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._put = self._redis.register_script(PUT_SCRIPT)
+        self._renew = self._redis.register_script(RENEW_SCRIPT)
+        self._release = self._redis.register_script(RELEASE_SCRIPT)
+        self._leases: dict[int, asyncio.Task] = {}
+        self._in_flight: dict[int, bytes] = {}
+
+    def _key(self, shard: int) -> str:
+        return f"{self._key_prefix}:{shard}"
+
+    def _processing_key(self, shard: int) -> str:
+        return f"{self._key_prefix}:{shard}:processing"
+
+    def _owner_key(self, shard: int) -> str:
+        return f"{self._key_prefix}:{shard}:owner"
+
+    async def _acquire(self, shard: int) -> bool:
+        if shard in self._leases:
+            return True
+        if not await self._redis.set(self._owner_key(shard), self.consumer_id, nx=True, px=self._lease_ms):
+            return False
+        self._leases[shard] = asyncio.create_task(self._keep_lease(shard))
+        print(f"🔒 Shard {shard} de la cola del webhook asignado a {self.consumer_id}")
+        return True
+
+    async def _keep_lease(self, shard: int):
+        try:
+            while True:
+                await asyncio.sleep(self._lease_ms / 3000)
+                if not await self._renew(keys=[self._owner_key(shard)], args=[self.consumer_id, self._lease_ms]):
+                    print(f"⚠️ Shard {shard} de la cola del webhook perdido por {self.consumer_id}")
+                    break
+        except Exception as e:
+            print(f"❌ Error renovando el shard {shard} de la cola del webhook: {e}")
+        self._leases.pop(shard, None)
+
+    async def put(self, shard: int, item: dict):
+        if not await self._put(keys=[self._key(shard)], args=[json.dumps(item), self._maxsize]):
+            raise QueueFullError(f"Shard {shard} is full")
+
+    async def get(self, shard: int) -> dict | None:
+        if not await self._acquire(shard):
+            # Another process owns the shard: try again in a second in case it died
+            await asyncio.sleep(1)
+            return None
+
+        # Left by a previous owner that died before acking it
+        raw = await self._redis.lindex(self._processing_key(shard), 0)
+        if raw is None:
+            raw = await self._redis.blmove(self._key(shard), self._processing_key(shard), timeout=1, src="LEFT", dest="RIGHT")
+        if raw is None:
+            return None
+        self._in_flight[shard] = raw
+        return json.loads(raw)
+
+    async def ack(self, shard: int):
+        raw = self._in_flight.pop(shard, None)
+        if raw is not None:
+            await self._redis.lrem(self._processing_key(shard), 1, raw)
+
+    async def depth(self) -> list[int]:
+        return [
+            await self._redis.llen(self._key(shard)) + await self._redis.llen(self._processing_key(shard))
+            for shard in range(self._shards)
+        ]
+
+    async def join(self):
+        return None
+
+    async def close(self):
+        # Hand the shards over right away instead of waiting for the leases to expire
+        for shard, task in list(self._leases.items()):
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await self._release(keys=[self._owner_key(shard)], args=[self.consumer_id])
+        self._leases = {}
+        await self._redis.aclose()
+
+
+class WebhookPipeline:
+    """
+    Acknowledges webhooks immediately and processes each sender's messages on a pool of consumers.
+
+    Messages are sharded by sender so one user's messages are always handled in order by the same consumer.
+    """
+    def __init__(
+        self,
+        mode: str = WEBHOOK_INGEST_MODE,
+        backend: str = WEBHOOK_QUEUE_BACKEND,
+        consumers: int = WEBHOOK_CONSUMERS,
+        maxsize: int = WEBHOOK_QUEUE_MAXSIZE,
+        redis_url: str = WEBHOOK_QUEUE_REDIS_URL,
+    ):
+        self.enabled = mode == "queue"
+        self.backend = backend
+        self.consumers = max(1, consumers)
+        self.maxsize = maxsize
+        self.redis_url = redis_url
+
+        self._queue = None
+        self._tasks: list[asyncio.Task] = []
+
+        # Metrics
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.lag = Histogram()
+        self.processing_time = Histogram()
+
+    def _shard(self, sender: str) -> int:
+        return zlib.crc32(sender.encode()) % self.consumers
+
+    async def start(self):
+        if not self.enabled or self._tasks:
+            return
+
+        if self.backend == "redis":
+            self._queue = RedisWebhookQueue(self.redis_url, self.consumers, self.maxsize)
+        else:
+            self._queue = MemoryWebhookQueue(self.consumers, self.maxsize)
+
+        self._tasks = [asyncio.create_task(self._consume(shard)) for shard in range(self.consumers)]
+        print(f"🚀 Webhook pipeline iniciado ({self.backend}, {self.consumers} consumidores)")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        if not self._tasks:
+            return
+
+        # Give in-process consumers a chance to finish what is already queued
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print("⚠️ Webhook pipeline detenido con mensajes pendientes en la cola")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        await self._queue.close()
+        self._queue = None
+
+    async def submit(self, sender: str, messages: list[dict]):
+        """
+          🛈 Encola los mensajes de un remitente para procesarlos en segundo plano
+        """
+        item = {"sender": sender, "messages": messages, "enqueued_at": time.time()}
+        try:
+            await self._queue.put(self._shard(sender), item)
+        except QueueFullError:
+            self.rejected += 1
+            raise
+        self.enqueued += 1
+
+    async def dispatch(self, sender: str, messages: list[dict]):
+        """
+          🛈 Entrega los mensajes ya agrupados: a la cola si está activa o procesándolos directamente
+        """
+        if self.enabled:
+            try:
+                await self.submit(sender, messages)
+                return
+            except QueueFullError:
+                print(f"⚠️ Cola llena, procesando directamente los mensajes de {sender}")
+
+        async with AsyncSessionLocal() as db:
+            await process_sender_messages(sender, messages, db)
+
+    async def _consume(self, shard: int):
+        while True:
+            item = await self._queue.get(shard)
+            if item is None:
+                continue
+
+            started_at = time.time()
+            self.lag.observe(started_at - item["enqueued_at"])
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    await process_sender_messages(item["sender"], item["messages"], db)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Error processing queued messages from {item['sender']}: {e}")
+            finally:
+                self.processing_time.observe(time.time() - started_at)
+                await self._queue.ack(shard)
+
+    async def metrics(self) -> dict:
+        depth = await self._queue.depth() if self._queue else []
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            "consumers": self.consumers,
+            "queue_depth": sum(depth),
+            "queue_depth_by_shard": depth,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "processing_lag_seconds": self.lag.snapshot(),
+            "processing_time_seconds": self.processing_time.snapshot(),
+        }
+
+
+webhook_pipeline = WebhookPipeline()
+message_coalescer = MessageCoalescer(on_flush=webhook_pipeline.dispatch)
@@ -1,6 +1,15 @@
+import asyncio
+import importlib.util
+import time
+from typing import TYPE_CHECKING
 import requests
 from requests.adapters import HTTPAdapter, Retry
 from app.config import WHATSAPP_ACCESS_TOKEN, WHATSAPP_PHONE_ID
+from app.services.pending_reminders import ACCEPT_PREFIX, REJECT_PREFIX, build_button_id
+from app.services.rate_limit import OutboundRateLimiter, outbound_rate_limiter
+
+if TYPE_CHECKING:
+    import httpx
 
 
 whatsapp_phone_id = WHATSAPP_PHONE_ID
@@ -9,6 +18,8 @@ class WhatsAppService:
     """
     WhatsApp API client with session reuse, retries and timeouts.
     """
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
     def __init__(
         self,
         access_token: str = WHATSAPP_ACCESS_TOKEN,
@@ -16,19 +27,29 @@ class WhatsAppService:
         api_version: str = "v18.0",
         timeout_sec: float = 10.0,
         max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        rate_limiter: OutboundRateLimiter | None = outbound_rate_limiter,
     ):
         self.access_token = access_token
         self.phone_id = phone_id
         self.base_url = f"https://graph.facebook.com/{api_version}"
         self.timeout_sec = timeout_sec
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.rate_limiter = rate_limiter
 
-        # Reuse HTTP session with retries (idempotent POSTs are OK here)
+        # Reuse HTTP session. The adapter only retries failed connections (nothing was sent);
+        # 429/5xx are retried in _post so every attempt goes through the rate limiter
         self.session = requests.Session()
         retries = Retry(
             total=max_retries,
-            backoff_factor=0.5,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["POST", "GET"]
+            connect=max_retries,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=backoff_factor,
+            allowed_methods=["POST", "GET"],
+            raise_on_status=False,
         )
         adapter = HTTPAdapter(max_retries=retries, pool_connections=10, pool_maxsize=50)
         self.session.mount("https://", adapter)
@@ -44,6 +65,34 @@ class WhatsAppService:
         # Remove leading '+' if present
         return phone_number[1:] if phone_number.startswith("+") else phone_number
 
+    def _retry_after(self, resp: requests.Response) -> float | None:
+        try:
+            seconds = float(resp.headers.get("Retry-After", ""))
+        except ValueError:
+            return None
+        if resp.status_code == 429 and self.rate_limiter is not None:
+            # Every sender on this phone id waits, not only this request
+            self.rate_limiter.pause(self.phone_id, seconds)
+        return seconds
+
+    def _post(self, url: str, payload: dict, recipient: str | None = None) -> requests.Response:
+        # Retry-After is honoured up to the longest exponential backoff, so one answer can't stall the worker
+        max_backoff = self.backoff_factor * (2 ** self.max_retries)
+
+        for attempt in range(self.max_retries + 1):
+            # Retries take a token too, so they can't amplify a 429 storm
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire_blocking(self.phone_id, recipient)
+
+            resp = self.session.post(url, headers=self._headers(), json=payload, timeout=self.timeout_sec)
+            if resp.status_code not in self.RETRY_STATUSES:
+                return resp
+
+            retry_after = self._retry_after(resp)
+            if attempt < self.max_retries:
+                time.sleep(min(retry_after, max_backoff) if retry_after is not None else self.backoff_factor * (2 ** attempt))
+        return resp
+
     def send_text(self, phone_number: str, message: str) -> bool:
         """
         Send a simple WhatsApp text message.
@@ -56,7 +105,7 @@ class WhatsAppService:
             "type": "text",
             "text": {"body": message},
         }
-        resp = self.session.post(url, headers=self._headers(), json=payload, timeout=self.timeout_sec)
+        resp = self._post(url, payload, recipient=to)
         if resp.status_code == 200:
             return True
         print(f"[WhatsApp] Send error {resp.status_code}: {resp.text}")
@@ -72,7 +121,7 @@ class WhatsAppService:
             "status": "read",
             "message_id": message_id,
         }
-        resp = self.session.post(url, headers=self._headers(), json=payload, timeout=self.timeout_sec)
+        resp = self._post(url, payload)
         return resp.status_code == 200
 
     # Envia recordatorio personalizado por WhatsApp
@@ -89,7 +138,7 @@ class WhatsAppService:
             "text": {"body": message},
         }
 
-        resp = self.session.post(url, headers=self._headers(), json=payload, timeout=self.timeout_sec)
+        resp = self._post(url, payload, recipient=to)
         if resp.status_code == 200:
             return True
 
@@ -97,7 +146,151 @@ class WhatsAppService:
         return False
 
 
+class AsyncWhatsAppService:
+    """
+    Async WhatsApp API client for the webhook path: pooled keep-alive connections,
+    HTTP/2 when `h2` is installed, strict timeouts and the same retry/backoff policy as WhatsAppService.
+    httpx is only imported with the first client, so the Celery worker never loads it.
+    """
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        access_token: str = WHATSAPP_ACCESS_TOKEN,
+        phone_id: str = WHATSAPP_PHONE_ID,
+        api_version: str = "v18.0",
+        timeout_sec: float = 10.0,
+        connect_timeout_sec: float = 3.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 10,
+        rate_limiter: OutboundRateLimiter | None = outbound_rate_limiter,
+    ):
+        self.access_token = access_token
+        self.phone_id = phone_id
+        self.base_url = f"https://graph.facebook.com/{api_version}"
+        self.timeout_sec = timeout_sec
+        self.connect_timeout_sec = connect_timeout_sec
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self.rate_limiter = rate_limiter
+        self._client: "httpx.AsyncClient | None" = None
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        # Created lazily so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            import httpx
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._headers(),
+                timeout=httpx.Timeout(self.timeout_sec, connect=self.connect_timeout_sec),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=30.0,
+                ),
+                http2=self.http2,
+            )
+        return self._client
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json",
+        }
+
+    def _normalize_phone(self, phone_number: str) -> str:
+        # Remove leading '+' if present
+        return phone_number[1:] if phone_number.startswith("+") else phone_number
+
+    def _backoff(self, attempt: int, resp: "httpx.Response | None") -> float:
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                seconds = float(retry_after)
+                if resp.status_code == 429 and self.rate_limiter is not None:
+                    # Every sender on this phone id waits, not only this request
+                    self.rate_limiter.pause(self.phone_id, seconds)
+                # Capped at the longest exponential backoff, so one answer can't hold the webhook task
+                return min(seconds, self.backoff_factor * (2 ** self.max_retries))
+            except ValueError:
+                pass
+        return self.backoff_factor * (2 ** attempt)
+
+    async def _post(self, payload: dict, recipient: str | None = None) -> "httpx.Response | None":
+        import httpx
+        url = f"/{self.phone_id}/messages"
+        resp = None
+
+        for attempt in range(self.max_retries + 1):
+            # Retries take a token too, so they can't amplify a 429 storm
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(self.phone_id, recipient)
+            try:
+                resp = await self.client.post(url, json=payload)
+                if resp.status_code not in self.RETRY_STATUSES:
+                    return resp
+            except httpx.TransportError as e:
+                print(f"[WhatsApp] Transport error (intento {attempt + 1}): {e}")
+                resp = None
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, resp))
+
+        return resp
+
+    async def send_text(self, phone_number: str, message: str) -> bool:
+        """
+        Send a simple WhatsApp text message.
+        """
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": self._normalize_phone(phone_number),
+            "type": "text",
+            "text": {"body": message},
+        }
+        resp = await self._post(payload, recipient=payload["to"])
+        if resp is not None and resp.status_code == 200:
+            return True
+        print(f"[WhatsApp] Send error {getattr(resp, 'status_code', None)}: {getattr(resp, 'text', '')}")
+        return False
+
+    async def send_confirm_reminder(self, phone_number: str, response, proposal_id: str) -> bool:
+        """
+        Send the interactive accept/reject buttons for a reminder proposal.
+        """
+        payload = build_confirm_reminder_payload(self._normalize_phone(phone_number), response, proposal_id)
+        resp = await self._post(payload, recipient=payload["to"])
+        if resp is not None and resp.status_code == 200:
+            return True
+        print(f"[WhatsApp] Confirm reminder error {getattr(resp, 'status_code', None)}: {getattr(resp, 'text', '')}")
+        return False
+
+    async def mark_read(self, message_id: str) -> bool:
+        """
+        Mark a message as read.
+        """
+        payload = {
+            "messaging_product": "whatsapp",
+            "status": "read",
+            "message_id": message_id,
+        }
+        resp = await self._post(payload)
+        return resp is not None and resp.status_code == 200
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
 _client = WhatsAppService()
+async_client = AsyncWhatsAppService()
 
 def send_whatsapp_message(user_number: str, text: str):
     """
@@ -129,21 +322,10 @@ def send_whatsapp_message(user_number: str, text: str):
 
 
 
-def send_confirm_reminder_whatsapp(user_number: str, response: dict[str, any]):
+def build_confirm_reminder_payload(user_number: str, response, proposal_id: str) -> dict:
     """
-      🛈 Enviar mensaje de confirmación de recordatorio
+      🛈 Construye el mensaje interactivo con los botones de aceptar/rechazar el recordatorio
     """
-
-    if response is None:
-        return None
-
-    url = f"https://graph.facebook.com/v18.0/{whatsapp_phone_id}/messages"
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
-    }
-
     reminder_date = (
         response.reminder_date.strftime("%d/%m/%Y")
         if hasattr(response.reminder_date, "strftime")
@@ -155,7 +337,7 @@ def send_confirm_reminder_whatsapp(user_number: str, response: dict[str, any]):
         else str(response.reminder_hour)
     )
 
-    data = {
+    return {
         "messaging_product": "whatsapp",
         "to": user_number,
         "type": "interactive",
@@ -169,14 +351,14 @@ def send_confirm_reminder_whatsapp(user_number: str, response: dict[str, any]):
                     {
                     "type": "reply",
                     "reply": {
-                        "id": "accept_reminder",
+                        "id": build_button_id(ACCEPT_PREFIX, proposal_id),
                         "title": "✅ Aceptar"
                     }
                     },
                     {
                     "type": "reply",
                     "reply": {
-                        "id": "reject_reminder",
+                        "id": build_button_id(REJECT_PREFIX, proposal_id),
                         "title": "❌ Rechazar"
                     }
                     }
@@ -185,6 +367,24 @@ def send_confirm_reminder_whatsapp(user_number: str, response: dict[str, any]):
         }
     }
 
+
+def send_confirm_reminder_whatsapp(user_number: str, response: dict[str, any], proposal_id: str):
+    """
+      🛈 Enviar mensaje de confirmación de recordatorio (los botones llevan el id de la propuesta)
+    """
+
+    if response is None:
+        return None
+
+    url = f"https://graph.facebook.com/v18.0/{whatsapp_phone_id}/messages"
+
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
+    }
+
+    data = build_confirm_reminder_payload(user_number, response, proposal_id)
+
     res = requests.post(url, headers=headers, json=data)
 
     if res.status_code != 200:
@@ -213,4 +413,5 @@ def mark_whatsapp_message_as_read(message_id: str):
     r = requests.post(url, headers=headers, json=data)
     
     if r.status_code != 200:
-        print("❌ Error marcando como leído:", r.status_code, r.text)
\ No newline at end of file
+        print("❌ Error marcando como leído:", r.status_code, r.text)
+
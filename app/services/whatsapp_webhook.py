@@ -0,0 +1,169 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.models import Message
+from app.services.graph_runner import get_agent_response
+from app.services.outbound import outbound_dispatcher
+from app.services.reminders_tasks import create_reminder
+from app.services.pending_reminders import (
+    ACCEPT_PREFIX,
+    REJECT_PREFIX,
+    create_pending_reminder,
+    parse_button_id,
+    take_pending_reminder,
+)
+
+
+def extract_sender_messages(data: dict) -> list[tuple[str, list[dict]]]:
+    """
+      🛈 Valida el payload del webhook y agrupa los mensajes por remitente
+    """
+    batches = []
+
+    if not isinstance(data, dict):
+        return batches
+
+    for entry in data.get("entry", []) or []:
+        for change in entry.get("changes", []) or []:
+            value = change.get("value", {}) or {}
+            messages = value.get("messages", []) or []
+
+            if not messages:
+                continue
+
+            # Group messages by sender
+            messages_by_sender: dict[str, list[dict]] = {}
+            for message in messages:
+                sender = message.get("from")
+                if not sender or not message.get("id"):
+                    print(f"⚠️ Mensaje ignorado por payload inválido: {message}")
+                    continue
+
+                messages_by_sender.setdefault(sender, []).append(message)
+
+            batches.extend(messages_by_sender.items())
+
+    return batches
+
+
+async def load_users_by_phone(db: AsyncSession, phone_numbers: list[str]) -> dict[str, models.User]:
+    """
+      🛈 Carga en una sola consulta (IN) los usuarios de todos los remitentes del payload
+    """
+    if not phone_numbers:
+        return {}
+
+    try:
+        users = (await db.scalars(select(models.User).where(models.User.phone_number.in_(set(phone_numbers))))).all()
+    except Exception as e:
+        print(f"❌ Error getting users: {e}")
+        return {}
+
+    return {user.phone_number: user for user in users}
+
+
+async def process_sender_messages(sender: str, messages: list[dict], db: AsyncSession, users: dict[str, models.User] | None = None):
+    """
+      🛈 Procesa los mensajes de un remitente: agente, recordatorios y respuesta por WhatsApp
+
+      `users` son los usuarios ya cargados para el payload (ver `load_users_by_phone`)
+    """
+    # Obtener usuario de la conversación
+    if users is None:
+        users = await load_users_by_phone(db, [sender])
+    user = users.get(sender)
+
+    last_msg = messages[-1]
+
+    # 1) Mark message as read
+    msg_id = last_msg.get("id")
+    if msg_id:
+        # Fire and forget: read receipts go in their own lane and are coalesced per user
+        outbound_dispatcher.mark_read(msg_id, sender)
+
+    if not user:
+        await outbound_dispatcher.send_text(sender, 'Por favor, regístrate en la aplicación para poder ayudarte.')
+        return
+
+
+    # 2) If message is interactive
+    if last_msg.get("type") == "interactive":
+        interactive = last_msg.get("interactive", {})
+
+        if interactive.get("type") == "button_reply":
+            action, proposal_id = parse_button_id(interactive["button_reply"]["id"])
+
+            if action == ACCEPT_PREFIX:
+                pending = await take_pending_reminder(db, user, proposal_id)
+
+                if pending is None:
+                    await outbound_dispatcher.send_text(sender, 'Ese recordatorio ha sido descartado anteriormente!')
+
+                if pending and user:
+                    try:
+                        # Los datos ya son objetos date y time
+                        print(f"🕐 Creando recordatorio - Fecha: {pending.date}, Hora: {pending.hour}, Usuario: {user.timezone}")
+
+                        # Commits the reminder and the removal of the proposal together
+                        await create_reminder(db, user, pending.text, pending.date, pending.hour)
+
+                        await outbound_dispatcher.send_text(sender, 'Perfecto! Te lo recordare sin falta!')
+                    except Exception as e:
+                        await db.rollback()
+                        print(f"❌ Error saving reminder: {e}")
+                        print(f"❌ Tipo de datos - date: {type(pending.date)}, hour: {type(pending.hour)}")
+
+            elif action == REJECT_PREFIX:
+                pending = await take_pending_reminder(db, user, proposal_id)
+                if pending:
+                    await db.commit()
+                    await outbound_dispatcher.send_text(sender, 'No hay problema! Lo descarto.')
+                else:
+                    await outbound_dispatcher.send_text(sender, 'Ese recordatorio ya esta confirmado ✅')
+
+        return
+
+
+    # 3) If message is normal text
+    if "text" in last_msg:
+        # Formatear mensajes para la API de OpenAI
+        combined_message = " ".join([msg["text"]["body"] for msg in messages if "text" in msg])
+        print(f"\n📩 Mensaje recibido de {sender}: {combined_message}")
+        # Obtener respuesta del asistente
+        agent_response = await get_agent_response(sender, combined_message, db, user=user)
+        if agent_response is None:
+            return
+
+        if agent_response.reminder_is_complete:
+            try:
+                pending = await create_pending_reminder(
+                    db,
+                    user,
+                    agent_response.reminder_text,
+                    agent_response.reminder_date,
+                    agent_response.reminder_hour,
+                )
+            except Exception as e:
+                await db.rollback()
+                print(f"❌ Error saving pending reminder: {e}")
+                return
+
+            # Enviar mensaje de confirmación por WhatsApp
+            await outbound_dispatcher.send_confirm_reminder(sender, agent_response, pending.id)
+            return
+
+        try:
+            new_message = Message(
+                user_id=user.id,
+                user_text=combined_message,
+                response_text=agent_response.agent_response,
+            )
+            db.add(new_message)
+            await db.commit()
+
+            # Enviar respuesta por WhatsApp
+            await outbound_dispatcher.send_text(sender, agent_response.agent_response)
+
+        except Exception as e:
+            print(f"❌ Error saving message: {e}")
+
@@ -1,8 +1,32 @@
 from datetime import datetime, timezone
 from celery import shared_task
+from sqlalchemy import select
 from app.models import Reminder, User
 from app.services.whatsapp import WhatsAppService
-from app.services.openai import crear_mensaje_personalizado
+from app.services.reminder_messages import ReminderMessageRenderer, render_pending_reminders, render_reminder_message
+from app.services.pending_reminders import purge_expired_pending_reminders
+from app.services.reminder_dispatcher import (
+    claim_due_reminders,
+    claim_for_sending,
+    finish_sending,
+    new_claim_token,
+    renew_claims,
+    reap_expired_claims,
+    backfill_due_at_utc,
+    utc_now,
+)
+from app.config import (
+    PENDING_REMINDER_PURGE_BATCH,
+    REMINDER_DISPATCH_BATCH,
+    REMINDER_DISPATCH_MAX_BATCHES,
+    REMINDER_SEND_BATCH,
+    REMINDER_SEND_LEASE,
+    REMINDER_BACKFILL_BATCH,
+    REMINDER_RENDER_WINDOW,
+    REMINDER_RENDER_BATCH,
+    REMINDER_RENDER_MAX_BATCHES,
+)
+import time
 import pytz
 
 whatsapp_client = WhatsAppService()
@@ -42,6 +66,12 @@ def send_whatsapp_reminder(self, reminder_id: int, db_session_data: dict = None,
             if not user:
                 raise ValueError(f"Usuario {reminder.user_id} no encontrado")
 
+            # Solo el worker que lo pasa de "pending" a "sending" lo envía
+            claim_token = new_claim_token()
+            if not claim_for_sending(db, [reminder_id], claim_token):
+                print(f"Recordatorio {reminder_id} ya enviado o en manos de otro worker")
+                return {"status": "already_claimed", "reminder_id": reminder_id}
+
             # Usar timezone del usuario o el proporcionado
             tz_name = user_timezone or user.timezone or "UTC"
             user_tz = pytz.timezone(tz_name)
@@ -59,39 +89,41 @@ def send_whatsapp_reminder(self, reminder_id: int, db_session_data: dict = None,
             print(f"🕐 Recordatorio {reminder_id} - Hora programada usuario: {reminder_datetime.strftime('%Y-%m-%d %H:%M:%S %Z')}")
             print(f"🕐 Recordatorio {reminder_id} - Timezone usuario: {tz_name}")
 
-            # Verificar si ya pasó la hora (con margen de 2 minutos)
+            # El dispatcher solo entrega recordatorios vencidos: aquí solo se avisa de los que llegan tarde
             time_diff = (reminder_datetime - now_user_tz).total_seconds() / 60
-            if time_diff > 2:
-                print(f"⏰ Recordatorio {reminder_id} programado para más tarde (en {time_diff:.1f} minutos)")
-                # Reprogramar para el momento exacto
-                self.retry(countdown=int(time_diff * 60))
-                return
-            elif time_diff < -2:
+            if time_diff < -2:
                 print(f"⚠️ Recordatorio {reminder_id} ya pasó hace {abs(time_diff):.1f} minutos - enviando de todas formas")
 
-            # Crear mensaje personalizado de recordatorio
-            message = crear_mensaje_personalizado(reminder.text, reminder.date, reminder.hour, user.name)
+            # Mensaje pre-generado al confirmar (o plantilla fija): no se llama al modelo al enviar
+            message = render_reminder_message(reminder.rendered_text, reminder.text, reminder.date, reminder.hour, user.name, tz_name)
             
-            # Enviar WhatsApp
-            whatsapp_service = WhatsAppService()
-            success = whatsapp_service.send_reminder(
-                phone_number=user.phone_number,
-                message=message
-            )
+            # Enviar WhatsApp (cliente compartido: reutiliza la sesión HTTP y su pool)
+            success = False
+            try:
+                success = whatsapp_client.send_reminder(
+                    phone_number=user.phone_number,
+                    message=message
+                )
+            finally:
+                if not success:
+                    # Liberar el reclamo para el reintento (o darlo por fallido en el último)
+                    retrying = self.request.retries < self.max_retries
+                    finish_sending(db, [reminder_id], Reminder.STATUS_PENDING if retrying else Reminder.STATUS_FAILED, claim_token)
             
             if success:
                 # Marcar como enviado
-                reminder.send = True
-                reminder.updated_at = datetime.now(timezone.utc)
-                db.commit()
+                finish_sending(db, [reminder_id], Reminder.STATUS_SENT, claim_token)
                 
+                # Vencimiento → WhatsApp aceptado
+                fire_latency = (utc_now() - reminder.due_at_utc).total_seconds() if reminder.due_at_utc else None
                 print(f"Recordatorio #{reminder_id} enviado exitosamente a {user.phone_number}")
                 return {
                     "status": "sent", 
                     "reminder_id": reminder_id, 
                     "phone": user.phone_number,
                     "sent_at": now_utc.isoformat(),
-                    "user_timezone": tz_name
+                    "user_timezone": tz_name,
+                    "fire_latency_sec": fire_latency,
                 }
             else:
                 raise Exception("Error al enviar recordatorio porWhatsApp")
@@ -106,10 +138,103 @@ def send_whatsapp_reminder(self, reminder_id: int, db_session_data: dict = None,
         raise self.retry(exc=e)
 
 
+@shared_task(bind=True, name='app.tasks.reminders.send_whatsapp_reminders', max_retries=3, default_retry_delay=30)
+def send_whatsapp_reminders(self, reminder_ids: list[int]):
+    """
+    Tarea Celery que envía un lote de recordatorios por WhatsApp
+
+    Primero reclama los recordatorios ("pending" → "sending"): los que ya tiene otro worker o ya
+    se enviaron se omiten, así una reentrega nunca duplica el mensaje. Una sola consulta carga los
+    reclamados con su usuario y todos salen por el cliente HTTP compartido. Cada uno se marca como
+    enviado en cuanto WhatsApp lo acepta, y el reclamo de los que faltan se renueva por el camino:
+    si el worker muere a mitad de lote solo puede repetirse el mensaje que estaba enviando.
+    Solo los que fallan vuelven a la cola.
+
+    Args:
+        reminder_ids: IDs de los recordatorios a enviar
+    """
+    from app.database import SessionLocal
+    db = SessionLocal()
+
+    sent, failed, fire_latencies = [], {}, []
+    retrying = self.request.retries < self.max_retries
+    try:
+        claim_token = new_claim_token()
+        claimed = claim_for_sending(db, reminder_ids, claim_token)
+        # Already sent, claimed by another worker or deleted: nothing to do
+        skipped = sorted(set(reminder_ids) - set(claimed))
+
+        rows = db.execute(
+            select(
+                Reminder.id, Reminder.text, Reminder.rendered_text, Reminder.date, Reminder.hour, Reminder.due_at_utc,
+                User.name, User.phone_number, User.timezone,
+            )
+            .join(User, User.id == Reminder.user_id)
+            .where(Reminder.id.in_(claimed))
+        ).all() if claimed else []
+
+        # Claimed but without user: it can never be sent
+        orphaned = sorted(set(claimed) - {row.id for row in rows})
+        finish_sending(db, orphaned, Reminder.STATUS_FAILED, claim_token)
+
+        owned = {row.id for row in rows}
+        renewed_at = time.monotonic()
+        for index, row in enumerate(rows):
+            if time.monotonic() - renewed_at > REMINDER_SEND_LEASE / 3:
+                # Keep the claim on the rest of the batch; the reaper may have taken back some of it
+                owned = set(renew_claims(db, [later.id for later in rows[index:] if later.id in owned], claim_token))
+                renewed_at = time.monotonic()
+            if row.id not in owned:
+                skipped.append(row.id)
+                continue
+
+            try:
+                # Pre-rendered when confirmed (or the fixed template): no model call at fire time
+                message = render_reminder_message(row.rendered_text, row.text, row.date, row.hour, row.name, row.timezone)
+                if whatsapp_client.send_reminder(phone_number=row.phone_number, message=message):
+                    # Right away: a crash later in the batch must not send this one again
+                    finish_sending(db, [row.id], Reminder.STATUS_SENT, claim_token)
+                    sent.append(row.id)
+                    if row.due_at_utc:
+                        fire_latencies.append((utc_now() - row.due_at_utc).total_seconds())
+                else:
+                    failed[row.id] = "Error al enviar recordatorio por WhatsApp"
+            except Exception as e:
+                failed[row.id] = str(e)
+
+        # Back to "pending" for the retry to claim them again, "failed" after the last attempt
+        finish_sending(db, list(failed), Reminder.STATUS_PENDING if retrying else Reminder.STATUS_FAILED, claim_token)
+    finally:
+        db.close()
+
+    fire_latency = {
+        "avg": round(sum(fire_latencies) / len(fire_latencies), 3),
+        "max": round(max(fire_latencies), 3),
+    } if fire_latencies else None
+    print(f"📨 Lote de recordatorios: {len(sent)} enviados, {len(failed) + len(orphaned)} fallidos, {len(skipped)} omitidos (vencimiento → envío: {fire_latency})")
+    for reminder_id, error in failed.items():
+        print(f"Error enviando recordatorio {reminder_id}: {error}")
+
+    if failed and retrying:
+        # Retry only the failed reminders; the sent ones are already committed
+        raise self.retry(args=[list(failed)])
+
+    return {
+        "status": "partial" if failed else "sent",
+        "sent": sent,
+        "failed": {**failed, **{reminder_id: "Usuario no encontrado" for reminder_id in orphaned}},
+        "skipped": skipped,
+        "fire_latency_sec": fire_latency,
+    }
+
+
 @shared_task(name='app.tasks.reminders.schedule_reminder')
 def schedule_reminder(reminder_id: int, send_at: datetime, user_timezone: str = "UTC"):
     """
     ESTA FUNCIÓN PROGRAMA EL RECORDATORIO EN CELERY
+
+    Obsoleta: los recordatorios nuevos los entrega `dispatch_due_reminders`. Se mantiene para
+    las tareas que ya estaban en la cola.
     """
     print(f"🔧 Debug - schedule_reminder recibió:")
     print(f"  - reminder_id: {reminder_id} (tipo: {type(reminder_id)})")
@@ -130,3 +255,113 @@ def schedule_reminder(reminder_id: int, send_at: datetime, user_timezone: str =
         print(f"❌ Error programando: {str(e)}")
         return {"status": "error", "message": str(e)}
 
+
+@shared_task(name='app.tasks.reminders.purge_expired_pending_reminders')
+def purge_expired_pending_reminders_task(batch_size: int = PENDING_REMINDER_PURGE_BATCH):
+    """
+    Tarea periódica (Celery Beat) que borra las propuestas de recordatorio caducadas
+    """
+    from app.database import SessionLocal
+    db = SessionLocal()
+
+    try:
+        deleted = purge_expired_pending_reminders(db, batch_size=batch_size)
+        if deleted:
+            print(f"🧹 {deleted} propuestas de recordatorio caducadas eliminadas")
+        return {"status": "ok", "deleted": deleted}
+    finally:
+        db.close()
+
+
+@shared_task(name='app.tasks.reminders.dispatch_due_reminders')
+def dispatch_due_reminders(
+    batch_size: int = REMINDER_DISPATCH_BATCH,
+    max_batches: int = REMINDER_DISPATCH_MAX_BATCHES,
+    send_batch_size: int = REMINDER_SEND_BATCH,
+):
+    """
+    Tarea periódica (Celery Beat) que reclama los recordatorios vencidos por lotes y los reparte
+    entre los workers de envío en tareas de `send_batch_size` recordatorios. Los recordatorios
+    futuros no cuestan nada hasta que vencen.
+    """
+    from app.database import SessionLocal
+    db = SessionLocal()
+
+    dispatched = 0
+    try:
+        for _ in range(max_batches):
+            reminder_ids = claim_due_reminders(db, batch_size=batch_size)
+            for start in range(0, len(reminder_ids), send_batch_size):
+                send_whatsapp_reminders.delay(reminder_ids[start:start + send_batch_size])
+            dispatched += len(reminder_ids)
+
+            if len(reminder_ids) < batch_size:
+                break
+
+        if dispatched:
+            print(f"📤 {dispatched} recordatorios vencidos enviados a los workers")
+        return {"status": "ok", "dispatched": dispatched}
+    finally:
+        db.close()
+
+
+@shared_task(name='app.tasks.reminders.reap_expired_reminder_claims')
+def reap_expired_reminder_claims():
+    """
+    Tarea periódica (Celery Beat) que devuelve a "pending" los recordatorios que un worker reclamó
+    y no terminó de enviar (murió o se colgó) antes de que caducara el reclamo
+    """
+    from app.database import SessionLocal
+    db = SessionLocal()
+
+    try:
+        reaped = reap_expired_claims(db)
+        if reaped:
+            print(f"♻️ {reaped} recordatorios con el reclamo caducado vuelven a estar pendientes")
+        return {"status": "ok", "reaped": reaped}
+    finally:
+        db.close()
+
+
+@shared_task(name='app.tasks.reminders.render_reminder_messages')
+def render_reminder_messages(
+    window_sec: int = REMINDER_RENDER_WINDOW,
+    batch_size: int = REMINDER_RENDER_BATCH,
+    max_batches: int = REMINDER_RENDER_MAX_BATCHES,
+):
+    """
+    Tarea periódica (Celery Beat) que genera por lotes los mensajes personalizados de los
+    recordatorios que vencen dentro de la ventana: una petición al modelo por lote
+    """
+    from app.database import SessionLocal
+    db = SessionLocal()
+    renderer = ReminderMessageRenderer()
+
+    try:
+        rendered = render_pending_reminders(db, renderer, window_sec=window_sec, batch_size=batch_size, max_batches=max_batches)
+        stats = renderer.metrics()
+        if stats["reminders"]:
+            print(
+                f"✍️ {rendered} mensajes de recordatorio generados con {stats['calls']} llamadas "
+                f"({stats['calls_per_reminder']} por recordatorio, {stats['cost_usd']} USD)"
+            )
+        return {"status": "ok", "rendered": rendered, **stats}
+    finally:
+        db.close()
+
+
+@shared_task(name='app.tasks.reminders.backfill_reminder_due_at')
+def backfill_reminder_due_at(batch_size: int = REMINDER_BACKFILL_BATCH):
+    """
+    Tarea puntual que rellena `due_at_utc` de los recordatorios creados antes del dispatcher
+    (celery -A app.celery_app call app.tasks.reminders.backfill_reminder_due_at)
+    """
+    from app.database import SessionLocal
+    db = SessionLocal()
+
+    try:
+        updated = backfill_due_at_utc(db, batch_size=batch_size)
+        print(f"🗓️ {updated} recordatorios con due_at_utc rellenado")
+        return {"status": "ok", "updated": updated}
+    finally:
+        db.close()
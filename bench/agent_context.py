@@ -0,0 +1,75 @@
+import asyncio
+import json
+from datetime import timezone
+from typing import Any, Dict, List
+from pydantic_ai.messages import ModelResponse, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from app.services.agents.agent import agent, AgentDeps
+from app.services.agents.classifier_agent import classifier_agent, IntentDeps
+from app.services.agents.context import INJECT_MODE, TOOL_MODE
+from app.services.agents.reminder_agent import reminder_agent, ReminderDeps
+
+
+async def benchmark(messages: List[str], history: List[Dict[str, Any]]) -> dict:
+    """
+      🛈 Ejecuta los tres agentes con un modelo local guionizado en ambos modos y cuenta
+      las llamadas al modelo y los tokens por mensaje
+    """
+    outputs = {
+        "agent": {"agent_response": "¡Claro! 😊"},
+        "classifier": {"intent": "general"},
+        "reminder": {"user_id": 1, "agent_response": "¿A qué hora?", "reminder_text": "x", "reminder_date": "2030-01-01", "reminder_hour": "10:00"},
+    }
+    context_tools = {"get_conversation_context", "get_today_date"}
+
+    def scripted_model(name: str) -> FunctionModel:
+        # Follows the prompt: fetch the context tools when offered, then answer
+        def respond(model_messages, info: AgentInfo) -> ModelResponse:
+            called = {
+                part.tool_name
+                for message in model_messages for part in message.parts
+                if isinstance(part, ToolReturnPart)
+            }
+            pending = [tool.name for tool in info.function_tools if tool.name in context_tools and tool.name not in called]
+            if pending:
+                return ModelResponse(parts=[ToolCallPart(tool_name, {}) for tool_name in pending])
+            return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, outputs[name])])
+        return FunctionModel(respond)
+
+    def deps_for(name: str, mode: str):
+        if name == "agent":
+            return AgentDeps(1, "Ana", "Pérez", "34600000000", "ana@example.com", None, history, context_mode=mode)
+        if name == "classifier":
+            return IntentDeps(1, history, context_mode=mode)
+        return ReminderDeps(1, timezone.utc, history, context_mode=mode)
+
+    agents = {"agent": agent, "classifier": classifier_agent, "reminder": reminder_agent}
+    report = {}
+    for mode in (TOOL_MODE, INJECT_MODE):
+        requests = tokens = 0
+        for name, selected_agent in agents.items():
+            with selected_agent.override(model=scripted_model(name)):
+                for message in messages:
+                    usage = (await selected_agent.run(message, deps=deps_for(name, mode))).usage()
+                    requests += usage.requests
+                    tokens += usage.total_tokens or 0
+
+        runs = len(messages) * len(agents)
+        report[mode] = {
+            "runs": runs,
+            "model_requests_per_run": round(requests / runs, 2),
+            "tokens_per_run": round(tokens / runs, 1),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    # python -m bench.agent_context
+    sample_history = [
+        {"role": "user", "content": "Hola, ¿qué tal?"},
+        {"role": "assistant", "content": "¡Muy bien! ¿En qué te ayudo hoy? 😊"},
+        {"role": "user", "content": "Recuérdame comprar pan el jueves"},
+        {"role": "assistant", "content": "¿A qué hora quieres que te recuerde comprar pan el jueves?"},
+    ]
+    sample_messages = ["a las 10", "Hola", "¿Cuál es mi correo?", "Recuérdame llamar a mamá mañana", "Vale, gracias"]
+    print(json.dumps(asyncio.run(benchmark(sample_messages, sample_history)), indent=2, ensure_ascii=False))
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import tracemalloc
+from datetime import date, timezone
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import FunctionModel
+from app.services.agents.agent import agent
+from app.services.agents.agent_graph import build_agent_graph
+from app.services.checkpointer import BoundedMemorySaver
+
+
+async def measure_memory(checkpointer: BaseCheckpointSaver, users: int = 200, turns: int = 5) -> dict:
+    """
+      🛈 Memoria retenida por usuario activo tras `turns` mensajes de `users` usuarios,
+      con modelos locales en lugar de OpenAI
+    """
+    def respond(_, info):
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, {"agent_response": "¡Claro! Aquí estoy para lo que necesites 😊"})])
+
+    graph = build_agent_graph(checkpointer)
+    history = []
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    with agent.override(model=FunctionModel(respond)):
+        for turn in range(turns):
+            for user_id in range(users):
+                history = [{"role": "user", "content": f"Hola, soy el usuario {user_id} en el turno {turn}"}] * 4
+                state = {
+                    "user_input": "Hola", "user_id": user_id, "timezone": timezone.utc, "name": "Ana",
+                    "surname": "Pérez", "phone_number": "34600000000", "email": "ana@example.com",
+                    "birth_date": date(1990, 1, 1), "conversation_history": history,
+                    "agent_results": None, "reminder_results": None,
+                }
+                await graph.ainvoke(state, config={"configurable": {"thread_id": f"user_{user_id}"}})
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    return {
+        "checkpointer": type(checkpointer).__name__,
+        "users": users,
+        "turns": turns,
+        "retained_bytes": retained,
+        "bytes_per_user": round(retained / users),
+    }
+
+
+if __name__ == "__main__":
+    # python -m bench.checkpointer_memory
+    for saver in (InMemorySaver(), BoundedMemorySaver()):
+        print(json.dumps(asyncio.run(measure_memory(saver))))
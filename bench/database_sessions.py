@@ -0,0 +1,92 @@
+import asyncio
+import json
+import sys
+import time
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import pool_options, to_async_url
+from app.models import Message, User
+
+
+async def benchmark(url: str, requests: int = 400, concurrency: int = 32, agent_latency: float = 0.02) -> dict:
+    """
+      🛈 Peticiones/s del camino del webhook (usuario + historial + guardar el mensaje, con una espera
+      que simula el agente) con sesión síncrona en el event loop frente a la sesión asíncrona.
+      Al terminar borra los usuarios bench* y sus mensajes
+    """
+    sync_engine = create_engine(url, **pool_options(url))
+    aengine = create_async_engine(to_async_url(url), **pool_options(url))
+    sync_sessions = sessionmaker(autoflush=False, bind=sync_engine)
+    async_sessions = async_sessionmaker(aengine, autoflush=False, expire_on_commit=False)
+
+    User.metadata.create_all(bind=sync_engine)
+    phones = [f"bench{i:05d}" for i in range(concurrency)]
+    with sync_sessions() as db:
+        existing = set(db.scalars(select(User.phone_number).where(User.phone_number.in_(phones))))
+        db.add_all(
+            User(phone_number=phone, name="Bench", email=f"{phone}@example.com")
+            for phone in phones if phone not in existing
+        )
+        db.commit()
+
+    def sync_request(phone: str):
+        with sync_sessions() as db:
+            user = db.scalars(select(User).where(User.phone_number == phone)).first()
+            list(db.scalars(select(Message).where(Message.user_id == user.id).order_by(Message.created_at.desc()).limit(5)))
+            return user
+
+    def sync_save(user_id: int):
+        with sync_sessions() as db:
+            db.add(Message(user_id=user_id, user_text="hola", response_text="¡Hola! 😊"))
+            db.commit()
+
+    async def sync_path(phone: str):
+        user = sync_request(phone)
+        await asyncio.sleep(agent_latency)
+        sync_save(user.id)
+
+    async def async_path(phone: str):
+        async with async_sessions() as db:
+            user = (await db.scalars(select(User).where(User.phone_number == phone))).first()
+            (await db.scalars(select(Message).where(Message.user_id == user.id).order_by(Message.created_at.desc()).limit(5))).all()
+            await asyncio.sleep(agent_latency)
+            db.add(Message(user_id=user.id, user_text="hola", response_text="¡Hola! 😊"))
+            await db.commit()
+
+    async def run(path) -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int):
+            async with semaphore:
+                await path(phones[i % concurrency])
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return requests / (time.perf_counter() - started_at)
+
+    try:
+        return {
+            "url": make_url(url).render_as_string(hide_password=True),
+            "requests": requests,
+            "concurrency": concurrency,
+            "agent_latency_sec": agent_latency,
+            "sync_session_rps": round(await run(sync_path), 1),
+            "async_session_rps": round(await run(async_path), 1),
+        }
+    finally:
+        with sync_sessions() as db:
+            user_ids = select(User.id).where(User.phone_number.in_(phones)).scalar_subquery()
+            db.execute(delete(Message).where(Message.user_id.in_(user_ids)))
+            db.execute(delete(User).where(User.phone_number.in_(phones)))
+            db.commit()
+        sync_engine.dispose()
+        await aengine.dispose()
+
+
+if __name__ == "__main__":
+    # python -m bench.database_sessions <url>   (escribe usuarios y mensajes bench*: usa una base de pruebas)
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python -m bench.database_sessions <url>")
+    print(json.dumps(asyncio.run(benchmark(sys.argv[1])), indent=2))
@@ -0,0 +1,55 @@
+import json
+import httpx
+from openai import OpenAI
+from app.services.reminder_messages import WHEN_PLACEHOLDER
+
+
+def fake_model_client(garble_every: int = 0, missing_ids: tuple[int, ...] = (), fail_batches: bool = False, requests: dict | None = None):
+    """
+      🛈 Cliente OpenAI contra un modelo falso en memoria (sin red): responde con un mensaje por id
+      y cuenta tokens a ~4 caracteres por token. Con `garble_every` una de cada N respuestas por
+      lotes no es JSON, para ejercitar el respaldo individual; `missing_ids` faltan en las
+      respuestas por lotes y con `fail_batches` las peticiones por lotes dan 500. `requests` cuenta
+      las peticiones ("batch" / "single")
+    """
+    batch_calls = 0
+    requests = requests if requests is not None else {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal batch_calls
+        body = json.loads(request.content)
+        kind = "batch" if "text" in body else "single"
+        requests[kind] = requests.get(kind, 0) + 1
+        if kind == "batch" and fail_batches:
+            return httpx.Response(500, json={"error": {"message": "fake model down", "type": "server_error"}})
+
+        if kind == "batch":
+            batch_calls += 1
+            reminders = json.loads(body["input"])
+            output = json.dumps({"messages": [
+                {"id": reminder["id"], "text": f"¡Hola {reminder['name']}! Te recuerdo {WHEN_PLACEHOLDER} que tienes que {reminder['text']} 😉"}
+                for reminder in reminders if reminder["id"] not in missing_ids
+            ]}, ensure_ascii=False)
+            if garble_every and batch_calls % garble_every == 0:
+                output = output[: len(output) // 2]
+        else:
+            # input: "Reminder me, <name>, that you need to <text> {cuando}"
+            name, _, text = body["input"].removeprefix("Reminder me, ").partition(", that you need to ")
+            output = f"¡Hola {name}! Te recuerdo {WHEN_PLACEHOLDER} que tienes que {text.replace(WHEN_PLACEHOLDER, '').strip()} 😉"
+
+        input_tokens = (len(body.get("instructions") or "") + len(body["input"])) // 4
+        output_tokens = len(output) // 4
+        return httpx.Response(200, json={
+            "id": "resp_fake", "object": "response", "created_at": 0, "model": body["model"], "status": "completed",
+            "output": [{
+                "type": "message", "id": "msg_fake", "role": "assistant", "status": "completed",
+                "content": [{"type": "output_text", "text": output, "annotations": []}],
+            }],
+            "parallel_tool_calls": False, "tool_choice": "auto", "tools": [],
+            "usage": {
+                "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+                "input_tokens_details": {"cached_tokens": 0}, "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        })
+
+    return OpenAI(api_key="fake", base_url="http://fake-model/v1", max_retries=0, http_client=httpx.Client(transport=httpx.MockTransport(handler)))
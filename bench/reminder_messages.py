@@ -0,0 +1,31 @@
+import json
+import sys
+from app.config import REMINDER_RENDER_BATCH
+from app.services.reminder_messages import ReminderMessageRenderer
+from bench.fake_model import fake_model_client
+
+
+def benchmark(reminders: int = 200, batch_size: int = REMINDER_RENDER_BATCH, garble_every: int = 4) -> dict:
+    """
+      🛈 Llamadas por recordatorio y coste con el modelo falso: uno a uno, por lotes y por lotes con
+      una de cada `garble_every` respuestas rota
+    """
+    items = [{"id": i, "name": f"Usuario{i}", "text": "comprar pan y sacar al perro"} for i in range(1, reminders + 1)]
+
+    one_by_one = ReminderMessageRenderer(client=fake_model_client())
+    one_by_one.reminders = len(items)
+    for item in items:
+        one_by_one.render_one(item)
+
+    report = {"reminders": reminders, "batch_size": batch_size, "one_by_one": one_by_one.metrics()}
+    for name, client in (("batched", fake_model_client()), ("batched_with_parse_failures", fake_model_client(garble_every))):
+        renderer = ReminderMessageRenderer(client=client)
+        for start in range(0, len(items), batch_size):
+            renderer.render_batch(items[start:start + batch_size])
+        report[name] = renderer.metrics()
+    return report
+
+
+if __name__ == "__main__":
+    # python -m bench.reminder_messages [recordatorios]
+    print(json.dumps(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200), indent=2))
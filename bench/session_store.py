@@ -0,0 +1,45 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from app.services.session_store import SessionStore
+
+
+async def benchmark(sizes=(10_000, 100_000), messages: int = 2_000) -> list[dict]:
+    """
+      🛈 Coste por mensaje con `size` sesiones activas: limpieza completa del dict (antes) frente al SessionStore
+    """
+    results = []
+    for size in sizes:
+        # Before: rebuild the dict on every message
+        now = datetime.now(timezone.utc)
+        states = {f"user_{i}": {"last_interaction": now} for i in range(size)}
+        started_at = time.perf_counter()
+        for i in range(messages):
+            threshold = datetime.now(timezone.utc) - timedelta(minutes=30)
+            states = {phone: state for phone, state in states.items() if state["last_interaction"] > threshold}
+            states[f"user_{i % size}"]["last_interaction"] = datetime.now(timezone.utc)
+        rebuild_us = (time.perf_counter() - started_at) / messages * 1e6
+
+        # After: ordered TTL index
+        store = SessionStore(backend="memory")
+        for i in range(size):
+            await store.set(f"user_{i}", {"conversation_history": []})
+        started_at = time.perf_counter()
+        for i in range(messages):
+            state = await store.get(f"user_{i % size}")
+            state["conversation_history"].append({"role": "user", "content": "hola"})
+            await store.set(f"user_{i % size}", state)
+        store_us = (time.perf_counter() - started_at) / messages * 1e6
+
+        results.append({
+            "active_sessions": size,
+            "dict_rebuild_us_per_message": round(rebuild_us, 2),
+            "session_store_us_per_message": round(store_us, 2),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    # python -m bench.session_store
+    print(json.dumps(asyncio.run(benchmark()), indent=2))
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import sys
+import time
+from sqlalchemy import delete, event, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app import models
+from app.database import pool_options, to_async_url
+from app.services.whatsapp_webhook import load_users_by_phone
+
+
+async def benchmark(url: str, senders: int = 50, payloads: int = 100) -> dict:
+    """
+      🛈 Consultas y tiempo para resolver los usuarios de un payload con `senders` remitentes: antes
+      (dos SELECT por remitente, en process_sender_messages y en get_agent_response) y ahora
+      (load_users_by_phone, un solo IN). Al terminar borra los usuarios bench*
+    """
+    engine = create_async_engine(to_async_url(url), **pool_options(url))
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    phones = [f"benchwh{i:05d}" for i in range(senders)]
+
+    selects = 0
+
+    def count_selects(conn, cursor, statement, parameters, context, executemany):
+        nonlocal selects
+        selects += statement.lstrip().upper().startswith("SELECT")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+    async def one_by_one(db: AsyncSession):
+        for phone in phones:
+            for _ in range(2):
+                (await db.scalars(select(models.User).where(models.User.phone_number == phone))).first()
+
+    async def single_query(db: AsyncSession):
+        await load_users_by_phone(db, phones)
+
+    async def run(resolve) -> dict:
+        nonlocal selects
+        selects = 0
+        started_at = time.perf_counter()
+        for _ in range(payloads):
+            async with sessions() as db:
+                await resolve(db)
+        elapsed = time.perf_counter() - started_at
+        return {"selects_per_payload": selects / payloads, "ms_per_payload": round(elapsed / payloads * 1000, 3)}
+
+    try:
+        async with sessions() as db:
+            db.add_all(models.User(phone_number=phone, name="Bench", email=f"{phone}@example.com") for phone in phones)
+            await db.commit()
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count_selects)
+        report = {
+            "url": make_url(url).render_as_string(hide_password=True),
+            "senders": senders,
+            "payloads": payloads,
+            "one_by_one": await run(one_by_one),
+            "load_users_by_phone": await run(single_query),
+        }
+        event.remove(engine.sync_engine, "before_cursor_execute", count_selects)
+        return report
+    finally:
+        async with sessions() as db:
+            await db.execute(delete(models.User).where(models.User.phone_number.in_(phones)))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    # python -m bench.webhook_users <url> [remitentes]   (escribe usuarios benchwh*: usa una base de pruebas)
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python -m bench.webhook_users <url> [remitentes]")
+    print(json.dumps(asyncio.run(benchmark(sys.argv[1], senders=int(sys.argv[2]) if len(sys.argv) > 2 else 50)), indent=2))
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from app.services.whatsapp import AsyncWhatsAppService
+
+
+def load_test(sends: int = 200, concurrency: int = 20, latency: float = 0.05) -> dict:
+    """
+      🛈 Envíos contra un servidor local que imita la Graph API (`latency` segundos por petición),
+      lanzados desde el event loop: con requests.post (como send_whatsapp_message) y con
+      AsyncWhatsAppService. Un latido cada 10 ms mide cuánto se queda parado el event loop
+    """
+    class StubGraphAPI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(latency)
+            body = b'{"messages": [{"id": "wamid.stub"}]}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGraphAPI)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v18.0"
+    payload = {"messaging_product": "whatsapp", "to": "34600000000", "type": "text", "text": {"body": "hola"}}
+
+    async def blocking_send():
+        # What the webhook used to do: a plain requests.post inside the async handler
+        requests.post(f"{base_url}/stub/messages", headers={"Authorization": "Bearer stub"}, json=payload)
+
+    async def measure(send) -> dict:
+        stalls = []
+        done = False
+
+        async def heartbeat():
+            while not done:
+                started_at = time.perf_counter()
+                await asyncio.sleep(0.01)
+                stalls.append(max(time.perf_counter() - started_at - 0.01, 0.0))
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                await send()
+
+        beat = asyncio.create_task(heartbeat())
+        await asyncio.sleep(0)
+        started_at = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(sends)))
+        elapsed = time.perf_counter() - started_at
+        done = True
+        await beat
+
+        return {
+            "sends_per_sec": round(sends / elapsed, 1),
+            "loop_stall_max_ms": round(max(stalls, default=0.0) * 1000, 1),
+            "loop_stall_total_ms": round(sum(stalls) * 1000, 1),
+        }
+
+    async def run() -> dict:
+        service = AsyncWhatsAppService(access_token="stub", phone_id="stub", rate_limiter=None)
+        service.base_url = base_url
+        # The client (and its SSL context) is built once per process, not per send
+        service.client
+        try:
+            return {
+                "sends": sends,
+                "concurrency": concurrency,
+                "stub_latency_ms": latency * 1000,
+                "http2": service.http2,
+                "requests_post": await measure(blocking_send),
+                "async_client": await measure(lambda: service.send_text(payload["to"], "hola")),
+            }
+        finally:
+            await service.aclose()
+
+    try:
+        return asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # python -m bench.whatsapp_load [envíos] [concurrencia]   (servidor local, no llama a la Graph API)
+    sends = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(json.dumps(load_test(sends, concurrency), indent=2))
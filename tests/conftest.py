@@ -0,0 +1,13 @@
+import os
+import tempfile
+from cryptography.fernet import Fernet
+
+# app.config reads the environment at import time: a throwaway SQLite file and dummy credentials,
+# so the tests never touch the configured database or external services
+os.environ.setdefault("DATABASE_LOCAL_URL", f"sqlite:///{tempfile.gettempdir()}/whatsapp-reminder-tests.db")
+os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("WHATSAPP_ACCESS_TOKEN", "test")
+os.environ.setdefault("WHATSAPP_PHONE_ID", "test")
+os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+os.environ.setdefault("CELERY_RESULT_BACKEND", "cache+memory://")
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+import pytest
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from app.services.agents.classifier_agent import IntentDeps, classifier_agent
+from app.services.agents.context import (
+    INJECT_MODE,
+    MAX_MESSAGE_CHARS,
+    TOOL_MODE,
+    conversation_context_prompt,
+    estimate_tokens,
+    render_conversation_history,
+)
+
+
+HISTORY = [
+    {"role": "user", "content": "Hola, ¿qué tal?"},
+    {"role": "assistant", "content": "¡Muy bien! ¿En qué te ayudo hoy? 😊"},
+    {"role": "user", "content": "Recuérdame comprar pan el jueves"},
+    {"role": "assistant", "content": "¿A qué hora quieres que te recuerde comprar pan el jueves?"},
+]
+
+
+def test_history_keeps_the_most_recent_messages_within_the_budget():
+    rendered = render_conversation_history(HISTORY, token_budget=40)
+
+    assert rendered.splitlines() == [
+        "Usuario: Recuérdame comprar pan el jueves",
+        "Asistente: ¿A qué hora quieres que te recuerde comprar pan el jueves?",
+    ]
+    assert sum(estimate_tokens(line) + 1 for line in rendered.splitlines()) <= 40
+
+
+def test_long_and_empty_messages():
+    rendered = render_conversation_history([{"role": "user", "content": "a" * 1000}, {"role": "assistant", "content": "  "}], token_budget=10_000)
+    assert rendered == "Usuario: " + "a" * MAX_MESSAGE_CHARS + "…"
+
+
+def test_prompt_only_carries_the_context_in_inject_mode():
+    deps = SimpleNamespace(context_mode=TOOL_MODE, conversation_history=HISTORY, timezone=None)
+    assert conversation_context_prompt(deps, "Usa la herramienta") == "Usa la herramienta"
+
+    deps.context_mode = INJECT_MODE
+    prompt = conversation_context_prompt(deps, "Usa la herramienta", include_today=True)
+    assert "Usuario: Hola, ¿qué tal?" in prompt
+    assert "Today (user's timezone)" in prompt
+
+
+@pytest.mark.parametrize("mode, context_tools", [(TOOL_MODE, True), (INJECT_MODE, False)])
+async def test_context_tools_are_hidden_in_inject_mode(mode, context_tools):
+    offered = []
+
+    def respond(messages, info: AgentInfo) -> ModelResponse:
+        offered.append({tool.name for tool in info.function_tools})
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, {"intent": "general"})])
+
+    with classifier_agent.override(model=FunctionModel(respond)):
+        await classifier_agent.run("a las 10", deps=IntentDeps(1, HISTORY, context_mode=mode))
+
+    assert ("get_conversation_context" in offered[0]) == context_tools
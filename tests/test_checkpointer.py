@@ -0,0 +1,58 @@
+from typing import TypedDict
+import pytest
+from langgraph.graph import END, START, StateGraph
+from app.services.checkpointer import BoundedMemorySaver, CompactSerializer
+
+
+class CounterState(TypedDict):
+    count: int
+    note: str
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(CounterState)
+    graph.add_node("increment", lambda state: {"count": state["count"] + 1})
+    graph.add_edge(START, "increment")
+    graph.add_edge("increment", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def thread(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+@pytest.mark.parametrize("encrypt", [False, True])
+@pytest.mark.parametrize("note", ["hola", "hola " * 200])
+def test_compact_serializer_round_trip(encrypt, note):
+    serde = CompactSerializer(encrypt=encrypt)
+    type_, data = serde.dumps_typed({"note": note})
+
+    assert ("+zlib" in type_) == (len(note) > 256)
+    assert type_.endswith("+fernet") == encrypt
+    assert serde.loads_typed((type_, data)) == {"note": note}
+
+
+def test_keeps_only_the_last_checkpoints_per_thread():
+    saver = BoundedMemorySaver(max_threads=10, keep_last=2)
+    graph = build_graph(saver)
+
+    for _ in range(5):
+        graph.invoke({"count": 0, "note": "hola"}, config=thread("user_1"))
+
+    assert len(list(saver.list(thread("user_1")))) == 2
+    assert saver.metrics()["pruned_checkpoints"] > 0
+    assert graph.get_state(thread("user_1")).values["count"] == 1
+
+
+def test_evicts_the_least_recently_used_thread():
+    saver = BoundedMemorySaver(max_threads=2, keep_last=1)
+    graph = build_graph(saver)
+
+    for user in ("user_1", "user_2", "user_1", "user_3"):
+        graph.invoke({"count": 0, "note": "hola"}, config=thread(user))
+
+    assert saver.get_tuple(thread("user_2")) is None
+    assert saver.get_tuple(thread("user_1")) is not None
+    assert saver.get_tuple(thread("user_3")) is not None
+    assert saver.metrics()["evicted_threads"] == 1
+    assert saver.metrics()["threads"] == 2
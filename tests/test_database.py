@@ -0,0 +1,22 @@
+import pytest
+from sqlalchemy.engine import make_url
+from app.database import pool_options, to_async_url
+
+
+@pytest.mark.parametrize("url, driver", [
+    ("postgres://user:pw@db/app", "postgresql+asyncpg"),
+    ("postgresql://user:pw@db/app", "postgresql+asyncpg"),
+    ("postgresql+psycopg2://user:pw@db/app", "postgresql+asyncpg"),
+    ("postgresql+asyncpg://user:pw@db/app", "postgresql+asyncpg"),
+    ("sqlite:////tmp/app.db", "sqlite+aiosqlite"),
+])
+def test_async_url_keeps_the_database(url, driver):
+    async_url = to_async_url(url)
+    assert async_url.drivername == driver
+    # Only the driver changes: host, credentials and database stay
+    assert async_url.set(drivername=make_url(url).drivername) == make_url(url)
+
+
+def test_pool_sizing_only_for_server_databases():
+    assert pool_options("sqlite:////tmp/app.db") == {}
+    assert set(pool_options("postgresql://user:pw@db/app")) == {"pool_size", "max_overflow", "pool_pre_ping", "pool_recycle"}
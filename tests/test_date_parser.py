@@ -0,0 +1,32 @@
+import json
+from datetime import datetime
+from pathlib import Path
+import pytest
+from app.services.agents.date_parser import TRIGGER_PATTERN, parse_reminder
+
+
+CORPUS = Path(__file__).resolve().parent.parent / "app" / "services" / "agents" / "corpus" / "dates.jsonl"
+SAMPLES = [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+@pytest.mark.parametrize("sample", SAMPLES, ids=[sample["text"] for sample in SAMPLES])
+def test_corpus(sample):
+    parsed = parse_reminder(sample["text"], datetime.fromisoformat(sample["now"]))
+    assert (parsed.slots() if parsed.is_complete else None) == sample["expected"]
+
+
+@pytest.mark.parametrize("verb", ["quedar", "desayunar", "decirle", "departir", "dentista", "paracetamol"])
+def test_trigger_connector_needs_a_word_boundary(verb):
+    match = TRIGGER_PATTERN.match(f"Recuérdame {verb} mañana")
+    assert f"Recuérdame {verb} mañana"[match.end():].startswith(verb)
+
+
+def test_bare_hour_goes_to_the_model():
+    parsed = parse_reminder("cenar con Ana mañana a las 9", datetime(2026, 10, 18, 10, 0))
+    assert "time" in parsed.ambiguous
+
+
+def test_leftover_day_number_goes_to_the_model():
+    parsed = parse_reminder("Recuérdame el lunes 5 a las 10:00 ir al dentista", datetime(2026, 10, 18, 10, 0))
+    assert parsed.reminder_text == "5 ir al dentista"
+    assert "date" in parsed.ambiguous
@@ -0,0 +1,76 @@
+from datetime import timedelta
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from app.models import Base, Reminder, User, utc_now
+from app.services.reminder_messages import (
+    ReminderMessageRenderer,
+    claim_reminders_to_render,
+    is_valid_template,
+    render_pending_reminders,
+)
+from bench.fake_model import fake_model_client
+
+
+ITEMS = [{"id": i, "name": f"Usuario{i}", "text": "comprar pan"} for i in range(1, 4)]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def now(db):
+    """50 reminders due over the next 50 minutes, none rendered yet."""
+    now = utc_now()
+    user = User(phone_number="000000000", name="Check", email="check@render.local", timezone="UTC")
+    db.add(user)
+    db.flush()
+    due = [now + timedelta(minutes=i + 1) for i in range(50)]
+    db.add_all([Reminder(user_id=user.id, text=f"tarea {i}", date=at.date(), hour=at.time(), due_at_utc=at) for i, at in enumerate(due)])
+    db.commit()
+    return now
+
+
+def test_parse_failure_falls_back_to_one_by_one():
+    renderer = ReminderMessageRenderer(client=fake_model_client(garble_every=1))
+    templates = renderer.render_batch(ITEMS)
+
+    assert (renderer.parse_failures, renderer.fallback_calls, renderer.calls) == (1, 3, 4)
+    assert all(is_valid_template(templates.get(item["id"])) for item in ITEMS)
+
+
+def test_missing_id_is_regenerated_alone():
+    requests = {}
+    renderer = ReminderMessageRenderer(client=fake_model_client(missing_ids=(2,), requests=requests))
+    templates = renderer.render_batch(ITEMS)
+
+    assert requests == {"batch": 1, "single": 1}
+    assert renderer.fallback_calls == 1
+    assert all(is_valid_template(templates.get(item["id"])) for item in ITEMS)
+
+
+def test_batch_error_stops_the_run_and_releases_the_claim(db, now):
+    requests = {}
+    renderer = ReminderMessageRenderer(client=fake_model_client(fail_batches=True, requests=requests))
+
+    assert render_pending_reminders(db, renderer, now=now, batch_size=20, max_batches=3) == 0
+    assert requests == {"batch": 1}
+    assert renderer.failures == 1
+    assert db.scalar(select(func.count()).select_from(Reminder).where(Reminder.render_claimed_at.is_not(None))) == 0
+
+
+def test_overlapping_runs_skip_claimed_reminders(db, now):
+    # A run still rendering the first batch while the next one starts
+    in_flight = claim_reminders_to_render(db, now, batch_size=20)
+    renderer = ReminderMessageRenderer(client=fake_model_client())
+
+    assert len(in_flight) == 20
+    assert render_pending_reminders(db, renderer, now=now, batch_size=20, max_batches=3) == 30
+    assert renderer.reminders == 30
+    assert db.scalar(select(func.count()).select_from(Reminder).where(Reminder.id.in_(in_flight), Reminder.rendered_text.is_not(None))) == 0
@@ -0,0 +1,49 @@
+from collections import deque
+from app.services import session_store as session_store_module
+from app.services.session_store import SessionStore
+
+
+async def test_sessions_expire_after_the_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(session_store_module.time, "monotonic", lambda: clock[0])
+    store = SessionStore(backend="memory", ttl_sec=60)
+
+    await store.set("a", {"conversation_history": []})
+    clock[0] += 30
+    await store.set("b", {"conversation_history": []})
+    clock[0] += 40
+
+    # "a" was last touched 70 s ago, "b" 40 s ago
+    assert await store.get("a") is None
+    assert await store.get("b") is not None
+    assert store.metrics()["expired"] == 1
+    assert store.metrics()["active_sessions"] == 1
+
+
+async def test_set_renews_the_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(session_store_module.time, "monotonic", lambda: clock[0])
+    store = SessionStore(backend="memory", ttl_sec=60)
+
+    await store.set("a", {"conversation_history": []})
+    clock[0] += 50
+    await store.set("a", await store.get("a"))
+    clock[0] += 50
+
+    assert await store.get("a") is not None
+
+
+async def test_history_is_a_ring_buffer():
+    store = SessionStore(backend="memory", max_history=3)
+    await store.set("a", {"conversation_history": [{"content": str(i)} for i in range(5)]})
+
+    history = (await store.get("a"))["conversation_history"]
+    assert isinstance(history, deque)
+    assert [message["content"] for message in history] == ["2", "3", "4"]
+
+
+def test_redis_backend_does_not_report_expiries():
+    # Redis drops expired keys on its own: the store can't count them (no connection is opened here)
+    store = SessionStore(backend="redis", redis_url="redis://localhost:6379/0")
+    assert store.metrics()["expired"] is None
+    assert store.metrics()["active_sessions"] is None
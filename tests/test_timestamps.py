@@ -0,0 +1,80 @@
+from datetime import date, datetime, time
+import pytest
+from asyncpg.pgproto.pgproto import pg_epoch_datetime
+from sqlalchemy import DateTime, event, select
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.models import Base, GraphCheckpoint, Message, PendingReminder, Reminder, User
+from app.services.pending_reminders import create_pending_reminder, take_pending_reminder
+
+
+ASYNCPG = asyncpg.dialect()
+
+
+def encode_for_asyncpg(column_type, value):
+    """
+    What the asyncpg dialect sends for a DateTime value: SQLAlchemy's bind processing, then asyncpg's
+    timestamp codec, which computes `value - pg_epoch_datetime` against a naive epoch.
+    """
+    processor = column_type.dialect_impl(ASYNCPG).bind_processor(ASYNCPG)
+    value = processor(value) if processor else value
+    return value - pg_epoch_datetime
+
+
+@pytest.fixture
+async def sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/timestamps.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # Every DateTime parameter the ORM binds, before the SQLite dialect turns it into text
+    bound = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        compiled = context.compiled
+        if compiled is None:
+            return
+        for params in context.compiled_parameters:
+            for name, value in params.items():
+                bind = compiled.binds.get(name)
+                if bind is not None and isinstance(bind.type, DateTime) and isinstance(value, datetime):
+                    bound.append((bind.type, value))
+
+    yield async_sessionmaker(engine, expire_on_commit=False), bound
+    await engine.dispose()
+
+
+@pytest.mark.parametrize("model", [User, Reminder, Message, PendingReminder, GraphCheckpoint])
+def test_datetime_defaults_are_naive(model):
+    for column in model.__table__.columns:
+        for default in (column.default, column.onupdate):
+            if isinstance(column.type, DateTime) and default is not None and default.is_callable:
+                value = default.arg(None)
+                assert value.tzinfo is None, f"{model.__name__}.{column.name}"
+                encode_for_asyncpg(column.type, value)
+
+
+async def test_webhook_writes_bind_through_asyncpg(sessions):
+    session_factory, bound = sessions
+    async with session_factory() as db:
+        user = User(phone_number="34600000000", name="Ana", email="ana@example.com")
+        db.add(user)
+        await db.commit()
+
+        db.add(Message(user_id=user.id, user_text="hola", response_text="¡Hola!"))
+        await db.commit()
+
+        pending = await create_pending_reminder(db, user, "llamar a Juan", date(2030, 1, 1), time(10, 0))
+        taken = await take_pending_reminder(db, user, pending.id)
+        await db.commit()
+
+        message = (await db.scalars(select(Message))).one()
+        message.response_text = "¡Hola de nuevo!"
+        await db.commit()
+
+    assert taken is not None and taken.id == pending.id
+    assert bound
+    for column_type, value in bound:
+        assert value.tzinfo is None
+        encode_for_asyncpg(column_type, value)
@@ -0,0 +1,78 @@
+import asyncio
+import fakeredis
+import pytest
+import redis.asyncio
+from app.services.webhook_queue import QueueFullError, RedisWebhookQueue
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    # Every RedisWebhookQueue (one per API process) talks to the same fake server
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.asyncio, "from_url", lambda url: fakeredis.FakeAsyncRedis(server=server))
+    return server
+
+
+def make_queue(maxsize: int = 100, lease_sec: float = 30) -> RedisWebhookQueue:
+    return RedisWebhookQueue("redis://fake", shards=2, maxsize=maxsize, lease_sec=lease_sec)
+
+
+async def test_concurrent_puts_never_overshoot_maxsize(redis_server):
+    queues = [make_queue(maxsize=10) for _ in range(5)]
+    results = await asyncio.gather(
+        *(queue.put(0, {"sender": "34600000000", "n": i}) for i in range(10) for queue in queues),
+        return_exceptions=True,
+    )
+
+    assert sum(result is None for result in results) == 10
+    assert all(isinstance(result, QueueFullError) for result in results if result is not None)
+    assert await queues[0].depth() == [10, 0]
+    for queue in queues:
+        await queue.close()
+
+
+async def test_one_owner_per_shard(redis_server):
+    first, second = make_queue(), make_queue()
+
+    assert await first._acquire(0)
+    assert not await second._acquire(0)
+    assert await second._acquire(1)
+
+    # Closing hands the shard over without waiting for the lease to expire
+    await first.close()
+    assert await second._acquire(0)
+    await second.close()
+
+
+async def test_unacked_item_is_redelivered_first_after_the_owner_dies(redis_server):
+    dead, survivor = make_queue(lease_sec=0.3), make_queue(lease_sec=0.3)
+    for i in range(3):
+        await dead.put(0, {"sender": "34600000000", "n": i})
+
+    assert (await dead.get(0))["n"] == 0
+    # The process dies mid-item: no ack, no renewals, no release
+    for task in dead._leases.values():
+        task.cancel()
+    await asyncio.sleep(0.4)
+
+    received = []
+    for _ in range(3):
+        item = await survivor.get(0)
+        received.append(item["n"])
+        await survivor.ack(0)
+
+    assert received == [0, 1, 2]
+    assert await survivor.depth() == [0, 0]
+    await survivor.close()
+    await dead._redis.aclose()
+
+
+async def test_ack_removes_the_item_from_processing(redis_server):
+    queue = make_queue()
+    await queue.put(1, {"sender": "34600000001", "n": 0})
+
+    assert (await queue.get(1))["n"] == 0
+    assert await queue.depth() == [0, 1]
+    await queue.ack(1)
+    assert await queue.depth() == [0, 0]
+    await queue.close()
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.models import Base, User
+from app.services.whatsapp_webhook import load_users_by_phone
+
+
+@pytest.fixture
+async def sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/webhook_users.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    yield async_sessionmaker(engine, expire_on_commit=False), statements
+    await engine.dispose()
+
+
+async def test_one_query_for_every_sender(sessions):
+    session_factory, statements = sessions
+    phones = [f"34600{i:06d}" for i in range(50)]
+    async with session_factory() as db:
+        db.add_all(User(phone_number=phone, name="Test", email=f"{phone}@example.com") for phone in phones)
+        await db.commit()
+
+    statements.clear()
+    async with session_factory() as db:
+        # Repeated senders and one that is not registered
+        users = await load_users_by_phone(db, phones + phones[:5] + ["34699999999"])
+
+    assert sorted(users) == phones
+    assert all(users[phone].phone_number == phone for phone in phones)
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 1
+
+
+async def test_no_senders_no_query(sessions):
+    session_factory, statements = sessions
+    async with session_factory() as db:
+        assert await load_users_by_phone(db, []) == {}
+    assert statements == []